@@ -50,6 +50,15 @@ class SchedulerStatsController(wsgi.Controller):
 
         return self._view_builder.pools(req, pools, detail)
 
+    def get_filter_stats(self, req):
+        """List the usage statistics of the scheduler filters."""
+        context = req.environ['cinder.context']
+        authorize(context, 'get_filter_stats')
+
+        filter_stats = self.scheduler_api.get_filter_stats(context)
+
+        return self._view_builder.filter_stats(req, filter_stats)
+
 
 class Scheduler_stats(extensions.ExtensionDescriptor):
     """Scheduler stats support."""
@@ -64,7 +73,8 @@ class Scheduler_stats(extensions.ExtensionDescriptor):
         res = extensions.ResourceExtension(
             Scheduler_stats.alias,
             SchedulerStatsController(),
-            collection_actions={"get_pools": "GET"})
+            collection_actions={"get_pools": "GET",
+                                "get_filter_stats": "GET"})
 
         resources.append(res)
 
@@ -51,3 +51,10 @@ class ViewBuilder(common.ViewBuilder):
         pools_dict = dict(pools=plist)
 
         return pools_dict
+
+    def filter_stats(self, request, filter_stats):
+        """View of the usage statistics of the scheduler filters."""
+        keys = ('name', 'runs', 'objects_in', 'objects_out', 'time',
+                'pass_ratio', 'time_per_object')
+        return dict(filters=[dict((key, stats.get(key)) for key in keys)
+                             for stats in filter_stats])
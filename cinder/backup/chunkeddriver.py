@@ -22,11 +22,18 @@
 """
 
 import abc
+import bisect
+import collections
+import ctypes
+import ctypes.util
+import errno
 import hashlib
 import json
 import os
+import sys
 
 import eventlet
+from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_service import loopingcall
@@ -43,16 +50,170 @@ from cinder.volume import utils as volume_utils
 
 LOG = logging.getLogger(__name__)
 
+# A chunk is only compressed when its sample shrinks below this ratio.
+COMPRESSION_SAMPLE_RATIO = 0.95
+# Size of the pieces backup objects are read in when they are streamed.
+RESTORE_READ_SIZE = units.Mi
+
 chunkedbackup_service_opts = [
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
-               help='Compression algorithm (None to disable)'),
+               help='Compression algorithm (None to disable). Supported '
+                    'values are zlib, bz2, lz4 and zstd; lz4 and zstd need '
+                    'the lz4 and zstd Python modules.'),
+    cfg.IntOpt('backup_compression_level',
+               help='Compression level passed to the compression '
+                    'algorithm. The algorithm default is used if unset.'),
+    cfg.IntOpt('backup_compression_sample_size',
+               default=0,
+               min=0,
+               help='Number of bytes at the start of every chunk that are '
+                    'compressed first to find out whether the chunk is '
+                    'worth compressing. Chunks whose sample does not '
+                    'compress, such as encrypted data, are stored '
+                    'uncompressed. 0 disables sampling.'),
+    cfg.IntOpt('backup_max_chunks_in_flight',
+               default=1,
+               min=1,
+               help='Maximum number of backup chunks that are compressed, '
+                    'hashed and uploaded concurrently. With a value greater '
+                    'than 1 the volume is read by one thread while '
+                    'compression runs in native threads and uploads run '
+                    'concurrently. Every chunk in flight holds up to twice '
+                    'the backup object size in memory.'),
+    cfg.IntOpt('backup_restore_objects_in_flight',
+               default=1,
+               min=1,
+               help='Number of backup objects that are fetched and '
+                    'decompressed ahead of the one being written to the '
+                    'volume during a restore.'),
+    cfg.IntOpt('backup_restore_fsync_interval',
+               default=1,
+               min=0,
+               help='Number of backup objects written to the volume between '
+                    'two fsync calls during a restore. 0 only syncs the '
+                    'volume once, when the restore of a backup completes.'),
+    cfg.BoolOpt('backup_skip_zero_chunks',
+                default=False,
+                help='Do not upload backup chunks that only contain zeros '
+                     'but record them in the backup metadata instead. '
+                     'Backups holding such chunks use metadata version '
+                     '1.1.0, which older backup services cannot restore.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(chunkedbackup_service_opts)
 
 
+class ChunkWriterPool(object):
+    """Bounded pool of green threads that write backup chunks.
+
+    spawn() blocks while ``size`` chunks are in flight, which throttles the
+    thread reading the volume. The first error raised by a writer is
+    re-raised by the next call to spawn() or raise_error().
+    """
+
+    def __init__(self, size):
+        self._pool = eventlet.GreenPool(size)
+        self._error = None
+
+    def _run(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            if self._error is None:
+                self._error = sys.exc_info()
+
+    def spawn(self, func, *args):
+        self.raise_error()
+        self._pool.spawn_n(self._run, func, *args)
+
+    def waitall(self):
+        self._pool.waitall()
+
+    def raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            six.reraise(*error)
+
+
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOC_FL_PUNCH_HOLE = 0x02
+_libc = None
+
+
+def _punch_hole(fileno, offset, length):
+    """Deallocate a file or block device range so that it reads as zeros.
+
+    Returns False when the platform, file system or device cannot do it
+    and the range has to be zeroed by writing to it.
+    """
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            _libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int,
+                                        ctypes.c_int64, ctypes.c_int64]
+        except (OSError, AttributeError):
+            _libc = False
+    if not _libc:
+        return False
+    mode = _FALLOC_FL_PUNCH_HOLE | _FALLOC_FL_KEEP_SIZE
+    if _libc.fallocate(fileno, mode, offset, length) == 0:
+        return True
+    LOG.debug('Punching a hole is not supported (errno %s), writing '
+              'zeros instead.', errno.errorcode.get(ctypes.get_errno()))
+    return False
+
+
+class LeveledCompressor(object):
+    """Wraps a compression module to compress at a fixed level."""
+
+    def __init__(self, compressor, level):
+        self.compressor = compressor
+        self.level = level
+
+    def compress(self, data):
+        return self.compressor.compress(data, self.level)
+
+    def decompress(self, data):
+        return self.compressor.decompress(data)
+
+
+class RestoreExtentMap(object):
+    """Sorted set of disjoint volume byte ranges already claimed.
+
+    Objects of a backup chain are claimed from the newest backup to the
+    oldest, so the extents returned by claim() are exactly the parts of an
+    object that no newer backup overwrites.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+
+    def claim(self, start, end):
+        """Claim [start, end) and return the sub-ranges that were free."""
+        first = bisect.bisect_right(self._ends, start)
+        last = first
+        free = []
+        pos = start
+        while last < len(self._starts) and self._starts[last] < end:
+            if self._starts[last] > pos:
+                free.append((pos, self._starts[last]))
+            pos = max(pos, self._ends[last])
+            last += 1
+        if pos < end:
+            free.append((pos, end))
+
+        if last > first:
+            start = min(start, self._starts[first])
+            end = max(end, self._ends[last - 1])
+        self._starts[first:last] = [start]
+        self._ends[first:last] = [end]
+        return free
+
+
 @six.add_metaclass(abc.ABCMeta)
 class ChunkedBackupDriver(driver.BackupDriver):
     """Abstract chunked backup driver.
@@ -66,7 +227,10 @@ class ChunkedBackupDriver(driver.BackupDriver):
     """
 
     DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    # Version 1.1.0 adds the zero_extents list to the metadata.
+    SPARSE_DRIVER_VERSION = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1'}
 
     def _get_compressor(self, algorithm):
         try:
@@ -74,16 +238,27 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 return None
             elif algorithm.lower() in ('zlib', 'gzip'):
                 import zlib as compressor
-                return compressor
+                return self._set_compression_level(compressor)
             elif algorithm.lower() in ('bz2', 'bzip2'):
                 import bz2 as compressor
-                return compressor
+                return self._set_compression_level(compressor)
+            elif algorithm.lower() == 'lz4':
+                import lz4.frame as compressor
+                return self._set_compression_level(compressor)
+            elif algorithm.lower() in ('zstd', 'zstandard'):
+                import zstd as compressor
+                return self._set_compression_level(compressor)
         except ImportError:
             pass
 
         err = _('unsupported compression algorithm: %s') % algorithm
         raise ValueError(err)
 
+    def _set_compression_level(self, compressor):
+        if self.compression_level is None:
+            return compressor
+        return LeveledCompressor(compressor, self.compression_level)
+
     def __init__(self, context, chunk_size_bytes, sha_block_size_bytes,
                  backup_default_container, enable_progress_timer,
                  db_driver=None):
@@ -97,8 +272,14 @@ class ChunkedBackupDriver(driver.BackupDriver):
         self.data_block_num = CONF.backup_object_number_per_notification
         self.az = CONF.storage_availability_zone
         self.backup_compression_algorithm = CONF.backup_compression_algorithm
+        self.compression_level = CONF.backup_compression_level
+        self.compression_sample_size = CONF.backup_compression_sample_size
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.max_chunks_in_flight = CONF.backup_max_chunks_in_flight
+        self.restore_objects_in_flight = CONF.backup_restore_objects_in_flight
+        self.restore_fsync_interval = CONF.backup_restore_fsync_interval
+        self.skip_zero_chunks = CONF.backup_skip_zero_chunks
         self.support_force_delete = True
 
     # To create your own "chunked" backup driver, implement the following
@@ -186,13 +367,16 @@ class ChunkedBackupDriver(driver.BackupDriver):
         return filename
 
     def _write_metadata(self, backup, volume_id, container, object_list,
-                        volume_meta, extra_metadata=None):
+                        volume_meta, extra_metadata=None, zero_extents=None):
         filename = self._metadata_filename(backup)
         LOG.debug('_write_metadata started, container name: %(container)s,'
                   ' metadata filename: %(filename)s.',
                   {'container': container, 'filename': filename})
         metadata = {}
         metadata['version'] = self.DRIVER_VERSION
+        if zero_extents:
+            metadata['version'] = self.SPARSE_DRIVER_VERSION
+            metadata['zero_extents'] = zero_extents
         metadata['backup_id'] = backup['id']
         metadata['volume_id'] = volume_id
         metadata['backup_name'] = backup['display_name']
@@ -286,7 +470,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
                       'availability_zone': availability_zone,
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
-                       'volume_meta': None}
+                       'volume_meta': None, 'zero_extents': []}
         object_sha256 = {'id': 1, 'sha256s': [], 'prefix': object_prefix}
         extra_metadata = self.get_extra_metadata(backup, volume)
         if extra_metadata is not None:
@@ -296,8 +480,22 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 volume_size_bytes)
 
     def _backup_chunk(self, backup, container, data, data_offset,
-                      object_meta, extra_metadata):
-        """Backup data chunk based on the object metadata and offset."""
+                      object_meta, extra_metadata, writer_pool=None):
+        """Backup data chunk based on the object metadata and offset.
+
+        The object is added to the object list straight away so the list
+        stays in volume order. With a writer pool the chunk is compressed,
+        written and hashed by one of its workers, and the entry is completed
+        when that worker finishes.
+        """
+        if self.skip_zero_chunks and self._is_zero_data(data):
+            LOG.debug('Recording zero chunk at offset %(offset)d, length '
+                      '%(length)d.',
+                      {'offset': data_offset, 'length': len(data)})
+            object_meta['zero_extents'].append({'offset': data_offset,
+                                                'length': len(data)})
+            return
+
         object_prefix = object_meta['prefix']
         object_list = object_meta['list']
 
@@ -307,30 +505,92 @@ class ChunkedBackupDriver(driver.BackupDriver):
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
+        object_list.append(obj)
+        object_id += 1
+        object_meta['list'] = object_list
+        object_meta['id'] = object_id
+
+        if writer_pool is not None:
+            writer_pool.spawn(self._write_chunk, container, object_name,
+                              data, obj[object_name], extra_metadata, True)
+            return
+
+        self._write_chunk(container, object_name, data, obj[object_name],
+                          extra_metadata)
+
+        LOG.debug('Calling eventlet.sleep(0)')
+        eventlet.sleep(0)
+
+    def _write_chunk(self, container, object_name, data, object_info,
+                     extra_metadata, use_native_threads=False):
+        """Compress, store and hash one chunk, filling in object_info.
+
+        Compression and hashing release the GIL, so when called from a
+        writer pool they are handed to native threads to let the volume
+        reader and other uploads run meanwhile.
+        """
         LOG.debug('Backing up chunk of data from volume.')
-        algorithm, output_data = self._prepare_output_data(data)
-        obj[object_name]['compression'] = algorithm
+        if use_native_threads:
+            algorithm, output_data = tpool.execute(self._prepare_output_data,
+                                                   data)
+        else:
+            algorithm, output_data = self._prepare_output_data(data)
+        object_info['compression'] = algorithm
         LOG.debug('About to put_object')
         with self.get_object_writer(
                 container, object_name, extra_metadata=extra_metadata
         ) as writer:
             writer.write(output_data)
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
+        if use_native_threads:
+            md5 = tpool.execute(self._md5, data)
+        else:
+            md5 = self._md5(data)
+        object_info['md5'] = md5
         LOG.debug('backup MD5 for %(object_name)s: %(md5)s',
                   {'object_name': object_name, 'md5': md5})
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
 
-        LOG.debug('Calling eventlet.sleep(0)')
-        eventlet.sleep(0)
+    @staticmethod
+    def _is_zero_data(data):
+        # Most data chunks are rejected by their first or last byte without
+        # scanning the whole buffer.
+        if data[:1] != b'\0' or data[-1:] != b'\0':
+            return False
+        return data.count(b'\0') == len(data)
+
+    @staticmethod
+    def _md5(data):
+        return hashlib.md5(data).hexdigest()
+
+    def _calculate_sha256s(self, data):
+        """Return the sha256 of every hash block in data."""
+        shalist = []
+        off = 0
+        datalen = len(data)
+        while off < datalen:
+            chunk_start = off
+            chunk_end = chunk_start + self.sha_block_size_bytes
+            if chunk_end > datalen:
+                chunk_end = datalen
+            chunk = data[chunk_start:chunk_end]
+            sha = hashlib.sha256(chunk).hexdigest()
+            shalist.append(sha)
+            off += self.sha_block_size_bytes
+        return shalist
 
     def _prepare_output_data(self, data):
         if self.compressor is None:
             return 'none', data
         data_size_bytes = len(data)
+        if 0 < self.compression_sample_size < data_size_bytes:
+            sample = data[:self.compression_sample_size]
+            comp_sample_size = len(self.compressor.compress(sample))
+            if comp_sample_size >= len(sample) * COMPRESSION_SAMPLE_RATIO:
+                LOG.debug('Sample of this chunk compressed from '
+                          '%(sample_size)d to %(comp_sample_size)d bytes. '
+                          'Using original data for this chunk.',
+                          {'sample_size': len(sample),
+                           'comp_sample_size': comp_sample_size})
+                return 'none', data
         compressed_data = self.compressor.compress(data)
         comp_size_bytes = len(compressed_data)
         algorithm = CONF.backup_compression_algorithm.lower()
@@ -358,6 +618,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
         volume_meta = object_meta['volume_meta']
         sha256_list = object_sha256['sha256s']
         extra_metadata = object_meta.get('extra_metadata')
+        zero_extents = object_meta.get('zero_extents')
         self._write_sha256file(backup,
                                backup.volume_id,
                                container,
@@ -367,7 +628,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
                              container,
                              object_list,
                              volume_meta,
-                             extra_metadata)
+                             extra_metadata,
+                             zero_extents)
         backup.object_count = object_id
         backup.save()
         LOG.debug('backup %s finished.', backup['id'])
@@ -464,86 +726,98 @@ class ChunkedBackupDriver(driver.BackupDriver):
         sha256_list = object_sha256['sha256s']
         shaindex = 0
         is_backup_canceled = False
-        while True:
-            # First of all, we check the status of this backup. If it
-            # has been changed to delete or has been deleted, we cancel the
-            # backup process to do forcing delete.
-            backup = objects.Backup.get_by_id(self.context, backup.id)
-            if backup.status in (fields.BackupStatus.DELETING,
-                                 fields.BackupStatus.DELETED):
-                is_backup_canceled = True
-                # To avoid the chunk left when deletion complete, need to
-                # clean up the object of chunk again.
-                self.delete(backup)
-                LOG.debug('Cancel the backup process of %s.', backup.id)
-                break
-            data_offset = volume_file.tell()
-            data = volume_file.read(self.chunk_size_bytes)
-            if data == b'':
-                break
-
-            # Calculate new shas with the datablock.
-            shalist = []
-            off = 0
-            datalen = len(data)
-            while off < datalen:
-                chunk_start = off
-                chunk_end = chunk_start + self.sha_block_size_bytes
-                if chunk_end > datalen:
-                    chunk_end = datalen
-                chunk = data[chunk_start:chunk_end]
-                sha = hashlib.sha256(chunk).hexdigest()
-                shalist.append(sha)
-                off += self.sha_block_size_bytes
-            sha256_list.extend(shalist)
-
-            # If parent_backup is not None, that means an incremental
-            # backup will be performed.
-            if parent_backup:
-                # Find the extent that needs to be backed up.
-                extent_off = -1
-                for idx, sha in enumerate(shalist):
-                    if sha != parent_backup_shalist[shaindex]:
-                        if extent_off == -1:
-                            # Start of new extent.
-                            extent_off = idx * self.sha_block_size_bytes
-                    else:
-                        if extent_off != -1:
-                            # We've reached the end of extent.
-                            extent_end = idx * self.sha_block_size_bytes
-                            segment = data[extent_off:extent_end]
-                            self._backup_chunk(backup, container, segment,
-                                               data_offset + extent_off,
-                                               object_meta,
-                                               extra_metadata)
-                            extent_off = -1
-                    shaindex += 1
-
-                # The last extent extends to the end of data buffer.
-                if extent_off != -1:
-                    extent_end = datalen
-                    segment = data[extent_off:extent_end]
-                    self._backup_chunk(backup, container, segment,
-                                       data_offset + extent_off,
-                                       object_meta, extra_metadata)
+        writer_pool = None
+        if self.max_chunks_in_flight > 1:
+            writer_pool = ChunkWriterPool(self.max_chunks_in_flight)
+        try:
+            while True:
+                # First of all, we check the status of this backup. If it
+                # has been changed to delete or has been deleted, we cancel
+                # the backup process to do forcing delete.
+                backup = objects.Backup.get_by_id(self.context, backup.id)
+                if backup.status in (fields.BackupStatus.DELETING,
+                                     fields.BackupStatus.DELETED):
+                    is_backup_canceled = True
+                    LOG.debug('Cancel the backup process of %s.', backup.id)
+                    break
+                data_offset = volume_file.tell()
+                data = volume_file.read(self.chunk_size_bytes)
+                if data == b'':
+                    break
+
+                # Calculate new shas with the datablock.
+                if writer_pool is not None:
+                    shalist = tpool.execute(self._calculate_sha256s, data)
+                else:
+                    shalist = self._calculate_sha256s(data)
+                sha256_list.extend(shalist)
+
+                # If parent_backup is not None, that means an incremental
+                # backup will be performed.
+                if parent_backup:
+                    # Find the extent that needs to be backed up.
                     extent_off = -1
-            else:  # Do a full backup.
-                self._backup_chunk(backup, container, data, data_offset,
-                                   object_meta, extra_metadata)
-
-            # Notifications
-            total_block_sent_num += self.data_block_num
-            counter += 1
-            if counter == self.data_block_num:
-                # Send the notification to Ceilometer when the chunk
-                # number reaches the data_block_num.  The backup percentage
-                # is put in the metadata as the extra information.
-                self._send_progress_notification(self.context, backup,
-                                                 object_meta,
-                                                 total_block_sent_num,
-                                                 volume_size_bytes)
-                # Reset the counter
-                counter = 0
+                    datalen = len(data)
+                    for idx, sha in enumerate(shalist):
+                        if sha != parent_backup_shalist[shaindex]:
+                            if extent_off == -1:
+                                # Start of new extent.
+                                extent_off = idx * self.sha_block_size_bytes
+                        else:
+                            if extent_off != -1:
+                                # We've reached the end of extent.
+                                extent_end = idx * self.sha_block_size_bytes
+                                segment = data[extent_off:extent_end]
+                                self._backup_chunk(backup, container,
+                                                   segment,
+                                                   data_offset + extent_off,
+                                                   object_meta,
+                                                   extra_metadata,
+                                                   writer_pool)
+                                extent_off = -1
+                        shaindex += 1
+
+                    # The last extent extends to the end of data buffer.
+                    if extent_off != -1:
+                        extent_end = datalen
+                        segment = data[extent_off:extent_end]
+                        self._backup_chunk(backup, container, segment,
+                                           data_offset + extent_off,
+                                           object_meta, extra_metadata,
+                                           writer_pool)
+                        extent_off = -1
+                else:  # Do a full backup.
+                    self._backup_chunk(backup, container, data, data_offset,
+                                       object_meta, extra_metadata,
+                                       writer_pool)
+
+                # Notifications
+                total_block_sent_num += self.data_block_num
+                counter += 1
+                if counter == self.data_block_num:
+                    # Send the notification to Ceilometer when the chunk
+                    # number reaches the data_block_num.  The backup
+                    # percentage is put in the metadata as the extra
+                    # information.
+                    self._send_progress_notification(self.context, backup,
+                                                     object_meta,
+                                                     total_block_sent_num,
+                                                     volume_size_bytes)
+                    # Reset the counter
+                    counter = 0
+        finally:
+            # Never leave chunk uploads running once we stop reading, so
+            # that a cancelled or failed backup cannot leave new objects
+            # behind after its cleanup.
+            if writer_pool is not None:
+                writer_pool.waitall()
+
+        if is_backup_canceled:
+            # To avoid the chunk left when deletion complete, need to
+            # clean up the object of chunk again.
+            self.delete(backup)
+        elif writer_pool is not None:
+            writer_pool.raise_error()
 
         # Stop the timer.
         timer.stop()
@@ -567,12 +841,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
 
         self._finalize_backup(backup, container, object_meta, object_sha256)
 
-    def _restore_v1(self, backup, volume_id, metadata, volume_file):
-        """Restore a v1 volume backup."""
-        backup_id = backup['id']
-        LOG.debug('v1 volume backup restore of %s started.', backup_id)
-        extra_metadata = metadata.get('extra_metadata')
-        container = backup['container']
+    def _verify_restore_objects(self, backup, metadata):
+        """Check that the repository holds every object in the metadata."""
         metadata_objects = metadata['objects']
         metadata_object_names = []
         for obj in metadata_objects:
@@ -588,8 +858,264 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     'does not match object list stored in metadata.')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
-            object_name, obj = list(metadata_object.items())[0]
+    def _restore_v1(self, backup, volume_id, metadata, volume_file):
+        """Restore a v1 volume backup."""
+        backup_id = backup['id']
+        LOG.debug('v1 volume backup restore of %s started.', backup_id)
+        extra_metadata = metadata.get('extra_metadata')
+        container = backup['container']
+        self._verify_restore_objects(backup, metadata)
+
+        restore_list = []
+        for object_name, obj in self._get_restore_entries(metadata):
+            extent = (obj['offset'], obj['offset'] + obj['length'])
+            restore_list.append((object_name, obj, [extent]))
+        self._restore_objects(backup_id, volume_id, container, restore_list,
+                              volume_file, extra_metadata)
+        LOG.debug('v1 volume backup restore of %s finished.',
+                  backup_id)
+
+    @staticmethod
+    def _get_restore_entries(metadata):
+        """Return the (object_name, obj) entries of a backup by offset.
+
+        Zero extents of sparse backups are returned with a None object name.
+        """
+        entries = [list(metadata_object.items())[0]
+                   for metadata_object in metadata['objects']]
+        entries.extend((None, zero_extent)
+                       for zero_extent in metadata.get('zero_extents', []))
+        entries.sort(key=lambda entry: entry[1]['offset'])
+        return entries
+
+    def _plan_chain_restore(self, backup_list, metadata_list):
+        """Work out which objects of a backup chain need to be restored.
+
+        backup_list and metadata_list go from the newest backup to the full
+        one. Returns a (backup, metadata, restore_list) tuple per backup,
+        oldest first, where restore_list only holds the objects that still
+        contain the newest data for some extent of the volume, each with
+        the (start, end) extents to write from it.
+        """
+        extent_map = RestoreExtentMap()
+        plan = []
+        for backup, metadata in zip(backup_list, metadata_list):
+            restore_list = []
+            entries = self._get_restore_entries(metadata)
+            for object_name, obj in reversed(entries):
+                extents = extent_map.claim(obj['offset'],
+                                           obj['offset'] + obj['length'])
+                if extents:
+                    restore_list.append((object_name, obj, extents))
+            restore_list.reverse()
+            LOG.debug('Restoring %(needed)d of %(total)d entries of backup '
+                      '%(backup_id)s.',
+                      {'needed': len(restore_list),
+                       'total': len(entries),
+                       'backup_id': backup['id']})
+            plan.append((backup, metadata, restore_list))
+        plan.reverse()
+        return plan
+
+    def _restore_chain(self, backup_list, metadata_list, volume_id,
+                       volume_file):
+        """Restore a chain of v1 backups, fetching each extent only once."""
+        for backup, metadata in zip(backup_list, metadata_list):
+            self._verify_restore_objects(backup, metadata)
+        for backup, metadata, restore_list in self._plan_chain_restore(
+                backup_list, metadata_list):
+            self._restore_objects(backup['id'], volume_id,
+                                  backup['container'], restore_list,
+                                  volume_file, metadata.get('extra_metadata'))
+
+    def _read_restore_object(self, container, object_name, obj,
+                             extra_metadata, use_native_threads=False):
+        """Fetch one backup object and return its decompressed data."""
+        with self.get_object_reader(
+                container, object_name,
+                extra_metadata=extra_metadata) as reader:
+            body = reader.read()
+        compression_algorithm = obj['compression']
+        decompressor = self._get_compressor(compression_algorithm)
+        if decompressor is None:
+            return body
+        LOG.debug('decompressing data using %s algorithm',
+                  compression_algorithm)
+        if use_native_threads:
+            return tpool.execute(decompressor.decompress, body)
+        return decompressor.decompress(body)
+
+    @staticmethod
+    def _get_stream_decompressor(algorithm):
+        if algorithm.lower() in ('zlib', 'gzip'):
+            import zlib
+            return zlib.decompressobj()
+        elif algorithm.lower() in ('bz2', 'bzip2'):
+            import bz2
+            return bz2.BZ2Decompressor()
+        return None
+
+    def _stream_restore_object(self, container, object_name, obj,
+                               extra_metadata):
+        """Yield the decompressed data of one backup object in pieces.
+
+        Uncompressed, zlib and bz2 objects are read and decompressed
+        RESTORE_READ_SIZE bytes at a time. Other algorithms cannot be
+        decompressed incrementally and the object is yielded in one piece.
+        """
+        compression_algorithm = obj['compression']
+        decompressor = None
+        if self._get_compressor(compression_algorithm) is not None:
+            decompressor = self._get_stream_decompressor(
+                compression_algorithm)
+            if decompressor is None:
+                yield self._read_restore_object(container, object_name, obj,
+                                                extra_metadata)
+                return
+            LOG.debug('decompressing data using %s algorithm',
+                      compression_algorithm)
+
+        with self.get_object_reader(
+                container, object_name,
+                extra_metadata=extra_metadata) as reader:
+            while True:
+                body = reader.read(RESTORE_READ_SIZE)
+                if not body:
+                    break
+                if decompressor is not None:
+                    body = decompressor.decompress(body)
+                if body:
+                    yield body
+        if hasattr(decompressor, 'flush'):
+            body = decompressor.flush()
+            if body:
+                yield body
+
+    def _iter_restore_data(self, container, restore_list, extra_metadata):
+        """Yield (object_name, obj, extents, pieces) for restore_list.
+
+        pieces iterates over the decompressed data of the object, and is
+        None for zero extents. Objects are streamed one at a time, unless
+        restore_objects_in_flight allows several objects to be fetched and
+        decompressed in green threads ahead of the one the caller is
+        writing.
+        """
+        if self.restore_objects_in_flight <= 1:
+            for object_name, obj, extents in restore_list:
+                pieces = None
+                if object_name is not None:
+                    pieces = self._stream_restore_object(
+                        container, object_name, obj, extra_metadata)
+                yield object_name, obj, extents, pieces
+            return
+
+        pending = iter(restore_list)
+        in_flight = collections.deque()
+
+        def _fetch_next():
+            for object_name, obj, extents in pending:
+                reader_thread = None
+                if object_name is not None:
+                    reader_thread = eventlet.spawn(
+                        self._read_restore_object, container, object_name,
+                        obj, extra_metadata, True)
+                in_flight.append((object_name, obj, extents, reader_thread))
+                return
+
+        for _i in range(self.restore_objects_in_flight):
+            _fetch_next()
+        try:
+            while in_flight:
+                object_name, obj, extents, reader_thread = in_flight.popleft()
+                pieces = None
+                if reader_thread is not None:
+                    pieces = [reader_thread.wait()]
+                _fetch_next()
+                yield object_name, obj, extents, pieces
+        finally:
+            for _name, _obj, _extents, reader_thread in in_flight:
+                if reader_thread is not None:
+                    reader_thread.kill()
+
+    @staticmethod
+    def _restore_data_extent(volume_file, fileno, use_pwrite, start, data,
+                             data_start, data_end):
+        """Write data[data_start:data_end] to the volume at start."""
+        if use_pwrite:
+            view = memoryview(data)[data_start:data_end]
+            while view:
+                written = os.pwrite(fileno, view, start)
+                view = view[written:]
+                start += written
+        else:
+            volume_file.seek(start)
+            if data_start == 0 and data_end == len(data):
+                volume_file.write(data)
+            else:
+                volume_file.write(data[data_start:data_end])
+
+    def _restore_zero_extent(self, volume_file, fileno, use_pwrite, start,
+                             end):
+        """Zero [start, end) of the volume, punching a hole if possible."""
+        if fileno is not None and _punch_hole(fileno, start, end - start):
+            return
+        zeros = b'\0' * min(end - start, self.chunk_size_bytes)
+        if not use_pwrite:
+            volume_file.seek(start)
+        while start < end:
+            piece = zeros[:end - start]
+            if use_pwrite:
+                while piece:
+                    written = os.pwrite(fileno, piece, start)
+                    piece = piece[written:]
+                    start += written
+            else:
+                volume_file.write(piece)
+                start += len(piece)
+
+    @staticmethod
+    def _sync_volume_file(volume_file, fileno):
+        volume_file.flush()
+        if fileno is not None:
+            os.fsync(fileno)
+
+    def _restore_objects(self, backup_id, volume_id, container, restore_list,
+                         volume_file, extra_metadata):
+        """Write the objects of restore_list to the volume.
+
+        restore_list holds (object_name, obj, extents) tuples, extents being
+        the (start, end) volume ranges to write from the object. Data is
+        written with positional writes when the volume file exposes a file
+        descriptor, and the volume is synced every restore_fsync_interval
+        objects and once at the end.
+        """
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info(_LI("volume_file does not support "
+                         "fileno() so skipping "
+                         "fsync()"))
+            fileno = None
+        use_pwrite = fileno is not None and hasattr(os, 'pwrite')
+        if use_pwrite:
+            # Positional writes bypass the file object's own buffer.
+            volume_file.flush()
+
+        restore_data = self._iter_restore_data(container, restore_list,
+                                               extra_metadata)
+        try:
+            self._write_restore_data(backup_id, volume_id, container,
+                                     restore_data, volume_file, fileno,
+                                     use_pwrite)
+        finally:
+            # Stops any prefetch still in flight if the restore failed.
+            restore_data.close()
+
+    def _write_restore_data(self, backup_id, volume_id, container,
+                            restore_data, volume_file, fileno, use_pwrite):
+        unsynced = 0
+        for object_name, obj, extents, pieces in restore_data:
             LOG.debug('restoring object. backup: %(backup_id)s, '
                       'container: %(container)s, object name: '
                       '%(object_name)s, volume: %(volume_id)s.',
@@ -599,41 +1125,38 @@ class ChunkedBackupDriver(driver.BackupDriver):
                           'object_name': object_name,
                           'volume_id': volume_id,
                       })
-
-            with self.get_object_reader(
-                    container, object_name,
-                    extra_metadata=extra_metadata) as reader:
-                body = reader.read()
-            compression_algorithm = metadata_object[object_name]['compression']
-            decompressor = self._get_compressor(compression_algorithm)
-            volume_file.seek(obj['offset'])
-            if decompressor is not None:
-                LOG.debug('decompressing data using %s algorithm',
-                          compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
-            else:
-                volume_file.write(body)
-
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
-
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info(_LI("volume_file does not support "
-                             "fileno() so skipping "
-                             "fsync()"))
+            if pieces is None:
+                for start, end in extents:
+                    self._restore_zero_extent(volume_file, fileno,
+                                              use_pwrite, start, end)
             else:
-                os.fsync(fileno)
+                piece_start = obj['offset']
+                for piece in pieces:
+                    piece_end = piece_start + len(piece)
+                    for start, end in extents:
+                        start = max(start, piece_start)
+                        end = min(end, piece_end)
+                        if start < end:
+                            self._restore_data_extent(
+                                volume_file, fileno, use_pwrite, start,
+                                piece, start - piece_start,
+                                end - piece_start)
+                    piece_start = piece_end
+
+            unsynced += 1
+            if (self.restore_fsync_interval and
+                    unsynced >= self.restore_fsync_interval):
+                # Flush regularly to avoid a long blocking write on close
+                self._sync_volume_file(volume_file, fileno)
+                unsynced = 0
 
             # Restoring a backup to a volume can take some time. Yield so other
             # threads can run, allowing for among other things the service
             # status to be updated
             eventlet.sleep(0)
-        LOG.debug('v1 volume backup restore of %s finished.',
-                  backup_id)
+
+        if unsynced:
+            self._sync_volume_file(volume_file, fileno)
 
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from backup repository."""
@@ -671,16 +1194,24 @@ class ChunkedBackupDriver(driver.BackupDriver):
             backup_list.append(prev_backup)
             current_backup = prev_backup
 
-        # Do a full restore first, then layer the incremental backups
-        # on top of it in order.
-        index = len(backup_list) - 1
-        while index >= 0:
-            backup1 = backup_list[index]
-            index = index - 1
-            metadata = self._read_metadata(backup1)
-            restore_func(backup1, volume_id, metadata, volume_file)
-
-            volume_meta = metadata.get('volume_meta', None)
+        metadata_list = [metadata]
+        for prev_backup in backup_list[1:]:
+            metadata_list.append(self._read_metadata(prev_backup))
+
+        if all(self.DRIVER_VERSION_MAPPING.get(m['version']) == '_restore_v1'
+               for m in metadata_list):
+            # Only fetch the newest version of every extent of the volume.
+            self._restore_chain(backup_list, metadata_list, volume_id,
+                                volume_file)
+        else:
+            # Do a full restore first, then layer the incremental backups
+            # on top of it in order.
+            for backup1, metadata1 in reversed(list(zip(backup_list,
+                                                        metadata_list))):
+                restore_func(backup1, volume_id, metadata1, volume_file)
+
+        for metadata1 in reversed(metadata_list):
+            volume_meta = metadata1.get('volume_meta', None)
             try:
                 if volume_meta:
                     self.put_metadata(volume_id, volume_meta)
@@ -36,7 +36,8 @@
                                     failed Swift operations (default: 10).
 :backup_compression_algorithm: Compression algorithm to use for volume
                                backups. Supported options are:
-                               None (to disable), zlib and bz2 (default: zlib)
+                               None (to disable), zlib, bz2, lz4 and zstd
+                               (default: zlib)
 :backup_swift_ca_cert_file: The location of the CA certificate file to use
                             for swift client requests (default: None)
 :backup_swift_auth_insecure: If true, bypass verification of server's
@@ -46,10 +47,10 @@
 import hashlib
 import socket
 
+from eventlet import pools
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import timeutils
-import six
 from swiftclient import client as swift
 
 from cinder.backup import chunkeddriver
@@ -198,13 +199,24 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
         LOG.debug('Connect to %s in "%s" mode', CONF.backup_swift_url,
                   CONF.backup_swift_auth)
         self.backup_swift_auth_insecure = CONF.backup_swift_auth_insecure
+        self.conn = self._create_connection()
+        self.conn_pool = None
+        max_requests = max(self.max_chunks_in_flight,
+                           self.restore_objects_in_flight)
+        if max_requests > 1:
+            # A swiftclient connection must not be shared by concurrent
+            # requests, so every object transfer in flight gets its own.
+            self.conn_pool = pools.Pool(max_size=max_requests,
+                                        create=self._create_connection)
+
+    def _create_connection(self):
         if CONF.backup_swift_auth == 'single_user':
             if CONF.backup_swift_user is None:
                 LOG.error(_LE("single_user auth mode enabled, "
                               "but %(param)s not set"),
                           {'param': 'backup_swift_user'})
                 raise exception.ParameterNotFound(param='backup_swift_user')
-            self.conn = swift.Connection(
+            return swift.Connection(
                 authurl=self.auth_url,
                 auth_version=CONF.backup_swift_auth_version,
                 tenant_name=CONF.backup_swift_tenant,
@@ -215,20 +227,62 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
                 insecure=self.backup_swift_auth_insecure,
                 cacert=CONF.backup_swift_ca_cert_file)
         else:
-            self.conn = swift.Connection(retries=self.swift_attempts,
-                                         preauthurl=self.swift_url,
-                                         preauthtoken=self.context.auth_token,
-                                         starting_backoff=self.swift_backoff,
-                                         insecure= (
-                                             self.backup_swift_auth_insecure),
-                                         cacert=CONF.backup_swift_ca_cert_file)
+            return swift.Connection(retries=self.swift_attempts,
+                                    preauthurl=self.swift_url,
+                                    preauthtoken=self.context.auth_token,
+                                    starting_backoff=self.swift_backoff,
+                                    insecure= (
+                                        self.backup_swift_auth_insecure),
+                                    cacert=CONF.backup_swift_ca_cert_file)
+
+    class SwiftObjectBody(object):
+        """File-like body of a PUT request over the written pieces.
+
+        The MD5 of the data is computed as swiftclient reads it, and
+        seek(0) restarts the body so that the request can be retried.
+        """
+        def __init__(self, pieces):
+            self.pieces = pieces
+            self.seek(0)
+
+        def seek(self, offset, whence=0):
+            if offset != 0 or whence != 0:
+                raise IOError(_('Swift object bodies can only be rewound.'))
+            self.index = 0
+            self.offset = 0
+            self.position = 0
+            self.md5 = hashlib.md5()
+
+        def tell(self):
+            return self.position
+
+        def read(self, size=-1):
+            chunks = []
+            while self.index < len(self.pieces) and size != 0:
+                piece = self.pieces[self.index]
+                if size < 0 or len(piece) - self.offset <= size:
+                    chunk = piece[self.offset:]
+                    self.index += 1
+                    self.offset = 0
+                else:
+                    chunk = piece[self.offset:self.offset + size]
+                    self.offset += size
+                if size > 0:
+                    size -= len(chunk)
+                chunks.append(chunk)
+            data = b''.join(chunks)
+            self.md5.update(data)
+            self.position += len(data)
+            return data
 
     class SwiftObjectWriter(object):
-        def __init__(self, container, object_name, conn):
+        def __init__(self, container, object_name, conn, conn_pool=None):
             self.container = container
             self.object_name = object_name
             self.conn = conn
-            self.data = bytearray()
+            self.conn_pool = conn_pool
+            self.pieces = []
+            self.length = 0
 
         def __enter__(self):
             return self
@@ -237,19 +291,32 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
             self.close()
 
         def write(self, data):
-            self.data += data
+            # Keep a reference to the caller's data rather than copying it,
+            # unless it could still be changed by the caller.
+            if isinstance(data, bytearray):
+                data = bytes(data)
+            self.pieces.append(data)
+            self.length += len(data)
+
+        def _put_object(self, conn, body):
+            return conn.put_object(self.container, self.object_name,
+                                   body, content_length=self.length)
 
         def close(self):
-            reader = six.BytesIO(self.data)
+            body = SwiftBackupDriver.SwiftObjectBody(self.pieces)
             try:
-                etag = self.conn.put_object(self.container, self.object_name,
-                                            reader,
-                                            content_length=len(self.data))
+                if self.conn_pool is None:
+                    etag = self._put_object(self.conn, body)
+                else:
+                    with self.conn_pool.item() as conn:
+                        etag = self._put_object(conn, body)
             except socket.error as err:
                 raise exception.SwiftConnectionFailed(reason=err)
+            finally:
+                self.pieces = []
             LOG.debug('swift MD5 for %(object_name)s: %(etag)s',
                       {'object_name': self.object_name, 'etag': etag, })
-            md5 = hashlib.md5(self.data).hexdigest()
+            md5 = body.md5.hexdigest()
             LOG.debug('backup MD5 for %(object_name)s: %(md5)s',
                       {'object_name': self.object_name, 'md5': md5})
             if etag != md5:
@@ -260,25 +327,77 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
             return md5
 
     class SwiftObjectReader(object):
-        def __init__(self, container, object_name, conn):
+        """Reads a whole object, or streams it with sized reads.
+
+        A streaming GET keeps its connection until the reader is closed.
+        """
+        def __init__(self, container, object_name, conn, conn_pool=None):
             self.container = container
             self.object_name = object_name
             self.conn = conn
+            self.conn_pool = conn_pool
+            self.stream_conn = None
+            self.body = None
+            self.buffer = b''
 
         def __enter__(self):
             return self
 
         def __exit__(self, exc_type, exc_value, traceback):
-            pass
+            self.close()
 
-        def read(self):
+        def close(self):
+            if self.body is not None and hasattr(self.body, 'close'):
+                self.body.close()
+            self.body = None
+            if self.stream_conn is not None:
+                self.conn_pool.put(self.stream_conn)
+                self.stream_conn = None
+
+        def _get_object(self, conn, **kwargs):
             try:
-                (_resp, body) = self.conn.get_object(self.container,
-                                                     self.object_name)
+                (_resp, body) = conn.get_object(self.container,
+                                                self.object_name, **kwargs)
             except socket.error as err:
                 raise exception.SwiftConnectionFailed(reason=err)
             return body
 
+        def _next_chunk(self):
+            try:
+                return next(self.body)
+            except StopIteration:
+                return b''
+            except socket.error as err:
+                raise exception.SwiftConnectionFailed(reason=err)
+
+        def read(self, size=-1):
+            if self.body is None:
+                if size is None or size < 0:
+                    if self.conn_pool is None:
+                        return self._get_object(self.conn)
+                    with self.conn_pool.item() as conn:
+                        return self._get_object(conn)
+                conn = self.conn
+                if self.conn_pool is not None:
+                    conn = self.stream_conn = self.conn_pool.get()
+                self.body = iter(self._get_object(conn,
+                                                  resp_chunk_size=size))
+
+            chunks = [self.buffer] if self.buffer else []
+            length = len(self.buffer)
+            while size is None or size < 0 or length < size:
+                chunk = self._next_chunk()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                length += len(chunk)
+            data = b''.join(chunks)
+            if size is None or size < 0 or length <= size:
+                self.buffer = b''
+                return data
+            self.buffer = data[size:]
+            return data[:size]
+
     def put_container(self, container):
         """Create the container if needed. No failure if it pre-exists."""
         try:
@@ -304,7 +423,8 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
         Returns a writer object that stores a chunk of volume data in a
         Swift object store.
         """
-        return self.SwiftObjectWriter(container, object_name, self.conn)
+        return self.SwiftObjectWriter(container, object_name, self.conn,
+                                      conn_pool=self.conn_pool)
 
     def get_object_reader(self, container, object_name, extra_metadata=None):
         """Return reader object.
@@ -312,7 +432,8 @@ class SwiftBackupDriver(chunkeddriver.ChunkedBackupDriver):
         Returns a reader object that retrieves a chunk of backed-up volume data
         from a Swift object store.
         """
-        return self.SwiftObjectReader(container, object_name, self.conn)
+        return self.SwiftObjectReader(container, object_name, self.conn,
+                                      conn_pool=self.conn_pool)
 
     def delete_object(self, container, object_name):
         """Deletes a backup object from a Swift object store."""
@@ -197,9 +197,9 @@ class LVM(executor.Executor):
         """
 
         cmd = LVM.LVM_CMD_PREFIX + ['vgs', '--version']
-        (out, _err) = putils.execute(*cmd,
-                                     root_helper=root_helper,
-                                     run_as_root=True)
+        (out, _err) = utils.execute(*cmd,
+                                    root_helper=root_helper,
+                                    run_as_root=True)
         lines = out.split('\n')
 
         for line in lines:
@@ -277,9 +277,9 @@ class LVM(executor.Executor):
             cmd.append(vg_name)
 
         try:
-            (out, _err) = putils.execute(*cmd,
-                                         root_helper=root_helper,
-                                         run_as_root=True)
+            (out, _err) = utils.execute(*cmd,
+                                        root_helper=root_helper,
+                                        run_as_root=True)
         except putils.ProcessExecutionError as err:
             with excutils.save_and_reraise_exception(reraise=True) as ctx:
                 if "not found" in err.stderr or "Failed to find" in err.stderr:
@@ -335,9 +335,9 @@ class LVM(executor.Executor):
                                     '-o', 'vg_name,name,size,free',
                                     '--separator', field_sep,
                                     '--nosuffix']
-        (out, _err) = putils.execute(*cmd,
-                                     root_helper=root_helper,
-                                     run_as_root=True)
+        (out, _err) = utils.execute(*cmd,
+                                    root_helper=root_helper,
+                                    run_as_root=True)
 
         pvs = out.split()
         if vg_name is not None:
@@ -379,9 +379,9 @@ class LVM(executor.Executor):
         if vg_name is not None:
             cmd.append(vg_name)
 
-        (out, _err) = putils.execute(*cmd,
-                                     root_helper=root_helper,
-                                     run_as_root=True)
+        (out, _err) = utils.execute(*cmd,
+                                    root_helper=root_helper,
+                                    run_as_root=True)
         vg_list = []
         if out is not None:
             vgs = out.split()
@@ -221,14 +221,22 @@ class DbCommands(object):
 
     @args('age_in_days', type=int,
           help='Purge deleted rows older than age in days')
-    def purge(self, age_in_days):
+    @args('--batch_size', type=int, default=1000,
+          help='Number of rows deleted at a time from each table')
+    @args('--pause', type=float, default=0,
+          help='Seconds to wait between two batches of deleted rows')
+    def purge(self, age_in_days, batch_size=1000, pause=0):
         """Purge deleted rows older than a given age from cinder tables."""
         age_in_days = int(age_in_days)
         if age_in_days <= 0:
             print(_("Must supply a positive, non-zero value for age"))
             exit(1)
+        if batch_size <= 0:
+            print(_("Must supply a positive, non-zero value for batch size"))
+            exit(1)
         ctxt = context.get_admin_context()
-        db.purge_deleted_rows(ctxt, age_in_days)
+        db.purge_deleted_rows(ctxt, age_in_days, batch_size=batch_size,
+                              pause=pause)
 
 
 class VersionCommands(object):
@@ -46,6 +46,7 @@ from cinder import context
 from cinder import db
 from cinder.i18n import _, _LE
 from cinder import objects
+from cinder.objects import base as objects_base
 from cinder import rpc
 from cinder import utils
 from cinder import version
@@ -66,10 +67,63 @@ script_opts = [
                 default=False,
                 help="Send the volume and snapshot create and delete "
                      "notifications generated in the specified period."),
+    cfg.IntOpt('audit_batch_size',
+               default=1000,
+               min=1,
+               help="Number of volumes or snapshots loaded from the "
+                    "database at a time."),
+    cfg.IntOpt('audit_partitions',
+               default=1,
+               min=1,
+               help="Number of instances of the script that run in "
+                    "parallel, each of them auditing a different range of "
+                    "volume and snapshot IDs."),
+    cfg.IntOpt('audit_partition',
+               default=0,
+               min=0,
+               help="The range of volume and snapshot IDs audited by this "
+                    "instance of the script, from 0 to audit_partitions "
+                    "- 1."),
 ]
 CONF.register_cli_opts(script_opts)
 
 
+def _get_id_range(partition, partitions):
+    """Return the (marker, end_marker) of the IDs of a partition.
+
+    The IDs are UUIDs, so their first four hex digits are used to split
+    them evenly.
+    """
+    bounds = ['%04x' % (i * 0x10000 // partitions)
+              for i in range(1, partitions)]
+    marker = bounds[partition - 1] if partition > 0 else None
+    end_marker = bounds[partition] if partition < len(bounds) else None
+    return marker, end_marker
+
+
+def _get_snapshots_page(context, begin, end, **kwargs):
+    snapshots = db.snapshot_get_active_by_window(context, begin, end,
+                                                 **kwargs)
+    return objects_base.obj_make_list(context, objects.SnapshotList(context),
+                                      objects.Snapshot, snapshots,
+                                      expected_attrs=['metadata'])
+
+
+def _get_active_by_window(get_page, context, begin, end, marker, end_marker):
+    """Yield the resources active during the window, a page at a time.
+
+    Only one page of resources is kept in memory, instead of all of them.
+    """
+    while True:
+        page = get_page(context, begin, end, marker=marker,
+                        limit=CONF.audit_batch_size, end_marker=end_marker)
+        for resource in page:
+            yield resource
+        if len(page) < CONF.audit_batch_size:
+            return
+        marker = page[-1].id
+
+
 def main():
     objects.register_all()
     admin_context = context.get_admin_context()
@@ -91,6 +145,15 @@ def main():
                                         'end': end}
         LOG.error(msg)
         sys.exit(-1)
+    if CONF.audit_partition >= CONF.audit_partitions:
+        msg = _("The audit partition (%(partition)d) must be lower than the "
+                "number of partitions (%(partitions)d).") % {
+            'partition': CONF.audit_partition,
+            'partitions': CONF.audit_partitions}
+        LOG.error(msg)
+        sys.exit(-1)
+    marker, end_marker = _get_id_range(CONF.audit_partition,
+                                       CONF.audit_partitions)
     LOG.debug("Starting volume usage audit")
     msg = _("Creating usages for %(begin_period)s until %(end_period)s")
     LOG.debug(msg, {"begin_period": str(begin), "end_period": str(end)})
@@ -100,11 +163,12 @@ def main():
         'audit_period_ending': str(end),
     }
 
-    volumes = db.volume_get_active_by_window(admin_context,
-                                             begin,
-                                             end)
-    LOG.debug("Found %d volumes", len(volumes))
+    volumes = _get_active_by_window(db.volume_usage_get_active_by_window,
+                                    admin_context, begin, end,
+                                    marker, end_marker)
+    volume_count = 0
     for volume_ref in volumes:
+        volume_count += 1
         try:
             LOG.debug("Send exists notification for <volume_id: "
                       "%(volume_id)s> <project_id %(project_id)s> "
@@ -172,10 +236,13 @@ def main():
                 LOG.exception(_LE("Delete volume notification failed: %s"),
                               exc_msg, resource=volume_ref)
 
-    snapshots = objects.SnapshotList.get_active_by_window(admin_context,
-                                                          begin, end)
-    LOG.debug("Found %d snapshots", len(snapshots))
+    LOG.debug("Found %d volumes", volume_count)
+
+    snapshots = _get_active_by_window(_get_snapshots_page, admin_context,
+                                      begin, end, marker, end_marker)
+    snapshot_count = 0
     for snapshot_ref in snapshots:
+        snapshot_count += 1
         try:
             LOG.debug("Send notification for <snapshot_id: %(snapshot_id)s> "
                       "<project_id %(project_id)s> <%(extra_info)s>",
@@ -242,4 +309,6 @@ def main():
                 LOG.exception(_LE("Delete snapshot notification failed: %s"),
                               exc_msg, resource=snapshot_ref)
 
+    LOG.debug("Found %d snapshots", snapshot_count)
+
     LOG.debug("Volume usage audit completed")
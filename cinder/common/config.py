@@ -152,6 +152,12 @@ global_opts = [
                default='/etc/cinder/rootwrap.conf',
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run commands as root through a long lived '
+                     'cinder-rootwrap-daemon process instead of starting '
+                     'cinder-rootwrap for each command. Requires sudo to '
+                     'allow cinder-rootwrap-daemon.'),
     cfg.BoolOpt('monkey_patch',
                 default=False,
                 help='Enable monkey patching'),
@@ -181,6 +181,23 @@ def volume_data_get_for_host(context, host, count_only=False):
                                          count_only)
 
 
+def volume_count_get_for_hosts(context, hosts):
+    """Get a dict of the number of volumes of each of the hosts.
+
+    The volumes of the pools of a host are included in its count.
+    """
+    return IMPL.volume_count_get_for_hosts(context, hosts)
+
+
+def volume_size_get_by_pool(context, host, statuses):
+    """Get a dict of the gigabytes of the volumes in each pool of a host.
+
+    Only the volumes in one of the given statuses are counted. Volumes
+    created before pools were introduced have no pool and are left out.
+    """
+    return IMPL.volume_size_get_by_pool(context, host, statuses)
+
+
 def volume_data_get_for_project(context, project_id):
     """Get (volume_count, gigabytes) for project."""
     return IMPL.volume_data_get_for_project(context, project_id)
@@ -352,12 +369,17 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
                                               volume_type_id)
 
 
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None, end_marker=None):
     """Get all the snapshots inside the window.
 
     Specifying a project_id will filter for a certain project.
+    When a marker, limit or end_marker is given the snapshots are sorted
+    by id, and only those with an id between marker and end_marker are
+    returned.
     """
-    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id)
+    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id,
+                                              marker, limit, end_marker)
 
 
 ####################
@@ -516,6 +538,19 @@ def volume_get_active_by_window(context, begin, end=None, project_id=None):
     return IMPL.volume_get_active_by_window(context, begin, end, project_id)
 
 
+def volume_usage_get_active_by_window(context, begin, end=None,
+                                      project_id=None, marker=None,
+                                      limit=None, end_marker=None):
+    """Get a page of the volumes inside the window, sorted by id.
+
+    Only the fields needed by usage notifications and the metadata are
+    loaded. The volumes returned have an id between marker and end_marker.
+    """
+    return IMPL.volume_usage_get_active_by_window(context, begin, end,
+                                                  project_id, marker, limit,
+                                                  end_marker)
+
+
 def volume_type_access_get_all(context, type_id):
     """Get all volume type access of a volume type."""
     return IMPL.volume_type_access_get_all(context, type_id)
@@ -1030,13 +1065,17 @@ def cgsnapshot_destroy(context, cgsnapshot_id):
     return IMPL.cgsnapshot_destroy(context, cgsnapshot_id)
 
 
-def purge_deleted_rows(context, age_in_days):
+def purge_deleted_rows(context, age_in_days, batch_size=None, pause=0):
     """Purge deleted rows older than given age from cinder tables
 
-    Raises InvalidParameterValue if age_in_days is incorrect.
+    When batch_size is given, the rows of each table are deleted batch_size
+    at a time, waiting pause seconds between batches.
+
+    Raises InvalidParameterValue if age_in_days or batch_size is incorrect.
     :returns: number of deleted rows
     """
-    return IMPL.purge_deleted_rows(context, age_in_days=age_in_days)
+    return IMPL.purge_deleted_rows(context, age_in_days=age_in_days,
+                                   batch_size=batch_size, pause=pause)
 
 
 def get_booleans_for_table(table_name):
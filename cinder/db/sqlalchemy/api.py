@@ -40,9 +40,8 @@ import six
 import sqlalchemy
 from sqlalchemy import MetaData
 from sqlalchemy import or_, and_, case
-from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import joinedload, joinedload_all, load_only
 from sqlalchemy.orm import RelationshipProperty
-from sqlalchemy.schema import Table
 from sqlalchemy import sql
 from sqlalchemy.sql.expression import desc
 from sqlalchemy.sql.expression import literal_column
@@ -272,10 +271,69 @@ def model_query(context, *args, **kwargs):
     return query
 
 
+# quota_reserve may refresh the usage of several resources of a project in
+# one call, for instance volumes, gigabytes, volumes_<type> and
+# gigabytes_<type> for a typed volume. The sync functions below share one
+# aggregate query per table, grouped by volume type, through the session.
+
+def _quota_usage_totals(session, key, query):
+    """Runs a (group, count, size) query once per session."""
+    totals = session.info.setdefault('quota_usage_totals', {})
+    if key not in totals:
+        totals[key] = {type_id: (count or 0, size or 0)
+                       for type_id, count, size in query.all()}
+    return totals[key]
+
+
+def _volume_usage_by_type(context, project_id, session):
+    query = model_query(context,
+                        models.Volume.volume_type_id,
+                        func.count(models.Volume.id),
+                        func.sum(models.Volume.size),
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id).\
+        group_by(models.Volume.volume_type_id)
+    return _quota_usage_totals(session, ('volumes', project_id), query)
+
+
+def _snapshot_usage_by_type(context, project_id, session):
+    query = session.query(models.Volume.volume_type_id,
+                          func.count(models.Snapshot.id),
+                          func.sum(models.Snapshot.volume_size)).\
+        select_from(models.Snapshot).\
+        outerjoin(models.Volume,
+                  models.Snapshot.volume_id == models.Volume.id).\
+        filter(models.Snapshot.project_id == project_id).\
+        filter(models.Snapshot.deleted == sql.false()).\
+        group_by(models.Volume.volume_type_id)
+    return _quota_usage_totals(session, ('snapshots', project_id), query)
+
+
+def _backup_usage(context, project_id, session):
+    query = model_query(context,
+                        models.Backup.project_id,
+                        func.count(models.Backup.id),
+                        func.sum(models.Backup.size),
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id).\
+        group_by(models.Backup.project_id)
+    return _quota_usage_totals(session, ('backups', project_id), query)
+
+
+def _sum_usage(usage_by_type, volume_type_id=None):
+    """Returns the count and size of one volume type, or of all of them."""
+    if volume_type_id:
+        return usage_by_type.get(volume_type_id, (0, 0))
+    return (sum(count for count, _size in usage_by_type.values()),
+            sum(size for _count, size in usage_by_type.values()))
+
+
 def _sync_volumes(context, project_id, session, volume_type_id=None,
                   volume_type_name=None):
-    (volumes, _gigs) = _volume_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (volumes, _gigs) = _sum_usage(
+        _volume_usage_by_type(context, project_id, session), volume_type_id)
     key = 'volumes'
     if volume_type_name:
         key += '_' + volume_type_name
@@ -284,8 +342,9 @@ def _sync_volumes(context, project_id, session, volume_type_id=None,
 
 def _sync_snapshots(context, project_id, session, volume_type_id=None,
                     volume_type_name=None):
-    (snapshots, _gigs) = _snapshot_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (snapshots, _gigs) = _sum_usage(
+        _snapshot_usage_by_type(context, project_id, session),
+        volume_type_id)
     key = 'snapshots'
     if volume_type_name:
         key += '_' + volume_type_name
@@ -294,23 +353,24 @@ def _sync_snapshots(context, project_id, session, volume_type_id=None,
 
 def _sync_backups(context, project_id, session, volume_type_id=None,
                   volume_type_name=None):
-    (backups, _gigs) = _backup_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (backups, _gigs) = _sum_usage(
+        _backup_usage(context, project_id, session))
     key = 'backups'
     return {key: backups}
 
 
 def _sync_gigabytes(context, project_id, session, volume_type_id=None,
                     volume_type_name=None):
-    (_junk, vol_gigs) = _volume_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (_junk, vol_gigs) = _sum_usage(
+        _volume_usage_by_type(context, project_id, session), volume_type_id)
     key = 'gigabytes'
     if volume_type_name:
         key += '_' + volume_type_name
     if CONF.no_snapshot_gb_quota:
         return {key: vol_gigs}
-    (_junk, snap_gigs) = _snapshot_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (_junk, snap_gigs) = _sum_usage(
+        _snapshot_usage_by_type(context, project_id, session),
+        volume_type_id)
     return {key: vol_gigs + snap_gigs}
 
 
@@ -326,8 +386,8 @@ def _sync_consistencygroups(context, project_id, session,
 def _sync_backup_gigabytes(context, project_id, session, volume_type_id=None,
                            volume_type_name=None):
     key = 'backup_gigabytes'
-    (_junk, backup_gigs) = _backup_data_get_for_project(
-        context, project_id, volume_type_id=volume_type_id, session=session)
+    (_junk, backup_gigs) = _sum_usage(
+        _backup_usage(context, project_id, session))
     return {key: backup_gigs}
 
 
@@ -746,17 +806,22 @@ def _quota_usage_create(context, project_id, resource, in_use, reserved,
 ###################
 
 
-def _reservation_create(context, uuid, usage, project_id, resource, delta,
-                        expire, session=None):
-    reservation_ref = models.Reservation()
-    reservation_ref.uuid = uuid
-    reservation_ref.usage_id = usage['id']
-    reservation_ref.project_id = project_id
-    reservation_ref.resource = resource
-    reservation_ref.delta = delta
-    reservation_ref.expire = expire
-    reservation_ref.save(session=session)
-    return reservation_ref
+def _reservations_create(context, usages, project_id, deltas, expire,
+                         session):
+    """Creates the reservations of deltas with a single insert.
+
+    Returns the reservation uuids.
+    """
+    rows = [{'uuid': str(uuid.uuid4()),
+             'usage_id': usages[resource]['id'],
+             'project_id': project_id,
+             'resource': resource,
+             'delta': delta,
+             'expire': expire}
+            for resource, delta in deltas.items()]
+    if rows:
+        session.execute(models.Reservation.__table__.insert(), rows)
+    return [row['uuid'] for row in rows]
 
 
 ###################
@@ -881,16 +946,10 @@ def quota_reserve(context, resources, quotas, deltas, expire,
 
         # Create the reservations
         if not overs:
-            reservations = []
+            reservations = _reservations_create(elevated, usages,
+                                                project_id, deltas, expire,
+                                                session)
             for resource, delta in deltas.items():
-                reservation = _reservation_create(elevated,
-                                                  str(uuid.uuid4()),
-                                                  usages[resource],
-                                                  project_id,
-                                                  resource, delta, expire,
-                                                  session=session)
-                reservations.append(reservation.uuid)
-
                 # Also update the reserved quantity
                 # NOTE(Vek): Again, we are only concerned here about
                 #            positive increments.  Here, though, we're
@@ -1138,6 +1197,50 @@ def volume_data_get_for_host(context, host, count_only=False):
         return (result[0] or 0, result[1] or 0)
 
 
+@require_admin_context
+def volume_count_get_for_hosts(context, hosts):
+    host_attr = models.Volume.host
+    conditions = []
+    for host in set(hosts):
+        conditions.extend([host_attr == host,
+                           host_attr.op('LIKE')(host + '#%')])
+    counts = dict.fromkeys(hosts, 0)
+    if not conditions:
+        return counts
+
+    rows = model_query(context, host_attr, func.count(models.Volume.id),
+                       read_deleted="no").\
+        filter(or_(*conditions)).\
+        group_by(host_attr).\
+        all()
+    for volume_host, count in rows:
+        # A volume of host@backend#pool counts for host@backend too.
+        parts = volume_host.split('#')
+        for i in range(1, len(parts) + 1):
+            host = '#'.join(parts[:i])
+            if host in counts:
+                counts[host] += count
+    return counts
+
+
+@require_admin_context
+def volume_size_get_by_pool(context, host, statuses):
+    host_attr = models.Volume.host
+    rows = model_query(context, host_attr, func.sum(models.Volume.size),
+                       read_deleted="no").\
+        filter(host_attr.op('LIKE')(host + '#%')).\
+        filter(models.Volume.status.in_(statuses)).\
+        group_by(host_attr).\
+        all()
+    # '_' and '%' in the host are LIKE wildcards, so check the host again.
+    pools = {}
+    for volume_host, size in rows:
+        volume_host, pool = volume_host.split('#', 1)
+        if volume_host == host:
+            pools[pool] = size or 0
+    return pools
+
+
 @require_admin_context
 def _volume_data_get_for_project(context, project_id, volume_type_id=None,
                                  session=None):
@@ -2291,19 +2394,46 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
     return _snapshot_data_get_for_project(context, project_id, volume_type_id)
 
 
+def _active_by_window_query(context, model, begin, end, project_id):
+    query = model_query(context, model, read_deleted="yes")
+    query = query.filter(or_(model.deleted_at == None,  # noqa
+                             model.deleted_at > begin))
+    if end:
+        query = query.filter(model.created_at < end)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    return query
+
+
+def _paginate_by_id(query, model, marker, limit, end_marker):
+    """Keyset pagination on the id of the rows.
+
+    Unlike _generate_paginate_query, the marker does not need to be looked
+    up, so any string can be used to start or stop at a range of ids.
+    """
+    if marker is None and limit is None and end_marker is None:
+        return query
+    if marker is not None:
+        query = query.filter(model.id > marker)
+    if end_marker is not None:
+        query = query.filter(model.id < end_marker)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
 @require_context
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None, end_marker=None):
     """Return snapshots that were active during window."""
 
-    query = model_query(context, models.Snapshot, read_deleted="yes")
-    query = query.filter(or_(models.Snapshot.deleted_at == None,  # noqa
-                             models.Snapshot.deleted_at > begin))
+    query = _active_by_window_query(context, models.Snapshot, begin, end,
+                                    project_id)
     query = query.options(joinedload(models.Snapshot.volume))
     query = query.options(joinedload('snapshot_metadata'))
-    if end:
-        query = query.filter(models.Snapshot.created_at < end)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
+    query = _paginate_by_id(query, models.Snapshot, marker, limit,
+                            end_marker)
 
     return query.all()
 
@@ -2765,14 +2895,8 @@ def volume_get_active_by_window(context,
                                 end=None,
                                 project_id=None):
     """Return volumes that were active during window."""
-    query = model_query(context, models.Volume, read_deleted="yes")
-    query = query.filter(or_(models.Volume.deleted_at == None,  # noqa
-                             models.Volume.deleted_at > begin))
-    if end:
-        query = query.filter(models.Volume.created_at < end)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-
+    query = _active_by_window_query(context, models.Volume, begin, end,
+                                    project_id)
     query = (query.options(joinedload('volume_metadata')).
              options(joinedload('volume_type')).
              options(joinedload('volume_attachment')).
@@ -2784,6 +2908,29 @@ def volume_get_active_by_window(context,
     return query.all()
 
 
+# The fields used by cinder.volume.utils.notify_about_volume_usage.
+_VOLUME_USAGE_FIELDS = ('project_id', 'user_id', 'host', 'availability_zone',
+                        'volume_type_id', 'display_name', 'launched_at',
+                        'created_at', 'deleted_at', 'status', 'snapshot_id',
+                        'size', 'replication_status',
+                        'replication_extended_status',
+                        'replication_driver_data')
+
+
+@require_context
+def volume_usage_get_active_by_window(context, begin, end=None,
+                                      project_id=None, marker=None,
+                                      limit=None, end_marker=None):
+    """Return the usage of the volumes that were active during window."""
+    query = _active_by_window_query(context, models.Volume, begin, end,
+                                    project_id)
+    query = query.options(load_only(*_VOLUME_USAGE_FIELDS),
+                          joinedload('volume_metadata'))
+    query = _paginate_by_id(query, models.Volume, marker, limit, end_marker)
+
+    return query.all()
+
+
 def _volume_type_access_query(context, session=None):
     return model_query(context, models.VolumeTypeProjects, session=session,
                        read_deleted="int_no")
@@ -4001,9 +4148,51 @@ def cgsnapshot_destroy(context, cgsnapshot_id):
                     'updated_at': literal_column('updated_at')})
 
 
+def _purge_table(session, table, deleted_age, batch_size, pause):
+    """Delete the rows of table deleted before deleted_age.
+
+    The rows are deleted batch_size at a time, each batch in its own
+    transaction, waiting pause seconds between batches.
+
+    :returns: number of deleted rows
+    """
+    condition = table.c.deleted_at < deleted_age
+    primary_key = list(table.primary_key.columns)
+    # Rows referencing rows of the same table may be in a later batch than
+    # the rows they reference, so such tables are purged at once.
+    self_referencing = any(fk.column.table is table
+                           for fk in table.foreign_keys)
+    if batch_size is None or len(primary_key) != 1 or self_referencing:
+        with session.begin():
+            result = session.execute(table.delete().where(condition))
+        return result.rowcount
+
+    key = primary_key[0]
+    rows_purged = 0
+    while True:
+        with session.begin():
+            ids = [row[0] for row in session.execute(
+                sql.select([key]).where(condition).limit(batch_size))]
+            if ids:
+                result = session.execute(
+                    table.delete().where(key.in_(ids)))
+                rows_purged += result.rowcount
+        if len(ids) < batch_size:
+            return rows_purged
+        LOG.info(_LI("Deleted %(row)d rows from table=%(table)s so far"),
+                 {'row': rows_purged, 'table': table.name})
+        if pause:
+            time.sleep(pause)
+
+
 @require_admin_context
-def purge_deleted_rows(context, age_in_days):
-    """Purge deleted rows older than age from cinder tables."""
+def purge_deleted_rows(context, age_in_days, batch_size=None, pause=0):
+    """Purge deleted rows older than age from cinder tables.
+
+    The tables are purged following their foreign keys, the tables
+    referencing another one before it, so the purge can be interrupted
+    and run again at any time.
+    """
     try:
         age_in_days = int(age_in_days)
     except ValueError:
@@ -4014,6 +4203,10 @@ def purge_deleted_rows(context, age_in_days):
         msg = _('Must supply a positive value for age')
         LOG.error(msg)
         raise exception.InvalidParameterValue(msg)
+    if batch_size is not None and batch_size <= 0:
+        msg = _('Must supply a positive value for batch size')
+        LOG.error(msg)
+        raise exception.InvalidParameterValue(msg)
 
     engine = get_engine()
     session = get_session()
@@ -4026,28 +4219,29 @@ def purge_deleted_rows(context, age_in_days):
                 and hasattr(model_class, "deleted"):
             tables.append(model_class.__tablename__)
 
-    # Reorder the list so the volumes table is last to avoid FK constraints
-    tables.remove("volumes")
-    tables.append("volumes")
-    for table in tables:
-        t = Table(table, metadata, autoload=True)
+    metadata.reflect(only=tables)
+    deleted_age = timeutils.utcnow() - dt.timedelta(days=age_in_days)
+    total_purged = 0
+    # sorted_tables lists the tables referenced by foreign keys before the
+    # tables referencing them, which must be purged first.
+    for t in reversed(metadata.sorted_tables):
+        if t.name not in tables:
+            continue
         LOG.info(_LI('Purging deleted rows older than age=%(age)d days '
                      'from table=%(table)s'), {'age': age_in_days,
-                                               'table': table})
-        deleted_age = timeutils.utcnow() - dt.timedelta(days=age_in_days)
+                                               'table': t.name})
         try:
-            with session.begin():
-                result = session.execute(
-                    t.delete()
-                    .where(t.c.deleted_at < deleted_age))
+            rows_purged = _purge_table(session, t, deleted_age, batch_size,
+                                       pause)
         except db_exc.DBReferenceError:
             LOG.exception(_LE('DBError detected when purging from '
-                              'table=%(table)s'), {'table': table})
+                              'table=%(table)s'), {'table': t.name})
             raise
 
-        rows_purged = result.rowcount
         LOG.info(_LI("Deleted %(row)d rows from table=%(table)s"),
-                 {'row': rows_purged, 'table': table})
+                 {'row': rows_purged, 'table': t.name})
+        total_purged += rows_purged
+    return total_purged
 
 
 ###############################
@@ -18,6 +18,7 @@
 
 
 import datetime
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -73,7 +74,14 @@ quota_opts = [
                      'with default quota.'),
     cfg.IntOpt('per_volume_size_limit',
                default=-1,
-               help='Max size allowed per volume, in gigabytes'), ]
+               help='Max size allowed per volume, in gigabytes'),
+    cfg.IntOpt('quota_volume_type_cache_ttl',
+               default=60,
+               min=0,
+               help='Number of seconds the quota resources of volume types '
+                    'are cached. Volume types created, renamed or deleted '
+                    'through this service, and resources unknown to the '
+                    'cache, refresh it earlier. 0 disables the cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -910,10 +918,28 @@ class QuotaEngine(object):
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
+    def __init__(self, quota_driver_class=None):
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
+        self._cached_resources = None
+        self._cache_expires = 0
+
     @property
     def resources(self):
-        """Fetches all possible quota resources."""
+        """Fetches all possible quota resources.
 
+        They are cached for quota_volume_type_cache_ttl seconds.
+        """
+        if (self._cached_resources is None or
+                time.time() >= self._cache_expires):
+            resources = self._load_resources()
+            if CONF.quota_volume_type_cache_ttl:
+                self._cached_resources = resources
+                self._cache_expires = (time.time() +
+                                       CONF.quota_volume_type_cache_ttl)
+            return resources
+        return self._cached_resources
+
+    def _load_resources(self):
         result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
@@ -936,6 +962,27 @@ class VolumeTypeQuotaEngine(QuotaEngine):
                 result[resource.name] = resource
         return result
 
+    def invalidate_resources(self):
+        """Drops the cached resources, after volume types changed."""
+        self._cached_resources = None
+
+    def _check_resources_cached(self, names):
+        # A volume type created or renamed by another service is not
+        # known until the cache is refreshed.
+        if (self._cached_resources is not None and
+                not set(names).issubset(self._cached_resources)):
+            self.invalidate_resources()
+
+    def limit_check(self, context, project_id=None, **values):
+        self._check_resources_cached(values)
+        return super(VolumeTypeQuotaEngine, self).limit_check(
+            context, project_id=project_id, **values)
+
+    def reserve(self, context, expire=None, project_id=None, **deltas):
+        self._check_resources_cached(deltas)
+        return super(VolumeTypeQuotaEngine, self).reserve(
+            context, expire=expire, project_id=project_id, **deltas)
+
     def register_resource(self, resource):
         raise NotImplementedError(_("Cannot register resource"))
 
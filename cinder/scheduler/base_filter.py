@@ -17,6 +17,7 @@
 Filter support
 """
 import logging
+import time
 
 from cinder.openstack.common._i18n import _LI
 from cinder.scheduler import base_handler
@@ -63,6 +64,76 @@ class BaseFilterHandler(base_handler.BaseHandler):
     This class should be subclassed where one needs to use filters.
     """
 
+    def __init__(self, modifier_class_type, modifier_namespace):
+        super(BaseFilterHandler, self).__init__(modifier_class_type,
+                                                modifier_namespace)
+        # Filters are kept between requests, so they must not keep the
+        # state of a request on the instance.
+        self._filters = {}
+        # Usage of each filter, by class name
+        self._filter_stats = {}
+
+    def _get_filter(self, filter_cls):
+        try:
+            return self._filters[filter_cls]
+        except KeyError:
+            return self._filters.setdefault(filter_cls, filter_cls())
+
+    def get_filter_stats(self):
+        """Return the usage of the filters run so far.
+
+        For each filter, the number of times it ran, the number of objects
+        it was given and the number it returned, and the time it took.
+        """
+        stats = []
+        for name, filter_stats in sorted(self._filter_stats.items()):
+            filter_stats = dict(filter_stats, name=name)
+            objs_in = filter_stats['objects_in']
+            filter_stats['pass_ratio'] = (
+                float(filter_stats['objects_out']) / objs_in
+                if objs_in else None)
+            filter_stats['time_per_object'] = (
+                filter_stats['time'] / objs_in if objs_in else None)
+            stats.append(filter_stats)
+        return stats
+
+    def _get_filter_rank(self, filter_cls):
+        """Return the cost of a filter per object it removes.
+
+        Running the filters of lowest rank first minimizes the total cost
+        of independent filters.  Filters which never ran have no rank, and
+        filters which never removed anything have an infinite one.
+        """
+        filter_stats = self._filter_stats.get(filter_cls.__name__)
+        if not filter_stats or not filter_stats['objects_in']:
+            return None
+        removed = filter_stats['objects_in'] - filter_stats['objects_out']
+        if not removed:
+            return float('inf')
+        return filter_stats['time'] / removed
+
+    def order_filters(self, filter_classes):
+        """Order filters from the cheapest and most selective ones.
+
+        The order is computed from the statistics of the previous runs.
+        Filters which never ran are kept first, in the given order, so that
+        they get statistics.
+        """
+        ranks = [(self._get_filter_rank(cls), index, cls)
+                 for index, cls in enumerate(filter_classes)]
+        return [cls for rank, index, cls in
+                sorted(ranks, key=lambda r: (r[0] is not None,
+                                             r[0] or 0, r[1]))]
+
+    def _record_filter_stats(self, cls_name, objs_in, objs_out, duration):
+        filter_stats = self._filter_stats.setdefault(
+            cls_name, {'runs': 0, 'objects_in': 0, 'objects_out': 0,
+                       'time': 0.0})
+        filter_stats['runs'] += 1
+        filter_stats['objects_in'] += objs_in
+        filter_stats['objects_out'] += objs_out
+        filter_stats['time'] += duration
+
     def get_filtered_objects(self, filter_classes, objs,
                              filter_properties, index=0):
         """Get objects after filter
@@ -79,15 +150,19 @@ class BaseFilterHandler(base_handler.BaseHandler):
         LOG.debug("Starting with %d host(s)", len(list_objs))
         for filter_cls in filter_classes:
             cls_name = filter_cls.__name__
-            filter_class = filter_cls()
+            filter_class = self._get_filter(filter_cls)
 
             if filter_class.run_filter_for_index(index):
+                start = time.time()
                 objs = filter_class.filter_all(list_objs, filter_properties)
                 if objs is None:
                     LOG.debug("Filter %(cls_name)s says to stop filtering",
                               {'cls_name': cls_name})
                     return
+                objs_in = len(list_objs)
                 list_objs = list(objs)
+                self._record_filter_stats(cls_name, objs_in, len(list_objs),
+                                          time.time() - start)
                 msg = (_LI("Filter %(cls_name)s returned %(obj_len)d host(s)")
                        % {'cls_name': cls_name, 'obj_len': len(list_objs)})
                 if not list_objs:
@@ -19,10 +19,14 @@ Pluggable Weighing support
 
 import abc
 
+from oslo_utils import importutils
 import six
 
 from cinder.scheduler import base_handler
 
+# Optional, weights are computed as arrays when it is available.
+np = importutils.try_import('numpy')
+
 
 def normalize(weight_list, minval=None, maxval=None):
     """Normalize the values in a list between 0 and 1.0.
@@ -32,8 +36,13 @@ def normalize(weight_list, minval=None, maxval=None):
     will be used instead of the minimum and maximum from the list.
 
     If all the values are equal, they are normalized to 0.
+
+    A NumPy array is normalized into a new array.
     """
 
+    if np is not None and isinstance(weight_list, np.ndarray):
+        return _normalize_array(weight_list, minval, maxval)
+
     if not weight_list:
         return ()
 
@@ -53,6 +62,25 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def _normalize_array(weights, minval=None, maxval=None):
+    if not len(weights):
+        return weights
+
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return np.zeros(len(weights))
+
+    return (weights - minval) / (maxval - minval)
+
+
 class WeighedObject(object):
     """Object with weight information."""
     def __init__(self, obj, weight):
@@ -129,6 +157,11 @@ class BaseWeightHandler(base_handler.BaseHandler):
             return []
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+        if np is not None:
+            return self._get_weighed_objects_array(weigher_classes,
+                                                   weighed_objs,
+                                                   weighing_properties)
+
         for weigher_cls in weigher_classes:
             weigher = weigher_cls()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
@@ -143,3 +176,27 @@ class BaseWeightHandler(base_handler.BaseHandler):
                 obj.weight += weigher.weight_multiplier() * weight
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def _get_weighed_objects_array(self, weigher_classes, weighed_objs,
+                                   weighing_properties):
+        """get_weighed_objects, summing the weights as NumPy arrays."""
+        total_weights = np.zeros(len(weighed_objs))
+        for weigher_cls in weigher_classes:
+            weigher = weigher_cls()
+            weights = np.asarray(
+                weigher.weigh_objects(weighed_objs, weighing_properties),
+                dtype=float)
+
+            # Normalize the weights
+            weights = normalize(weights,
+                                minval=weigher.minval,
+                                maxval=weigher.maxval)
+
+            total_weights += weigher.weight_multiplier() * weights
+
+        for obj, weight in zip(weighed_objs, total_weights.tolist()):
+            obj.weight = weight
+        # A stable sort, so that hosts of equal weight keep their order
+        # as with sorted().
+        order = np.argsort(-total_weights, kind='mergesort')
+        return [weighed_objs[i] for i in order]
@@ -19,10 +19,13 @@
 Scheduler base class that all Schedulers should inherit from
 """
 
+import copy
+
 from oslo_config import cfg
 from oslo_utils import importutils
 from oslo_utils import timeutils
 
+from cinder import exception
 from cinder.i18n import _
 from cinder import objects
 from cinder.volume import rpcapi as volume_rpcapi
@@ -106,6 +109,31 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_volume"))
 
+    def schedule_create_volumes(self, context, request_spec,
+                                filter_properties, volume_ids,
+                                scheduled_ids=None):
+        """Schedule several volumes created with the same request.
+
+        Returns the ids of the volumes that no host could be found for.
+        The ids of the volumes sent to a volume service are appended to
+        scheduled_ids as they are sent, so that the caller knows which
+        volumes are left when this raises. Schedules the volumes one by
+        one, override this to place them all at once.
+        """
+        if scheduled_ids is None:
+            scheduled_ids = []
+        unplaced = []
+        for volume_id in volume_ids:
+            try:
+                self.schedule_create_volume(
+                    context, dict(request_spec, volume_id=volume_id),
+                    copy.deepcopy(filter_properties))
+            except exception.NoValidHost:
+                unplaced.append(volume_id)
+            else:
+                scheduled_ids.append(volume_id)
+        return unplaced
+
     def schedule_create_consistencygroup(self, context, group,
                                          request_spec_list,
                                          filter_properties_list):
@@ -117,3 +145,7 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_(
             "Must implement schedule_get_pools"))
+
+    def get_filter_stats(self, context):
+        """Return the usage statistics of the host filters."""
+        return self.host_manager.get_filter_stats()
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import operator
 import re
 
@@ -34,17 +35,23 @@ def _operatorOperands(tokenList):
             break
 
 
+_VARIABLE_RE = re.compile("^[a-zA-Z_]+\.[a-zA-Z_]+$")
+
+
 class EvalConstant(object):
     def __init__(self, toks):
         self.value = toks[0]
+        self.variable = None
+        if (isinstance(self.value, six.string_types) and
+                _VARIABLE_RE.match(self.value)):
+            self.variable = self.value.split('.')
 
-    def eval(self):
+    def eval(self, variables):
         result = self.value
-        if (isinstance(result, six.string_types) and
-                re.match("^[a-zA-Z_]+\.[a-zA-Z_]+$", result)):
-            (which_dict, entry) = result.split('.')
+        if self.variable:
+            (which_dict, entry) = self.variable
             try:
-                result = _vars[which_dict][entry]
+                result = variables[which_dict][entry]
             except KeyError as e:
                 raise exception.EvaluatorParseException(
                     _("KeyError: %s") % six.text_type(e))
@@ -73,21 +80,21 @@ class EvalSignOp(object):
     def __init__(self, toks):
         self.sign, self.value = toks[0]
 
-    def eval(self):
-        return self.operations[self.sign] * self.value.eval()
+    def eval(self, variables):
+        return self.operations[self.sign] * self.value.eval(variables)
 
 
 class EvalAddOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        sum = self.value[0].eval()
+    def eval(self, variables):
+        sum = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             if op == '+':
-                sum += val.eval()
+                sum += val.eval(variables)
             elif op == '-':
-                sum -= val.eval()
+                sum -= val.eval(variables)
         return sum
 
 
@@ -95,14 +102,14 @@ class EvalMultOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             try:
                 if op == '*':
-                    prod *= val.eval()
+                    prod *= val.eval(variables)
                 elif op == '/':
-                    prod /= float(val.eval())
+                    prod /= float(val.eval(variables))
             except ZeroDivisionError as e:
                 raise exception.EvaluatorParseException(
                     _("ZeroDivisionError: %s") % six.text_type(e))
@@ -113,10 +120,10 @@ class EvalPowerOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
-            prod = pow(prod, val.eval())
+            prod = pow(prod, val.eval(variables))
         return prod
 
 
@@ -124,8 +131,8 @@ class EvalNegateOp(object):
     def __init__(self, toks):
         self.negation, self.value = toks[0]
 
-    def eval(self):
-        return not self.value.eval()
+    def eval(self, variables):
+        return not self.value.eval(variables)
 
 
 class EvalComparisonOp(object):
@@ -142,11 +149,11 @@ class EvalComparisonOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             fn = self.operations[op]
-            val2 = val.eval()
+            val2 = val.eval(variables)
             if not fn(val1, val2):
                 break
             val1 = val2
@@ -159,12 +166,12 @@ class EvalTernaryOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        condition = self.value[0].eval()
+    def eval(self, variables):
+        condition = self.value[0].eval(variables)
         if condition:
-            return self.value[2].eval()
+            return self.value[2].eval(variables)
         else:
-            return self.value[4].eval()
+            return self.value[4].eval(variables)
 
 
 class EvalFunction(object):
@@ -177,8 +184,8 @@ class EvalFunction(object):
     def __init__(self, toks):
         self.func, self.value = toks[0]
 
-    def eval(self):
-        args = self.value.eval()
+    def eval(self, variables):
+        args = self.value.eval(variables)
         if type(args) is list:
             return self.functions[self.func](*args)
         else:
@@ -189,9 +196,9 @@ class EvalCommaSeperator(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
-        val2 = self.value[2].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
+        val2 = self.value[2].eval(variables)
         if type(val2) is list:
             val_list = []
             val_list.append(val1)
@@ -206,9 +213,9 @@ class EvalBoolAndOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left and right
 
 
@@ -216,13 +223,18 @@ class EvalBoolOrOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left or right
 
 _parser = None
-_vars = {}
+
+# Parsed expressions, most recently used last. Backends report the same
+# filter and goodness functions for every scheduling request, so they are
+# only parsed once.
+_CACHE_SIZE = 256
+_parsed = collections.OrderedDict()
 
 
 def _def_parser():
@@ -281,17 +293,31 @@ def evaluate(expression, **kwargs):
     Supports both integer and floating point values, and automatic
     promotion where necessary.
     """
-    global _parser
-    if _parser is None:
-        _parser = _def_parser()
+    return _parse(expression).eval(kwargs)
 
-    global _vars
-    _vars = kwargs
 
-    try:
-        result = _parser.parseString(expression, parseAll=True)[0]
-    except pyparsing.ParseException as e:
-        raise exception.EvaluatorParseException(
-            _("ParseException: %s") % six.text_type(e))
+def _parse(expression):
+    """Returns the evaluation tree of an expression, parsing it if needed.
 
-    return result.eval()
+    Trees are not modified by evaluation, so cached ones are shared by
+    concurrent evaluations.
+    """
+    global _parser
+
+    try:
+        result, error = _parsed.pop(expression)
+    except KeyError:
+        if _parser is None:
+            _parser = _def_parser()
+        result = error = None
+        try:
+            result = _parser.parseString(expression, parseAll=True)[0]
+        except pyparsing.ParseException as e:
+            error = _("ParseException: %s") % six.text_type(e)
+        if len(_parsed) >= _CACHE_SIZE:
+            _parsed.popitem(last=False)
+
+    _parsed[expression] = (result, error)
+    if error is not None:
+        raise exception.EvaluatorParseException(error)
+    return result
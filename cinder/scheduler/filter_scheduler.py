@@ -20,6 +20,9 @@ You can customize this scheduler by specifying your own volume Filters and
 Weighing Functions.
 """
 
+import collections
+import copy
+
 from oslo_config import cfg
 from oslo_log import log as logging
 
@@ -94,13 +97,81 @@ class FilterScheduler(driver.Scheduler):
         self._post_select_populate_filter_properties(filter_properties,
                                                      weighed_host.obj)
 
-        # context is not serializable
+        # context is not serializable, and the backends of the affinity
+        # and locality hints are looked up again if the volume is rescheduled
         filter_properties.pop('context', None)
+        filter_properties.pop('affinity_hosts', None)
+        filter_properties.pop('instance_hosts', None)
+        filter_properties.pop('nova_ext_srv_attr', None)
 
         self.volume_rpcapi.create_volume(context, updated_volume, host,
                                          request_spec, filter_properties,
                                          allow_reschedule=True)
 
+    def schedule_create_volumes(self, context, request_spec,
+                                filter_properties, volume_ids,
+                                scheduled_ids=None):
+        """Place several identical volumes with one filter pass.
+
+        The volumes are handed out greedily, the chosen host consuming each
+        volume before being checked against the filters again and the
+        candidates weighed again for the next one. Returns the ids of the
+        volumes left without a host.
+        """
+        if filter_properties is None:
+            filter_properties = {}
+        if scheduled_ids is None:
+            scheduled_ids = []
+        weighed_hosts = self._get_weighted_candidates(context, request_spec,
+                                                      filter_properties)
+        candidates = [weighed_host.obj for weighed_host in weighed_hosts]
+
+        placements = collections.OrderedDict()
+        unplaced = []
+        for volume_id in volume_ids:
+            if not weighed_hosts:
+                unplaced.append(volume_id)
+                continue
+            host_state = self._choose_top_host(weighed_hosts,
+                                               request_spec).obj
+            # Record the placement right away, the weighers counting the
+            # volumes of the hosts in the database must see it.
+            volume = driver.volume_update_db(context, volume_id,
+                                             host_state.host)
+            placements.setdefault(host_state.host, []).append(
+                (volume_id, volume))
+            if not self.host_manager.get_filtered_hosts([host_state],
+                                                        filter_properties):
+                candidates.remove(host_state)
+            weighed_hosts = []
+            if candidates:
+                weighed_hosts = self.host_manager.get_weighed_hosts(
+                    candidates, filter_properties)
+
+        if unplaced:
+            LOG.warning(_LW('No weighed hosts found for %(count)d of the '
+                            'volumes with properties: %(type)s'),
+                        {'count': len(unplaced),
+                         'type': request_spec['volume_type']})
+
+        # context is not serializable, and the backends of the affinity
+        # and locality hints are looked up again if a volume is rescheduled
+        filter_properties.pop('context', None)
+        filter_properties.pop('affinity_hosts', None)
+        filter_properties.pop('instance_hosts', None)
+        filter_properties.pop('nova_ext_srv_attr', None)
+
+        for host, host_volumes in placements.items():
+            for volume_id, volume in host_volumes:
+                volume_filter_properties = copy.deepcopy(filter_properties)
+                self._add_retry_host(volume_filter_properties, host)
+                self.volume_rpcapi.create_volume(
+                    context, volume, host,
+                    dict(request_spec, volume_id=volume_id),
+                    volume_filter_properties, allow_reschedule=True)
+                scheduled_ids.append(volume_id)
+        return unplaced
+
     def host_passes_filters(self, context, host, request_spec,
                             filter_properties):
         """Check if the specified host passes the filters."""
@@ -24,18 +24,16 @@ LOG = logging.getLogger(__name__)
 
 
 class AffinityFilter(filters.BaseHostFilter):
+    # Name of the scheduler hint listing the volumes, set in subclasses.
+    hint = None
+
     def __init__(self):
         self.volume_api = volume.API()
 
-
-class DifferentBackendFilter(AffinityFilter):
-    """Schedule volume on a different back-end from a set of volumes."""
-
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
+    def _get_affinity_uuids(self, filter_properties):
+        """Return the volume uuids of the hint, or None if it is invalid."""
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('different_host', [])
+        affinity_uuids = scheduler_hints.get(self.hint, [])
 
         # scheduler hint verification: affinity_uuids can be a list of uuids
         # or single uuid.  The checks here is to make sure every single string
@@ -43,60 +41,68 @@ class DifferentBackendFilter(AffinityFilter):
         # pass.  Note that the filter does *NOT* ignore string doesn't look
         # like a uuid, it is better to fail the request than serving it wrong.
         if isinstance(affinity_uuids, list):
-            for uuid in affinity_uuids:
-                if uuidutils.is_uuid_like(uuid):
-                    continue
-                else:
-                    return False
+            if all(uuidutils.is_uuid_like(uuid) for uuid in affinity_uuids):
+                return affinity_uuids
+            return None
         elif uuidutils.is_uuid_like(affinity_uuids):
-            affinity_uuids = [affinity_uuids]
-        else:
-            # Not a list, not a string looks like uuid, don't pass it
-            # to DB for query to avoid potential risk.
-            return False
+            return [affinity_uuids]
+        # Not a list, not a string looks like uuid, don't pass it
+        # to DB for query to avoid potential risk.
+        return None
+
+    def _get_affinity_hosts(self, filter_properties, affinity_uuids):
+        """Return the hosts of the volumes named by the hint.
+
+        They are looked up with a single query, cached in filter_properties
+        for the rest of the request.
+        """
+        cache = filter_properties.setdefault('affinity_hosts', {})
+        if self.hint not in cache:
+            volumes = self.volume_api.get_all(
+                filter_properties['context'],
+                filters={'id': affinity_uuids, 'deleted': False})
+            # A list rather than a set, as filter_properties is sent to the
+            # volume service.
+            cache[self.hint] = list(set(vol.host for vol in volumes))
+        return cache[self.hint]
+
+    def _host_passes(self, has_affinity_volume):
+        """Return whether a host passes, knowing if it has a hint volume.
+
+        Override this in a subclass.
+        """
+        raise NotImplementedError()
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        affinity_uuids = self._get_affinity_uuids(filter_properties)
+        if affinity_uuids is None:
+            return []
+        if not affinity_uuids:
+            # With no hint
+            return filter_obj_list
+
+        hosts = set(self._get_affinity_hosts(filter_properties,
+                                             affinity_uuids))
+        return [host_state for host_state in filter_obj_list
+                if self._host_passes(host_state.host in hosts)]
+
+    def host_passes(self, host_state, filter_properties):
+        return bool(self.filter_all([host_state], filter_properties))
 
-        if affinity_uuids:
-            return not self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
 
-        # With no different_host key
-        return True
+class DifferentBackendFilter(AffinityFilter):
+    """Schedule volume on a different back-end from a set of volumes."""
+
+    hint = 'different_host'
+
+    def _host_passes(self, has_affinity_volume):
+        return not has_affinity_volume
 
 
 class SameBackendFilter(AffinityFilter):
     """Schedule volume on the same back-end as another volume."""
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('same_host', [])
+    hint = 'same_host'
 
-        # scheduler hint verification: affinity_uuids can be a list of uuids
-        # or single uuid.  The checks here is to make sure every single string
-        # in the list looks like a uuid, otherwise, this filter will fail to
-        # pass.  Note that the filter does *NOT* ignore string doesn't look
-        # like a uuid, it is better to fail the request than serving it wrong.
-        if isinstance(affinity_uuids, list):
-            for uuid in affinity_uuids:
-                if uuidutils.is_uuid_like(uuid):
-                    continue
-                else:
-                    return False
-        elif uuidutils.is_uuid_like(affinity_uuids):
-            affinity_uuids = [affinity_uuids]
-        else:
-            # Not a list, not a string looks like uuid, don't pass it
-            # to DB for query to avoid potential risk.
-            return False
-
-        if affinity_uuids:
-            return self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
-
-        # With no same_host key
-        return True
+    def _host_passes(self, has_affinity_volume):
+        return has_affinity_volume
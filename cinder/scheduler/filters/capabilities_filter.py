@@ -26,16 +26,18 @@ LOG = logging.getLogger(__name__)
 class CapabilitiesFilter(filters.BaseHostFilter):
     """HostFilter to work with resource (instance & volume) type records."""
 
-    def _satisfies_extra_specs(self, capabilities, resource_type):
-        """Check if capabilities satisfy resource type requirements.
+    def _get_requirements(self, resource_type):
+        """Return the requirements of the resource type on capabilities.
 
-        Check that the capabilities provided by the services satisfy
-        the extra specs associated with the resource type.
+        Each one is a tuple of the capability path, the requirement string
+        and a function matching the requirement, so that extra specs are
+        parsed once per request rather than once per host.
         """
         extra_specs = resource_type.get('extra_specs', [])
         if not extra_specs:
-            return True
+            return []
 
+        requirements = []
         for key, req in six.iteritems(extra_specs):
             # Either not scope format, or in capabilities scope
             scope = key.split(':')
@@ -43,31 +45,75 @@ class CapabilitiesFilter(filters.BaseHostFilter):
                 continue
             elif scope[0] == "capabilities":
                 del scope[0]
+            requirements.append((scope, req, extra_specs_ops.get_matcher(req)))
+        return requirements
+
+    @staticmethod
+    def _get_capability(capabilities, scope):
+        cap = capabilities
+        for key in scope:
+            try:
+                cap = cap.get(key)
+            except AttributeError:
+                return None
+            if cap is None:
+                return None
+        return cap
 
-            cap = capabilities
-            for index in range(len(scope)):
-                try:
-                    cap = cap.get(scope[index])
-                except AttributeError:
-                    return False
-                if cap is None:
-                    return False
-            if not extra_specs_ops.match(cap, req):
+    def _satisfies_requirements(self, caps, requirements):
+        for cap, (scope, req, matcher) in zip(caps, requirements):
+            if cap is None:
+                return False
+            if not matcher(cap):
                 LOG.debug("extra_spec requirement '%(req)s' "
                           "does not match '%(cap)s'",
                           {'req': req, 'cap': cap})
                 return False
         return True
 
-    def host_passes(self, host_state, filter_properties):
-        """Return a list of hosts that can create resource_type."""
+    def _satisfies_extra_specs(self, capabilities, resource_type):
+        """Check if capabilities satisfy resource type requirements.
+
+        Check that the capabilities provided by the services satisfy
+        the extra specs associated with the resource type.
+        """
+        requirements = self._get_requirements(resource_type)
+        caps = [self._get_capability(capabilities, scope)
+                for scope, req, matcher in requirements]
+        return self._satisfies_requirements(caps, requirements)
+
+    def filter_all(self, filter_obj_list, filter_properties):
         # Note(zhiteng) Currently only Cinder and Nova are using
         # this filter, so the resource type is either instance or
         # volume.
         resource_type = filter_properties.get('resource_type')
-        if not self._satisfies_extra_specs(host_state.capabilities,
-                                           resource_type):
-            LOG.debug("%(host_state)s fails resource_type extra_specs "
-                      "requirements", {'host_state': host_state})
-            return False
-        return True
+        requirements = self._get_requirements(resource_type)
+        if not requirements:
+            return filter_obj_list
+
+        # The pools of a backend usually report the same protocol, vendor,
+        # provisioning support and so on, so hosts are grouped by the values
+        # the requirements look at and each group is only checked once.
+        results = {}
+        passed = []
+        for host_state in filter_obj_list:
+            caps = tuple(self._get_capability(host_state.capabilities, scope)
+                         for scope, req, matcher in requirements)
+            try:
+                passes = results[caps]
+            except KeyError:
+                passes = results[caps] = self._satisfies_requirements(
+                    caps, requirements)
+            except TypeError:
+                # Unhashable capabilities, such as dictionaries
+                passes = self._satisfies_requirements(caps, requirements)
+            if passes:
+                passed.append(host_state)
+            else:
+                LOG.debug("%(host_state)s fails resource_type extra_specs "
+                          "requirements", {'host_state': host_state})
+        return passed
+
+    def host_passes(self, host_state, filter_properties):
+        """Return a list of hosts that can create resource_type."""
+        return bool(self.filter_all([host_state], filter_properties))
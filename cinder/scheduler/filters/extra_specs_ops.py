@@ -38,35 +38,60 @@ _op_methods = {'=': lambda x, y: float(x) >= float(y),
                's>=': operator.ge}
 
 
-def match(value, req):
-    words = req.split()
+# Operators comparing numbers, whose requirement is converted only once.
+_numeric_ops = {'=': operator.ge,
+                '==': operator.eq,
+                '!=': operator.ne,
+                '>=': operator.ge,
+                '<=': operator.le}
 
-    op = method = None
-    if words:
-        op = words.pop(0)
-        method = _op_methods.get(op)
 
-    if op != '<or>' and not method:
-        return value == req
+def _never(value):
+    return False
+
 
-    if value is None:
-        return False
+def get_matcher(req):
+    """Return a function checking values against the requirement req.
+
+    The requirement is parsed once, so the function is cheap to call for
+    every host of a request. It returns the same as match(value, req).
+    """
+    words = req.split()
+    op = words[0] if words else None
 
     if op == '<or>':  # Ex: <or> v1 <or> v2 <or> v3
-        while True:
-            if words.pop(0) == value:
-                return True
-            if not words:
-                break
-            op = words.pop(0)  # remove a keyword <or>
-            if not words:
-                break
-        return False
-
-    try:
-        if words and method(value, words[0]):
-            return True
-    except ValueError:
-        pass
+        choices = words[1::2]
 
-    return False
+        def _match(value):
+            return value is not None and value in choices
+        return _match
+
+    method = _op_methods.get(op)
+    if not method:
+        return lambda value: value == req
+    if len(words) < 2:
+        return _never
+
+    arg = words[1]
+    if op in _numeric_ops:
+        try:
+            arg = float(arg)
+        except ValueError:
+            return _never
+        compare = _numeric_ops[op]
+
+        def method(x, y):
+            return compare(float(x), y)
+
+    def _match(value):
+        if value is None:
+            return False
+        try:
+            return bool(method(value, arg))
+        except ValueError:
+            return False
+    return _match
+
+
+def match(value, req):
+    return get_matcher(req)(value)
@@ -47,25 +47,20 @@ class InstanceLocalityFilter(filters.BaseHostFilter):
       'extended_server_attributes' in Nova policy).
     """
 
-    def __init__(self):
-        # Cache Nova API answers directly into the Filter object.
-        # Since a BaseHostFilter instance lives only during the volume's
-        # scheduling, the cache is re-created for every new volume creation.
-        self._cache = {}
-        super(InstanceLocalityFilter, self).__init__()
-
-    def _nova_has_extended_server_attributes(self, context):
+    def _nova_has_extended_server_attributes(self, filter_properties):
         """Check Extended Server Attributes presence
 
         Find out whether the Extended Server Attributes extension is activated
-        in Nova or not. Cache the result to query Nova only once.
+        in Nova or not. Cache the result in the request to query Nova only
+        once per request.
         """
 
-        if not hasattr(self, '_nova_ext_srv_attr'):
-            self._nova_ext_srv_attr = nova.API().has_extension(
-                context, 'ExtendedServerAttributes', timeout=REQUESTS_TIMEOUT)
+        if 'nova_ext_srv_attr' not in filter_properties:
+            filter_properties['nova_ext_srv_attr'] = nova.API().has_extension(
+                filter_properties['context'], 'ExtendedServerAttributes',
+                timeout=REQUESTS_TIMEOUT)
 
-        return self._nova_ext_srv_attr
+        return filter_properties['nova_ext_srv_attr']
 
     def host_passes(self, host_state, filter_properties):
         context = filter_properties['context']
@@ -89,11 +84,14 @@ class InstanceLocalityFilter(filters.BaseHostFilter):
         # enhancement would be to subscribe to Nova migration events (e.g. via
         # Ceilometer).
 
-        # First, lookup for already-known information in local cache
-        if instance_uuid in self._cache:
-            return self._cache[instance_uuid] == host
+        # First, lookup for already-known information in the cache of the
+        # request. Filter instances are shared by all the requests, so
+        # Nova API answers are cached in the filter properties.
+        cache = filter_properties.setdefault('instance_hosts', {})
+        if instance_uuid in cache:
+            return cache[instance_uuid] == host
 
-        if not self._nova_has_extended_server_attributes(context):
+        if not self._nova_has_extended_server_attributes(filter_properties):
             LOG.warning(_LW('Hint "%s" dropped because '
                             'ExtendedServerAttributes not active in Nova.'),
                         HINT_KEYWORD)
@@ -112,7 +110,7 @@ class InstanceLocalityFilter(filters.BaseHostFilter):
             raise exception.CinderException(_('Hint "%s" not supported.') %
                                             HINT_KEYWORD)
 
-        self._cache[instance_uuid] = getattr(server, INSTANCE_HOST_PROP)
+        cache[instance_uuid] = getattr(server, INSTANCE_HOST_PROP)
 
         # Match if given instance is hosted on host
-        return self._cache[instance_uuid] == host
+        return cache[instance_uuid] == host
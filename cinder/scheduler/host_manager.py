@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -46,7 +47,22 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_service_cache_ttl',
+               default=10,
+               min=0,
+               help='Number of seconds the scheduler caches the list of '
+                    'volume services and their heartbeats between database '
+                    'lookups. Live services may be considered down up to '
+                    'this amount of time early, and a newly disabled '
+                    'service may still be scheduled to for up to this '
+                    'amount of time. 0 disables the cache.'),
+    cfg.BoolOpt('scheduler_order_filters',
+                default=False,
+                help='Run the filters by increasing cost per host they '
+                     'remove, as measured on previous requests, instead of '
+                     'in the configured order. Only use it with filters '
+                     'which do not depend on each other.'),
 ]
 
 CONF = cfg.CONF
@@ -347,6 +363,9 @@ class HostManager(object):
         self.weight_classes = self.weight_handler.get_all_classes()
 
         self._no_capabilities_hosts = set()  # Hosts having no capabilities
+        self._volume_services = None
+        self._volume_service_hosts = set()
+        self._volume_services_expire = 0
         self._update_host_state_map(cinder_context.get_admin_context())
 
     def _choose_host_filters(self, filter_cls_names):
@@ -408,6 +427,8 @@ class HostManager(object):
                            filter_class_names=None):
         """Filter hosts and return only ones passing all filters."""
         filter_classes = self._choose_host_filters(filter_class_names)
+        if CONF.scheduler_order_filters:
+            filter_classes = self.filter_handler.order_filters(filter_classes)
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         hosts,
                                                         filter_properties)
@@ -439,20 +460,37 @@ class HostManager(object):
                    'cap': capabilities})
 
         self._no_capabilities_hosts.discard(host)
+        if host not in self._volume_service_hosts:
+            # Look up the services again to pick up the new one.
+            self._volume_services = None
 
     def has_all_capabilities(self):
         return len(self._no_capabilities_hosts) == 0
 
+    def _get_volume_services(self, context):
+        """Return the enabled volume services, cached for a short time."""
+        now = time.time()
+        if self._volume_services is None or \
+                now >= self._volume_services_expire:
+            topic = CONF.volume_topic
+            services = objects.ServiceList.get_all_by_topic(context, topic)
+            # Remember disabled services too, so that their periodic
+            # capability reports do not look like new services.
+            self._volume_service_hosts = set(
+                service.host for service in services)
+            self._volume_services = [service for service in services
+                                     if not service.disabled]
+            self._volume_services_expire = (
+                now + CONF.scheduler_service_cache_ttl)
+        return self._volume_services
+
     def _update_host_state_map(self, context):
 
         # Get resource usage across the available volume nodes:
-        topic = CONF.volume_topic
-        volume_services = objects.ServiceList.get_all_by_topic(context,
-                                                               topic,
-                                                               disabled=False)
+        volume_services = self._get_volume_services(context)
         active_hosts = set()
         no_capabilities_hosts = set()
-        for service in volume_services.objects:
+        for service in volume_services:
             host = service.host
             if not utils.service_is_up(service):
                 LOG.warning(_LW("volume service is down. (host: %s)"), host)
@@ -523,3 +561,7 @@ class HostManager(object):
                 all_pools.append(new_pool)
 
         return all_pools
+
+    def get_filter_stats(self):
+        """Returns the usage statistics of the filters."""
+        return self.filter_handler.get_filter_stats()
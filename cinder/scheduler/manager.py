@@ -56,7 +56,7 @@ LOG = logging.getLogger(__name__)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create volumes."""
 
-    RPC_API_VERSION = '1.11'
+    RPC_API_VERSION = '1.13'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -143,6 +143,44 @@ class SchedulerManager(manager.Manager):
         with flow_utils.DynamicLogListener(flow_engine, logger=LOG):
             flow_engine.run()
 
+    def create_volumes(self, context, topic, volume_ids, request_spec=None,
+                       filter_properties=None):
+        """Schedule the creation of several identical volumes at once."""
+
+        self._wait_for_scheduler()
+
+        unplaced = []
+        scheduled_ids = []
+        reason = None
+        try:
+            unplaced = self.driver.schedule_create_volumes(context,
+                                                           request_spec,
+                                                           filter_properties,
+                                                           volume_ids,
+                                                           scheduled_ids)
+        except exception.NoValidHost as ex:
+            unplaced = [volume_id for volume_id in volume_ids
+                        if volume_id not in scheduled_ids]
+            reason = ex
+        except Exception as ex:
+            with excutils.save_and_reraise_exception():
+                # Volumes already sent to a volume service are handled
+                # there.
+                for volume_id in volume_ids:
+                    if volume_id in scheduled_ids:
+                        continue
+                    self._set_volume_state_and_notify(
+                        'create_volume', {'volume_state': {'status': 'error'}},
+                        context, ex, dict(request_spec, volume_id=volume_id))
+
+        if unplaced and reason is None:
+            reason = exception.NoValidHost(
+                reason=_("No weighed hosts available"))
+        for volume_id in unplaced:
+            self._set_volume_state_and_notify(
+                'create_volume', {'volume_state': {'status': 'error'}},
+                context, reason, dict(request_spec, volume_id=volume_id))
+
     def request_service_capabilities(self, context):
         volume_rpcapi.VolumeAPI().publish_service_capabilities(context)
 
@@ -285,6 +323,10 @@ class SchedulerManager(manager.Manager):
         """
         return self.driver.get_pools(context, filters)
 
+    def get_filter_stats(self, context):
+        """Get the usage statistics of the host filters."""
+        return self.driver.get_filter_stats(context)
+
     def _set_volume_state_and_notify(self, method, updates, context, ex,
                                      request_spec, msg=None):
         # TODO(harlowja): move into a task that just does this later.
@@ -46,6 +46,8 @@ class SchedulerAPI(object):
         1.10 - Adds support for sending objects over RPC in retype()
         1.11 - Adds support for sending objects over RPC in
                migrate_volume_to_host()
+        1.12 - Add create_volumes method
+        1.13 - Add get_filter_stats method
     """
 
     RPC_API_VERSION = '1.0'
@@ -95,6 +97,16 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version=version)
         return cctxt.cast(ctxt, 'create_volume', **msg_args)
 
+    def create_volumes(self, ctxt, topic, volume_ids, request_spec=None,
+                       filter_properties=None):
+        cctxt = self.client.prepare(version='1.12')
+        request_spec_p = jsonutils.to_primitive(request_spec)
+        return cctxt.cast(ctxt, 'create_volumes',
+                          topic=topic,
+                          volume_ids=volume_ids,
+                          request_spec=request_spec_p,
+                          filter_properties=filter_properties)
+
     def migrate_volume_to_host(self, ctxt, topic, volume_id, host,
                                force_host_copy=False, request_spec=None,
                                filter_properties=None, volume=None):
@@ -143,6 +155,10 @@ class SchedulerAPI(object):
         return cctxt.call(ctxt, 'get_pools',
                           filters=filters)
 
+    def get_filter_stats(self, ctxt):
+        cctxt = self.client.prepare(version='1.13')
+        return cctxt.call(ctxt, 'get_filter_stats')
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
                                     capabilities):
@@ -41,11 +41,15 @@ and the weighing has the opposite effect of the default.
 
 
 import math
+import operator
 
 from oslo_config import cfg
+from oslo_utils import importutils
 
 from cinder.scheduler import weights
 
+np = importutils.try_import('numpy')
+
 
 capacity_weight_opts = [
     cfg.FloatOpt('capacity_weight_multiplier',
@@ -64,6 +68,13 @@ CONF.register_opts(capacity_weight_opts)
 OFFSET_MIN = 10000
 OFFSET_MULT = 100
 
+_capacity_fields = operator.attrgetter('free_capacity_gb',
+                                       'total_capacity_gb',
+                                       'reserved_percentage',
+                                       'thin_provisioning_support',
+                                       'max_over_subscription_ratio',
+                                       'provisioned_capacity_gb')
+
 
 class CapacityWeigher(weights.BaseHostWeigher):
     def weight_multiplier(self):
@@ -83,6 +94,9 @@ class CapacityWeigher(weights.BaseHostWeigher):
         largest weight value is being used a weight of -1 is used instead.
         See _weigh_object method.
         """
+        if np is not None:
+            return self._weigh_objects_array(weighed_obj_list)
+
         tmp_weights = super(weights.BaseHostWeigher, self).weigh_objects(
             weighed_obj_list, weight_properties)
 
@@ -99,6 +113,49 @@ class CapacityWeigher(weights.BaseHostWeigher):
 
         return tmp_weights
 
+    def _weigh_objects_array(self, weighed_obj_list):
+        """weigh_objects computing the free capacities as NumPy arrays."""
+        # thin_provisioning_support is tested for truth by _weigh_object,
+        # a None would become a NaN, which is not 0.
+        rows = [fields[:3] + (bool(fields[3]),) + fields[4:]
+                for fields in (_capacity_fields(obj.obj)
+                               for obj in weighed_obj_list)]
+        try:
+            columns = np.array(rows, dtype=float)
+        except ValueError:
+            # 'infinite' or 'unknown' capacities, weighed below.
+            unknown = 'infinite', 'unknown'
+            columns = np.array(
+                [(float('nan'),) * 6 if (row[0] in unknown or
+                                         row[1] in unknown) else row
+                 for row in rows], dtype=float)
+        (free_space, total, reserved, thin, max_over_subscription_ratio,
+         provisioned) = columns.reshape(-1, 6).T
+        reserved_space = np.floor(total * (reserved / 100))
+
+        # Same as _weigh_object: the virtual free capacity for thin
+        # provisioning, the free space left after the reserved space
+        # otherwise.
+        free = np.where(thin != 0,
+                        total * max_over_subscription_ratio - provisioned -
+                        reserved_space,
+                        free_space - reserved_space)
+        free[np.isnan(total)] = (-1 if CONF.capacity_weight_multiplier > 0
+                                 else float('inf'))
+        if not len(free):
+            return free
+
+        self.minval = free.min()
+        self.maxval = free.max()
+        if math.isinf(self.maxval):
+            # See weigh_objects, infinite weights are only used when the
+            # smallest value is favored.
+            self.maxval = free[~np.isinf(free)].max()
+            offset = (self.maxval - self.minval) * OFFSET_MULT
+            self.maxval += OFFSET_MIN if offset == 0.0 else offset
+            free[np.isinf(free)] = self.maxval
+        return free
+
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         reserved = float(host_state.reserved_percentage) / 100
@@ -132,6 +189,19 @@ class AllocatedCapacityWeigher(weights.BaseHostWeigher):
         """Override the weight multiplier."""
         return CONF.allocated_capacity_weight_multiplier
 
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        if np is None:
+            return super(AllocatedCapacityWeigher, self).weigh_objects(
+                weighed_obj_list, weight_properties)
+
+        allocated_space = np.array([obj.obj.allocated_capacity_gb
+                                    for obj in weighed_obj_list],
+                                   dtype=float)
+        if len(allocated_space):
+            self.minval = allocated_space.min()
+            self.maxval = allocated_space.max()
+        return allocated_space
+
     def _weigh_object(self, host_state, weight_properties):
         # Higher weights win.  We want spreading (choose host with lowest
         # allocated_capacity first) to be the default.
@@ -54,7 +54,13 @@ class VolumeNumberWeigher(weights.BaseHostWeigher):
         We want spreading to be the default.
         """
         context = weight_properties['context']
-        volume_number = db.volume_data_get_for_host(context=context,
-                                                    host=host_state.host,
-                                                    count_only=True)
+        volume_number = db.volume_count_get_for_hosts(
+            context, [host_state.host])[host_state.host]
         return volume_number
+
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        """Weigh all the hosts with a single query of their volume numbers."""
+        context = weight_properties['context']
+        hosts = [obj.obj.host for obj in weighed_obj_list]
+        volume_numbers = db.volume_count_get_for_hosts(context, hosts)
+        return [volume_numbers[host] for host in hosts]
@@ -40,6 +40,7 @@ from cinder.i18n import _, _LE, _LI, _LW
 from cinder import objects
 from cinder.objects import base as objects_base
 from cinder import rpc
+from cinder import utils
 from cinder import version
 from cinder.wsgi import common as wsgi_common
 from cinder.wsgi import eventlet_server as wsgi
@@ -277,6 +278,7 @@ class Service(service.Service):
             except Exception:
                 pass
         self.timers = []
+        utils.RootwrapDaemonHelper.log_stats()
         super(Service, self).stop()
 
     def wait(self):
@@ -108,3 +108,18 @@ class SchedulerStatsAPITest(test.TestCase):
         }
 
         self.assertDictMatch(expected, res)
+
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.get_filter_stats')
+    def test_get_filter_stats(self, mock_get_filter_stats):
+        mock_get_filter_stats.return_value = [
+            {'name': 'CapacityFilter', 'runs': 2, 'objects_in': 10,
+             'objects_out': 5, 'time': 0.5, 'pass_ratio': 0.5,
+             'time_per_object': 0.05}]
+        req = fakes.HTTPRequest.blank(
+            '/v2/fake/scheduler-stats/get_filter_stats')
+        req.environ['cinder.context'] = self.ctxt
+        res = self.controller.get_filter_stats(req)
+
+        expected = {'filters': mock_get_filter_stats.return_value}
+        self.assertDictMatch(expected, res)
+        mock_get_filter_stats.assert_called_once_with(self.ctxt)
@@ -28,6 +28,7 @@ import mock
 from os_brick.remotefs import remotefs as remotefs_brick
 from oslo_config import cfg
 
+from cinder.backup import chunkeddriver
 from cinder.backup.drivers import nfs
 from cinder import context
 from cinder import db
@@ -105,6 +106,20 @@ def fake_md5(arg):
     return ret
 
 
+class RestoreExtentMapTestCase(test.TestCase):
+
+    def test_claim(self):
+        extent_map = chunkeddriver.RestoreExtentMap()
+
+        self.assertEqual([(10, 20)], extent_map.claim(10, 20))
+        self.assertEqual([(30, 40)], extent_map.claim(30, 40))
+        self.assertEqual([], extent_map.claim(12, 18))
+        self.assertEqual([(0, 10), (20, 30), (40, 50)],
+                         extent_map.claim(0, 50))
+        self.assertEqual([], extent_map.claim(0, 50))
+        self.assertEqual([(50, 60)], extent_map.claim(45, 60))
+
+
 class BackupNFSSwiftBasedTestCase(test.TestCase):
     """Test Cases for based on Swift tempest backup tests."""
 
@@ -186,6 +201,60 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
         backup = objects.Backup.get_by_id(self.ctxt, 123)
         service.backup(backup, self.volume_file)
 
+    def test_backup_parallel_chunks(self):
+        volume_id = '7b5aa2e1-3bd8-4a53-9cbb-000000f1f7a2'
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self._create_backup_db_entry(volume_id=volume_id, backup_id=123)
+        self._create_backup_db_entry(volume_id=volume_id, backup_id=124)
+
+        self.flags(backup_max_chunks_in_flight=1)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        self.flags(backup_max_chunks_in_flight=3)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        parallel_backup = objects.Backup.get_by_id(self.ctxt, 124)
+        service.backup(parallel_backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        parallel_backup = objects.Backup.get_by_id(self.ctxt, 124)
+        serial_objects = [list(obj.values())[0] for obj in
+                          service._read_metadata(backup)['objects']]
+        parallel_objects = [list(obj.values())[0] for obj in
+                            service._read_metadata(parallel_backup)['objects']]
+        self.assertEqual(8, len(parallel_objects))
+        self.assertEqual(serial_objects, parallel_objects)
+        self.assertEqual(service._read_sha256file(backup)['sha256s'],
+                         service._read_sha256file(parallel_backup)['sha256s'])
+        self.assertEqual(backup.object_count, parallel_backup.object_count)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(parallel_backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_parallel_chunks_write_fails(self):
+        volume_id = '9c1b3a44-52f0-4d1e-a3a8-000000c5d0e1'
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_max_chunks_in_flight=2)
+        self._create_backup_db_entry(volume_id=volume_id)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        self.mock_object(service, '_prepare_output_data',
+                         mock.Mock(side_effect=exception.BackupOperationError))
+        self.mock_object(service, '_finalize_backup')
+
+        self.assertRaises(exception.BackupOperationError,
+                          service.backup,
+                          backup, self.volume_file)
+        self.assertFalse(service._finalize_backup.called)
+
     def test_backup_default_container(self):
         volume_id = 'caffdc68-ef65-48af-928d-000000289076'
         self._create_backup_db_entry(volume_id=volume_id,
@@ -553,6 +622,50 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    @mock.patch('os.fsync')
+    def test_restore_prefetch(self, mock_fsync):
+        volume_id = 'e1a2c9d0-6b7f-4f5e-8a3b-0000003ab2c1'
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_restore_objects_in_flight=3)
+        self.flags(backup_restore_fsync_interval=0)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = objects.Backup.get_by_id(self.ctxt, 123)
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+        mock_fsync.assert_called_once_with(mock.ANY)
+
+    @mock.patch('os.fsync')
+    def test_restore_fsync_interval(self, mock_fsync):
+        volume_id = '2c41e6d4-97e1-4c7a-bd5c-000000a1e7f3'
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_compression_algorithm='none')
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_restore_fsync_interval=3)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = objects.Backup.get_by_id(self.ctxt, 123)
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+        # 8 objects: synced after the 3rd, the 6th and at the end.
+        self.assertEqual(3, mock_fsync.call_count)
+
     def test_restore_delta(self):
         volume_id = '486249dc-83c6-4a02-8d65-000000d819e7'
 
@@ -603,6 +716,157 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_restore_delta_fetches_newest_objects_only(self):
+        volume_id = 'a3c01b5e-8d2f-4e69-b0c4-00000094e6d2'
+
+        def _fake_generate_object_name_prefix(self, backup):
+            az = 'az_fake'
+            backup_name = '%s_backup_%s' % (az, backup['id'])
+            volume = 'volume_%s' % (backup['volume_id'])
+            prefix = volume + '_' + backup_name
+            return prefix
+
+        self.stubs.Set(nfs.NFSBackupDriver,
+                       '_generate_object_name_prefix',
+                       _fake_generate_object_name_prefix)
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+
+        container_name = self.temp_dir.replace(tempfile.gettempdir() + '/',
+                                               '', 1)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        for backup_id, parent_id in ((123, None), (124, 123), (125, 124)):
+            # Every incremental rewrites the same block.
+            if parent_id:
+                self.volume_file.seek(16 * 1024)
+                self.volume_file.write(os.urandom(1024))
+            self._create_backup_db_entry(volume_id=volume_id,
+                                         container=container_name,
+                                         backup_id=backup_id,
+                                         parent_id=parent_id)
+            self.volume_file.seek(0)
+            backup = objects.Backup.get_by_id(self.ctxt, backup_id)
+            service.backup(backup, self.volume_file)
+
+        self.mock_object(service, '_stream_restore_object',
+                         mock.Mock(wraps=service._stream_restore_object))
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = objects.Backup.get_by_id(self.ctxt, 125)
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+        fetched = [call[0][1] for call in
+                   service._stream_restore_object.call_args_list]
+        self.assertEqual(5, len(fetched))
+        self.assertFalse([name for name in fetched if 'backup_124' in name])
+        self.assertEqual(1, len([name for name in fetched
+                                 if 'backup_125' in name]))
+
+    def test_backup_skip_zero_chunks(self):
+        volume_id = 'f0e4d2b7-13a9-4c6e-9d1f-0000007c25e8'
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_file_size=(1024 * 4))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_skip_zero_chunks=True)
+        self.volume_file.seek(8 * 1024)
+        self.volume_file.write(b'\0' * (12 * 1024))
+        self.volume_file.flush()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.1.0', metadata['version'])
+        self.assertEqual(5, len(metadata['objects']))
+        self.assertEqual([{'offset': 8 * 1024, 'length': 4 * 1024},
+                          {'offset': 12 * 1024, 'length': 4 * 1024},
+                          {'offset': 16 * 1024, 'length': 4 * 1024}],
+                         metadata['zero_extents'])
+        self.assertEqual(32,
+                         len(service._read_sha256file(backup)['sha256s']))
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            restored_file.write(os.urandom(32 * 1024))
+            restored_file.flush()
+            service.restore(backup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_without_zero_chunks_keeps_version(self):
+        volume_id = '6d8a1f35-c2b0-4a7e-8e36-000000d94b10'
+
+        self._create_backup_db_entry(volume_id=volume_id)
+        self.flags(backup_skip_zero_chunks=True)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.0.0', metadata['version'])
+        self.assertNotIn('zero_extents', metadata)
+
+    @mock.patch('cinder.backup.chunkeddriver._punch_hole',
+                return_value=False)
+    def test_restore_delta_zeroed_chunk(self, mock_punch_hole):
+        volume_id = '84b7e0c1-5a3d-4f29-a6e2-0000002f81c9'
+
+        def _fake_generate_object_name_prefix(self, backup):
+            az = 'az_fake'
+            backup_name = '%s_backup_%s' % (az, backup['id'])
+            volume = 'volume_%s' % (backup['volume_id'])
+            prefix = volume + '_' + backup_name
+            return prefix
+
+        self.stubs.Set(nfs.NFSBackupDriver,
+                       '_generate_object_name_prefix',
+                       _fake_generate_object_name_prefix)
+
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_skip_zero_chunks=True)
+
+        container_name = self.temp_dir.replace(tempfile.gettempdir() + '/',
+                                               '', 1)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     container=container_name,
+                                     backup_id=123)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        # Discard a whole changed extent so the incremental records zeros.
+        self.volume_file.seek(16 * 1024)
+        self.volume_file.write(b'\0' * (2 * 1024))
+        self.volume_file.flush()
+        self._create_backup_db_entry(volume_id=volume_id,
+                                     container=container_name,
+                                     backup_id=124,
+                                     parent_id=123)
+        self.volume_file.seek(0)
+        deltabackup = objects.Backup.get_by_id(self.ctxt, 124)
+        service.backup(deltabackup, self.volume_file)
+
+        deltabackup = objects.Backup.get_by_id(self.ctxt, 124)
+        metadata = service._read_metadata(deltabackup)
+        self.assertEqual([], metadata['objects'])
+        self.assertEqual([{'offset': 16 * 1024, 'length': 2 * 1024}],
+                         metadata['zero_extents'])
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(deltabackup, volume_id, restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+        mock_punch_hole.assert_called_once_with(mock.ANY, 16 * 1024,
+                                                2 * 1024)
+
     def test_delete(self):
         volume_id = '4b5c39f2-4428-473c-b85a-000000477eca'
         self._create_backup_db_entry(volume_id=volume_id)
@@ -620,6 +884,52 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
         self.assertEqual(compressor, bz2)
         self.assertRaises(ValueError, service._get_compressor, 'fake')
 
+    def test_get_compressor_lz4_zstd(self):
+        fake_lz4 = mock.Mock()
+        fake_zstd = mock.Mock()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        with mock.patch.dict('sys.modules', {'lz4': fake_lz4,
+                                             'lz4.frame': fake_lz4.frame,
+                                             'zstd': fake_zstd}):
+            self.assertEqual(fake_lz4.frame, service._get_compressor('lz4'))
+            self.assertEqual(fake_zstd, service._get_compressor('zstd'))
+
+        with mock.patch.dict('sys.modules', {'zstd': None}):
+            self.assertRaises(ValueError, service._get_compressor, 'zstd')
+
+    def test_get_compressor_level(self):
+        self.flags(backup_compression_level=1)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        compressor = service._get_compressor('zlib')
+        self.assertIsInstance(compressor, chunkeddriver.LeveledCompressor)
+        data = bytes(bytearray(128))
+        self.assertEqual(zlib.compress(data, 1), compressor.compress(data))
+        self.assertEqual(data,
+                         compressor.decompress(compressor.compress(data)))
+
+    def test_prepare_output_data_sample_incompressible(self):
+        self.flags(backup_compression_sample_size=256)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.mock_object(service.compressor, 'compress',
+                         mock.Mock(side_effect=zlib.compress))
+        random_data = os.urandom(1024)
+
+        result = service._prepare_output_data(random_data)
+
+        self.assertEqual(('none', random_data), result)
+        service.compressor.compress.assert_called_once_with(
+            random_data[:256])
+
+    def test_prepare_output_data_sample_compressible(self):
+        self.flags(backup_compression_sample_size=256)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        fake_data = bytes(bytearray(1024))
+
+        result = service._prepare_output_data(fake_data)
+
+        self.assertEqual('zlib', result[0])
+        self.assertEqual(zlib.compress(fake_data), result[1])
+
     def test_prepare_output_data_effective_compression(self):
         service = nfs.NFSBackupDriver(self.ctxt)
         # Set up buffer of 128 zeroed bytes
@@ -34,6 +34,11 @@ class FakeSwiftClient(object):
         return FakeSwiftConnection()
 
 
+def _iter_chunks(body, chunk_size):
+    for offset in range(0, len(body), chunk_size):
+        yield body[offset:offset + chunk_size]
+
+
 class FakeSwiftConnection(object):
     """Logging calls instead of executing."""
     def __init__(self, *args, **kwargs):
@@ -63,7 +68,7 @@ class FakeSwiftConnection(object):
     def head_object(self, container, name):
         return {'etag': 'fake-md5-sum'}
 
-    def get_object(self, container, name):
+    def get_object(self, container, name, resp_chunk_size=None):
         if container == 'socket_error_on_get':
             raise socket.error(111, 'ECONNREFUSED')
         if 'metadata' in name:
@@ -93,8 +98,11 @@ class FakeSwiftConnection(object):
             return (fake_object_header, fake_object_body)
 
         fake_header = None
-        fake_object_body = os.urandom(1024 * 1024)
-        return (fake_header, zlib.compress(fake_object_body))
+        fake_object_body = zlib.compress(os.urandom(1024 * 1024))
+        if resp_chunk_size:
+            return (fake_header, _iter_chunks(fake_object_body,
+                                              resp_chunk_size))
+        return (fake_header, fake_object_body)
 
     def put_object(self, container, name, reader, content_length=None,
                    etag=None, chunk_size=None, content_type=None,
@@ -33,6 +33,11 @@ class FakeSwiftClient2(object):
         return FakeSwiftConnection2()
 
 
+def _iter_chunks(body, chunk_size):
+    for offset in range(0, len(body), chunk_size):
+        yield body[offset:offset + chunk_size]
+
+
 class FakeSwiftConnection2(object):
     def __init__(self, *args, **kwargs):
         self.tempdir = tempfile.mkdtemp()
@@ -66,12 +71,15 @@ class FakeSwiftConnection2(object):
     def head_object(self, container, name):
         return {'etag': 'fake-md5-sum'}
 
-    def get_object(self, container, name):
+    def get_object(self, container, name, resp_chunk_size=None):
         if container == 'socket_error_on_get':
             raise socket.error(111, 'ECONNREFUSED')
         object_path = tempfile.gettempdir() + '/' + container + '/' + name
         with open(object_path, 'rb') as object_file:
-            return (None, object_file.read())
+            body = object_file.read()
+        if resp_chunk_size:
+            return (None, _iter_chunks(body, resp_chunk_size))
+        return (None, body)
 
     def put_object(self, container, name, reader, content_length=None,
                    etag=None, chunk_size=None, content_type=None,
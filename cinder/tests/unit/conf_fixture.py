@@ -28,6 +28,10 @@ CONF.import_opt('xiv_ds8k_proxy',
 CONF.import_opt('backup_driver', 'cinder.backup.manager')
 CONF.import_opt('fixed_key', 'cinder.keymgr.conf_key_mgr', group='keymgr')
 CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
+CONF.import_opt('quota_volume_type_cache_ttl', 'cinder.quota')
+CONF.import_opt('scheduler_service_cache_ttl', 'cinder.scheduler.host_manager')
+CONF.import_opt('nfs_allocated_space_refresh_interval',
+                'cinder.volume.drivers.nfs')
 
 def_vol_type = 'fake_vol_type'
 
@@ -53,3 +57,7 @@ def set_defaults(conf):
         os.path.join(os.path.dirname(__file__), '..', '..', '..')))
     conf.set_default('policy_dirs', [], group='oslo_policy')
     conf.set_default('auth_strategy', 'noauth')
+    # Tests change volume types directly in the database.
+    conf.set_default('quota_volume_type_cache_ttl', 0)
+    conf.set_default('scheduler_service_cache_ttl', 0)
+    conf.set_default('nfs_allocated_space_refresh_interval', 0)
@@ -18,6 +18,7 @@
 import datetime
 import uuid
 
+import mock
 from oslo_utils import timeutils
 
 from cinder import context
@@ -89,6 +90,27 @@ class PurgeDeletedTest(test.TestCase):
         self.assertEqual(2, rows)
         self.assertEqual(2, meta_rows)
 
+    @mock.patch('cinder.db.sqlalchemy.api.time.sleep')
+    def test_purge_deleted_rows_batched(self, mock_sleep):
+        purged = db.purge_deleted_rows(self.context, age_in_days=10,
+                                       batch_size=1, pause=0.5)
+        rows = self.session.query(self.volumes).count()
+        meta_rows = self.session.query(self.vm).count()
+        self.assertEqual(8, purged)
+        self.assertEqual(2, rows)
+        self.assertEqual(2, meta_rows)
+        # A pause after each full batch of volumes and volume metadata.
+        self.assertEqual(8, mock_sleep.call_count)
+        mock_sleep.assert_called_with(0.5)
+
+    def test_purge_deleted_rows_follows_foreign_keys(self):
+        with mock.patch.object(db_api, '_purge_table',
+                               return_value=0) as mock_purge:
+            db.purge_deleted_rows(self.context, age_in_days=10)
+        tables = [call[0][1].name for call in mock_purge.call_args_list]
+        for table in ('volume_metadata', 'volume_attachment', 'snapshots'):
+            self.assertLess(tables.index(table), tables.index('volumes'))
+
     def test_purge_deleted_rows_bad_args(self):
         # Test with no age argument
         self.assertRaises(TypeError, db.purge_deleted_rows, self.context)
@@ -100,3 +122,7 @@ class PurgeDeletedTest(test.TestCase):
         self.assertRaises(exception.InvalidParameterValue,
                           db.purge_deleted_rows, self.context,
                           age_in_days=-1)
+        # Test with a batch size of zero
+        self.assertRaises(exception.InvalidParameterValue,
+                          db.purge_deleted_rows, self.context,
+                          age_in_days=10, batch_size=0)
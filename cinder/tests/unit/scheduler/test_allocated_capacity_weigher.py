@@ -44,13 +44,12 @@ class AllocatedCapacityWeigherTestCase(test.TestCase):
             weight_properties)[0]
 
     @mock.patch('cinder.db.sqlalchemy.api.service_get_all_by_topic')
-    def _get_all_hosts(self, _mock_service_get_all_by_topic, disabled=False):
+    def _get_all_hosts(self, _mock_service_get_all_by_topic):
         ctxt = context.get_admin_context()
-        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic,
-                                         disabled=disabled)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
         host_states = self.host_manager.get_all_host_states(ctxt)
         _mock_service_get_all_by_topic.assert_called_once_with(
-            ctxt, CONF.volume_topic, disabled=disabled)
+            ctxt, CONF.volume_topic, disabled=None)
         return host_states
 
     def test_default_of_spreading_first(self):
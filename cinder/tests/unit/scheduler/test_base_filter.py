@@ -166,3 +166,43 @@ class TestBaseFilterHandler(test.TestCase):
             result = self._get_filtered_objects(filter_classes, index=2)
             self.assertEqual(filter_objs_expected, result)
             self.assertEqual(1, fake5_filter_all.call_count)
+
+    def test_get_filtered_objects_reuses_filters(self):
+        filter_classes = [FakeFilter1, FakeFilter4]
+        with mock.patch.object(FakeFilter1, '__init__',
+                               return_value=None) as fake1_init:
+            self._get_filtered_objects(filter_classes)
+            self._get_filtered_objects(filter_classes)
+        self.assertEqual(1, fake1_init.call_count)
+
+    @mock.patch('cinder.scheduler.base_filter.time')
+    def test_get_filter_stats(self, mock_time):
+        mock_time.time.side_effect = [0, 1, 1, 1.5]
+        filter_classes = [FakeFilter1, FakeFilter4]
+        with mock.patch.object(FakeFilter1, 'filter_all',
+                               return_value=[1, 2, 3]):
+            self._get_filtered_objects(filter_classes)
+
+        expected = [{'name': 'FakeFilter1', 'runs': 1, 'objects_in': 4,
+                     'objects_out': 3, 'time': 1.0, 'pass_ratio': 0.75,
+                     'time_per_object': 0.25},
+                    {'name': 'FakeFilter4', 'runs': 1, 'objects_in': 3,
+                     'objects_out': 3, 'time': 0.5, 'pass_ratio': 1.0,
+                     'time_per_object': 0.5 / 3}]
+        self.assertEqual(expected, self.handler.get_filter_stats())
+
+    def test_order_filters(self):
+        self.handler._filter_stats = {
+            # 1s per removed object
+            'FakeFilter1': {'runs': 1, 'objects_in': 4, 'objects_out': 2,
+                            'time': 2.0},
+            # removes nothing
+            'FakeFilter2': {'runs': 1, 'objects_in': 4, 'objects_out': 4,
+                            'time': 0.1},
+            # 0.5s per removed object
+            'FakeFilter3': {'runs': 1, 'objects_in': 4, 'objects_out': 0,
+                            'time': 2.0},
+        }
+        filter_classes = [FakeFilter1, FakeFilter2, FakeFilter3, FakeFilter4]
+        self.assertEqual([FakeFilter4, FakeFilter3, FakeFilter1, FakeFilter2],
+                         self.handler.order_filters(filter_classes))
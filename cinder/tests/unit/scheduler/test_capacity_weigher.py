@@ -44,13 +44,12 @@ class CapacityWeigherTestCase(test.TestCase):
             weight_properties)
 
     @mock.patch('cinder.db.sqlalchemy.api.service_get_all_by_topic')
-    def _get_all_hosts(self, _mock_service_get_all_by_topic, disabled=False):
+    def _get_all_hosts(self, _mock_service_get_all_by_topic):
         ctxt = context.get_admin_context()
-        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic,
-                                         disabled=disabled)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
         host_states = self.host_manager.get_all_host_states(ctxt)
         _mock_service_get_all_by_topic.assert_called_once_with(
-            ctxt, CONF.volume_topic, disabled=disabled)
+            ctxt, CONF.volume_topic, disabled=None)
         return host_states
 
     # If thin_provisioning_support = False, use the following formula:
@@ -337,3 +336,40 @@ class CapacityWeigherTestCase(test.TestCase):
         worst_host = weighed_hosts[-1]
         self.assertEqual(-1.0, worst_host.weight)
         self.assertEqual('host5', utils.extract_host(worst_host.obj.host))
+
+    def _get_weighed_hosts_without_numpy(self, hosts, weigher_classes):
+        with mock.patch('cinder.scheduler.base_weight.np', None), \
+                mock.patch('cinder.scheduler.weights.capacity.np', None):
+            return self.weight_handler.get_weighed_objects(
+                weigher_classes, hosts, {'size': 1})
+
+    def _test_numpy_weighing(self, capacity_weight_multiplier,
+                             thin_provisioning_support=True):
+        if weights.capacity.np is None:
+            self.skipTest('NumPy is not installed.')
+        self.flags(capacity_weight_multiplier=capacity_weight_multiplier)
+        hostinfo_list = list(self._get_all_hosts())
+        for host in hostinfo_list:
+            if host.thin_provisioning_support:
+                host.thin_provisioning_support = thin_provisioning_support
+        weigher_classes = [weights.capacity.CapacityWeigher,
+                           weights.capacity.AllocatedCapacityWeigher]
+
+        expected = self._get_weighed_hosts_without_numpy(hostinfo_list,
+                                                         weigher_classes)
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+            weigher_classes, hostinfo_list, {'size': 1})
+
+        self.assertEqual([host.obj.host for host in expected],
+                         [host.obj.host for host in weighed_hosts])
+        for expected_host, weighed_host in zip(expected, weighed_hosts):
+            self.assertAlmostEqual(expected_host.weight, weighed_host.weight)
+
+    def test_numpy_weighing_spreading(self):
+        self._test_numpy_weighing(1.0)
+
+    def test_numpy_weighing_stacking(self):
+        self._test_numpy_weighing(-1.0)
+
+    def test_numpy_weighing_thin_provisioning_support_none(self):
+        self._test_numpy_weighing(1.0, thin_provisioning_support=None)
@@ -22,6 +22,7 @@ from cinder import context
 from cinder import exception
 from cinder.scheduler import filter_scheduler
 from cinder.scheduler import host_manager
+from cinder.scheduler import weights
 from cinder.tests.unit.scheduler import fakes
 from cinder.tests.unit.scheduler import test_scheduler
 from cinder.volume import utils
@@ -192,6 +193,57 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    def test_schedule_create_volumes(self, _mock_volume_update_db):
+        # Volumes are handed out greedily to the host with the most free
+        # capacity, a host being dropped once it is full.
+        sched = fakes.FakeFilterScheduler()
+        fake_context = context.RequestContext('user', 'project')
+        hosts = [fakes.FakeHostState('host1', {'free_capacity_gb': 25}),
+                 fakes.FakeHostState('host2', {'free_capacity_gb': 20})]
+        for host in hosts:
+            host.allocated_capacity_gb = host.provisioned_capacity_gb = 0
+
+        def fake_weigh(hosts, filter_properties):
+            return sorted((weights.WeighedHost(host, host.free_capacity_gb)
+                           for host in hosts),
+                          key=lambda host: host.weight, reverse=True)
+
+        def fake_filter(hosts, filter_properties):
+            return [host for host in hosts if host.free_capacity_gb >= 10]
+
+        request_spec = {'volume_type': {'name': 'LVM_iSCSI'},
+                        'volume_properties': {'project_id': 1,
+                                              'size': 10}}
+        filter_properties = {'scheduler_hints': {}}
+        with mock.patch.object(sched, '_get_weighted_candidates',
+                               return_value=fake_weigh(hosts, None)), \
+                mock.patch.object(sched.host_manager, 'get_weighed_hosts',
+                                  side_effect=fake_weigh), \
+                mock.patch.object(sched.host_manager, 'get_filtered_hosts',
+                                  side_effect=fake_filter), \
+                mock.patch.object(sched.volume_rpcapi,
+                                  'create_volume') as create_volume:
+            scheduled_ids = []
+            unplaced = sched.schedule_create_volumes(
+                fake_context, request_spec, filter_properties,
+                ['vol1', 'vol2', 'vol3', 'vol4', 'vol5'], scheduled_ids)
+
+        self.assertEqual(['vol5'], unplaced)
+        self.assertEqual(['vol1', 'vol3', 'vol2', 'vol4'], scheduled_ids)
+        # Each placement is recorded before the hosts are weighed again.
+        self.assertEqual([mock.call(fake_context, 'vol1', 'host1'),
+                          mock.call(fake_context, 'vol2', 'host2'),
+                          mock.call(fake_context, 'vol3', 'host1'),
+                          mock.call(fake_context, 'vol4', 'host2')],
+                         _mock_volume_update_db.call_args_list)
+        self.assertEqual(
+            ['vol1', 'vol3', 'vol2', 'vol4'],
+            [call[0][3]['volume_id'] for call in create_volume.call_args_list])
+        self.assertNotIn('context', filter_properties)
+        self.assertEqual(5, hosts[0].free_capacity_gb)
+        self.assertEqual(0, hosts[1].free_capacity_gb)
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     def test_create_volume_clear_host_different_with_cg(self,
                                                         _mock_service_get_all):
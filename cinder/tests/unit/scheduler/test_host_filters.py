@@ -700,6 +700,61 @@ class AffinityFilterTestCase(HostFiltersTestCase):
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_different_filter_all_queries_once(self):
+        filt_cls = self.class_map['DifferentBackendFilter']()
+        hosts = [fakes.FakeHostState('host%d' % i, {}) for i in range(10)]
+        volume1 = utils.create_volume(self.context, host='host1')
+        volume2 = utils.create_volume(self.context, host='host3')
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'different_host': [volume1.id, volume2.id], }}
+
+        with mock.patch.object(filt_cls.volume_api, 'get_all',
+                               wraps=filt_cls.volume_api.get_all) as get_all:
+            result = list(filt_cls.filter_all(hosts, filter_properties))
+            self.assertTrue(filt_cls.host_passes(hosts[0],
+                                                 filter_properties))
+            self.assertFalse(filt_cls.host_passes(hosts[1],
+                                                  filter_properties))
+
+        self.assertEqual(1, get_all.call_count)
+        self.assertEqual(['host0', 'host2', 'host4', 'host5', 'host6',
+                          'host7', 'host8', 'host9'],
+                         [host.host for host in result])
+        self.assertEqual(['host1', 'host3'],
+                         sorted(filter_properties['affinity_hosts'][
+                             'different_host']))
+
+    def test_same_filter_all_queries_once(self):
+        filt_cls = self.class_map['SameBackendFilter']()
+        hosts = [fakes.FakeHostState('host%d' % i, {}) for i in range(10)]
+        volume = utils.create_volume(self.context, host='host4')
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'same_host': volume.id, }}
+
+        with mock.patch.object(filt_cls.volume_api, 'get_all',
+                               wraps=filt_cls.volume_api.get_all) as get_all:
+            result = list(filt_cls.filter_all(hosts, filter_properties))
+
+        self.assertEqual(1, get_all.call_count)
+        self.assertEqual([hosts[4]], result)
+
+    def test_same_filter_all_fail_nonuuid_hint(self):
+        filt_cls = self.class_map['SameBackendFilter']()
+        hosts = [fakes.FakeHostState('host1', {})]
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'same_host': ['NOT-a-valid-UUID'], }}
+
+        with mock.patch.object(filt_cls.volume_api, 'get_all') as get_all:
+            self.assertEqual([], list(filt_cls.filter_all(
+                hosts, filter_properties)))
+        self.assertFalse(get_all.called)
+
 
 class DriverFilterTestCase(HostFiltersTestCase):
     def test_passing_function(self):
@@ -961,6 +1016,35 @@ class InstanceLocalityFilterTestCase(HostFiltersTestCase):
         self.assertRaises(exception.CinderException,
                           filt_cls.host_passes, host, filter_properties)
 
+    @mock.patch.object(nova.API, 'get_server')
+    @mock.patch.object(nova.API, 'has_extension')
+    def test_extended_server_attributes_checked_per_request(
+            self, _mock_has_extension, _mock_get_server):
+        filt_cls = self.class_map['InstanceLocalityFilter']()
+        host1 = fakes.FakeHostState('host1', {})
+        host2 = fakes.FakeHostState('host2', {})
+        uuid = fakes.FakeNovaClient().servers.create('host1')
+        _mock_get_server.return_value = mock.Mock(
+            **{'OS-EXT-SRV-ATTR:host': 'host1'})
+
+        _mock_has_extension.return_value = False
+        filter_properties = {'context': self.context,
+                             'scheduler_hints': {'local_to_instance': uuid}}
+        self.assertRaises(exception.CinderException,
+                          filt_cls.host_passes, host1, filter_properties)
+
+        # The same filter instance serves the next request, which must not
+        # see the answer given to the previous one.
+        _mock_has_extension.return_value = True
+        filter_properties = {'context': self.context,
+                             'scheduler_hints': {'local_to_instance': uuid}}
+        self.assertTrue(filt_cls.host_passes(host1, filter_properties))
+        self.assertFalse(filt_cls.host_passes(host2, filter_properties))
+        self.assertEqual(2, _mock_has_extension.call_count)
+        _mock_get_server.assert_called_once_with(
+            self.context, uuid, privileged_user=True,
+            timeout=mock.ANY)
+
     @mock.patch('cinder.compute.nova.novaclient')
     def test_nova_down_does_not_alter_other_filters(self, _mock_novaclient):
         # Simulate Nova API is not available
@@ -1214,6 +1298,17 @@ class ExtraSpecsOpsTestCase(test.TestCase):
             req='>= 3',
             matches=False)
 
+    def test_get_matcher(self):
+        matcher = filters.extra_specs_ops.get_matcher('<or> nfs <or> iSCSI')
+        self.assertTrue(matcher('iSCSI'))
+        self.assertTrue(matcher('nfs'))
+        self.assertFalse(matcher('FC'))
+        self.assertFalse(matcher(None))
+
+    def test_get_matcher_with_invalid_number(self):
+        matcher = filters.extra_specs_ops.get_matcher('>= abc')
+        self.assertFalse(matcher('3'))
+
 
 class BasicFiltersTestCase(HostFiltersTestCase):
     """Test case for host filters."""
@@ -1300,6 +1395,34 @@ class BasicFiltersTestCase(HostFiltersTestCase):
             especs={'capabilities:scope_lv1:opt1': '>= 2'},
             passes=False)
 
+    @mock.patch('cinder.scheduler.filters.extra_specs_ops.get_matcher',
+                wraps=filters.extra_specs_ops.get_matcher)
+    def test_capability_filter_filter_all(self, mock_get_matcher):
+        filt_cls = self.class_map['CapabilitiesFilter']()
+        filter_properties = {'resource_type': {
+            'name': 'fake_type',
+            'extra_specs': {'storage_protocol': '<or> iSCSI <or> FC',
+                            'capabilities:free_capacity_gb': '>= 10'}}}
+        hosts = [fakes.FakeHostState('host%d' % i,
+                                     {'capabilities': caps})
+                 for i, caps in enumerate([
+                     {'storage_protocol': 'iSCSI', 'free_capacity_gb': 20},
+                     {'storage_protocol': 'NFS', 'free_capacity_gb': 20},
+                     {'storage_protocol': 'FC', 'free_capacity_gb': 5},
+                     {'storage_protocol': 'iSCSI', 'free_capacity_gb': 20},
+                     {'storage_protocol': 'FC'},
+                     {'storage_protocol': 'FC', 'free_capacity_gb': 30}])]
+
+        with mock.patch.object(filt_cls, '_satisfies_requirements',
+                               wraps=filt_cls._satisfies_requirements) as sat:
+            result = filt_cls.filter_all(hosts, filter_properties)
+
+        self.assertEqual([hosts[0], hosts[3], hosts[5]], result)
+        # Requirements are parsed once, hosts with the same capabilities
+        # are checked once.
+        self.assertEqual(2, mock_get_matcher.call_count)
+        self.assertEqual(5, sat.call_count)
+
     def test_json_filter_passes(self):
         filt_cls = self.class_map['JsonFilter']()
         filter_properties = {'resource_type': {'memory_mb': 1024,
@@ -88,6 +88,28 @@ class HostManagerTestCase(test.TestCase):
         self.assertEqual(expected, mock_func.call_args_list)
         self.assertEqual(set(self.fake_hosts), set(result))
 
+    @mock.patch('cinder.scheduler.base_filter.BaseFilterHandler.'
+                'order_filters')
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_filters')
+    def test_get_filtered_hosts_ordered(self, _mock_choose_host_filters,
+                                        _mock_order_filters):
+        self.flags(scheduler_order_filters=True)
+        _mock_choose_host_filters.return_value = [FakeFilterClass1,
+                                                  FakeFilterClass2]
+        _mock_order_filters.return_value = [FakeFilterClass2]
+
+        with mock.patch.object(FakeFilterClass1, 'filter_all') as fake1, \
+                mock.patch.object(FakeFilterClass2, 'host_passes',
+                                  return_value=True):
+            result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                          {})
+
+        _mock_order_filters.assert_called_once_with([FakeFilterClass1,
+                                                     FakeFilterClass2])
+        self.assertFalse(fake1.called)
+        self.assertEqual(self.fake_hosts, result)
+
     @mock.patch('oslo_utils.timeutils.utcnow')
     def test_update_service_capabilities(self, _mock_utcnow):
         service_states = self.host_manager.service_states
@@ -266,7 +288,7 @@ class HostManagerTestCase(test.TestCase):
         self.host_manager.get_all_host_states(context)
         _mock_service_get_all_by_topic.assert_called_with(context,
                                                           topic,
-                                                          disabled=False)
+                                                          disabled=None)
         expected = []
         for service in service_objs:
             expected.append(mock.call(service))
@@ -291,7 +313,7 @@ class HostManagerTestCase(test.TestCase):
         self.host_manager.get_all_host_states(context)
         _mock_service_get_all_by_topic.assert_called_with(context,
                                                           topic,
-                                                          disabled=False)
+                                                          disabled=None)
 
         self.assertEqual(expected, _mock_service_is_up.call_args_list)
         self.assertTrue(_mock_warning.call_count > 0)
@@ -306,6 +328,57 @@ class HostManagerTestCase(test.TestCase):
             test_service.TestService._compare(self, volume_node,
                                               host_state_map[host].service)
 
+    @mock.patch('cinder.scheduler.host_manager.time')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_get_all_host_states_caches_services(
+            self, _mock_service_get_all_by_topic, _mock_time):
+        self.flags(scheduler_service_cache_ttl=10)
+        context = 'fake_context'
+        _mock_time.time.return_value = 100
+        _mock_service_get_all_by_topic.return_value = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow(),
+                 binary=None, deleted=False, created_at=None, modified_at=None,
+                 report_count=0, deleted_at=None, disabled_reason=None),
+            dict(id=2, host='host3', topic='volume', disabled=True,
+                 availability_zone='zone1', updated_at=timeutils.utcnow(),
+                 binary=None, deleted=False, created_at=None, modified_at=None,
+                 report_count=0, deleted_at=None, disabled_reason=None),
+        ]
+        self.host_manager.service_states = {
+            'host1': dict(volume_backend_name='AAA', total_capacity_gb=512,
+                          free_capacity_gb=200, timestamp=None,
+                          reserved_percentage=0)}
+
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.get_pools(context)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+        self.assertEqual(['host1'], list(self.host_manager.host_state_map))
+
+        # Capabilities of a known service do not refresh the cache.
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=100))
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # Neither do those of a known but disabled service.
+        self.host_manager.update_service_capabilities(
+            'volume', 'host3', dict(free_capacity_gb=100))
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+        self.assertEqual(['host1'], list(self.host_manager.host_state_map))
+
+        # Capabilities of a new service do.
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', dict(free_capacity_gb=100))
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+
+        # And so does time.
+        _mock_time.time.return_value = 110
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(3, _mock_service_get_all_by_topic.call_count)
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     @mock.patch('cinder.utils.service_is_up')
     def test_get_pools(self, _mock_service_is_up,
@@ -102,6 +102,15 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  version='1.9')
         can_send_version.assert_called_once_with('1.9')
 
+    def test_create_volumes(self):
+        self._test_scheduler_api('create_volumes',
+                                 rpc_method='cast',
+                                 topic='topic',
+                                 volume_ids=['volume_id1', 'volume_id2'],
+                                 request_spec='fake_request_spec',
+                                 filter_properties='filter_properties',
+                                 version='1.12')
+
     @mock.patch('oslo_messaging.RPCClient.can_send_version',
                 return_value=False)
     def test_create_volume_old(self, can_send_version):
@@ -187,3 +196,8 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  rpc_method='call',
                                  filters=None,
                                  version='1.7')
+
+    def test_get_filter_stats(self):
+        self._test_scheduler_api('get_filter_stats',
+                                 rpc_method='call',
+                                 version='1.13')
@@ -115,6 +115,58 @@ class SchedulerManagerTestCase(test.TestCase):
         _mock_sched_create.assert_called_once_with(self.context, request_spec,
                                                    {})
 
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volumes')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volumes_puts_unplaced_volumes_in_error_state(
+            self, _mock_volume_update, _mock_sched_create):
+        _mock_sched_create.return_value = ['fake_id2']
+        request_spec = {'volume_id': 'fake_id1'}
+
+        self.manager.create_volumes(self.context, self.topic,
+                                    ['fake_id1', 'fake_id2'],
+                                    request_spec=request_spec,
+                                    filter_properties={})
+        _mock_sched_create.assert_called_once_with(
+            self.context, request_spec, {}, ['fake_id1', 'fake_id2'], [])
+        _mock_volume_update.assert_called_once_with(self.context,
+                                                    'fake_id2',
+                                                    {'status': 'error'})
+
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volumes')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volumes_failure_spares_scheduled_volumes(
+            self, _mock_volume_update, _mock_sched_create):
+        def fake_schedule(context, request_spec, filter_properties,
+                          volume_ids, scheduled_ids):
+            scheduled_ids.append('fake_id1')
+            raise exception.CinderException()
+
+        _mock_sched_create.side_effect = fake_schedule
+
+        self.assertRaises(exception.CinderException,
+                          self.manager.create_volumes, self.context,
+                          self.topic, ['fake_id1', 'fake_id2'],
+                          request_spec={'volume_id': 'fake_id1'},
+                          filter_properties={})
+        _mock_volume_update.assert_called_once_with(self.context,
+                                                    'fake_id2',
+                                                    {'status': 'error'})
+
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volumes')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volumes_no_valid_host(self, _mock_volume_update,
+                                          _mock_sched_create):
+        _mock_sched_create.side_effect = exception.NoValidHost(reason="")
+
+        self.manager.create_volumes(self.context, self.topic,
+                                    ['fake_id1', 'fake_id2'],
+                                    request_spec={'volume_id': 'fake_id1'},
+                                    filter_properties={})
+        self.assertEqual(
+            [mock.call(self.context, 'fake_id1', {'status': 'error'}),
+             mock.call(self.context, 'fake_id2', {'status': 'error'})],
+            _mock_volume_update.call_args_list)
+
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('eventlet.sleep')
     def test_create_volume_no_delay(self, _mock_sleep, _mock_sched_create):
@@ -342,6 +394,24 @@ class SchedulerDriverBaseTestCase(SchedulerTestCase):
                           self.context, self.topic, 'schedule_something',
                           *fake_args, **fake_kwargs)
 
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
+    def test_schedule_create_volumes(self, _mock_sched_create):
+        _mock_sched_create.side_effect = [
+            None, exception.NoValidHost(reason="")]
+        request_spec = {'volume_id': 'fake_id1', 'volume_properties': {}}
+
+        scheduled_ids = []
+        unplaced = self.driver.schedule_create_volumes(
+            self.context, request_spec, {}, ['fake_id1', 'fake_id2'],
+            scheduled_ids)
+        self.assertEqual(['fake_id2'], unplaced)
+        self.assertEqual(['fake_id1'], scheduled_ids)
+        self.assertEqual(
+            [mock.call(self.context, request_spec, {}),
+             mock.call(self.context, {'volume_id': 'fake_id2',
+                                      'volume_properties': {}}, {})],
+            _mock_sched_create.call_args_list)
+
 
 class SchedulerDriverModuleTestCase(test.TestCase):
     """Test case for scheduler driver module methods."""
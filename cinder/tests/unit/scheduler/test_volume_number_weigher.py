@@ -29,7 +29,7 @@ from cinder.volume import utils
 CONF = cfg.CONF
 
 
-def fake_volume_data_get_for_host(context, host, count_only=False):
+def fake_volume_count_get_for_host(host):
     host = utils.extract_host(host)
     if host == 'host1':
         return 1
@@ -45,6 +45,10 @@ def fake_volume_data_get_for_host(context, host, count_only=False):
         return 6
 
 
+def fake_volume_count_get_for_hosts(context, hosts):
+    return {host: fake_volume_count_get_for_host(host) for host in hosts}
+
+
 class VolumeNumberWeigherTestCase(test.TestCase):
     def setUp(self):
         super(VolumeNumberWeigherTestCase, self).setUp()
@@ -62,13 +66,12 @@ class VolumeNumberWeigherTestCase(test.TestCase):
             weight_properties)[0]
 
     @mock.patch('cinder.db.sqlalchemy.api.service_get_all_by_topic')
-    def _get_all_hosts(self, _mock_service_get_all_by_topic, disabled=False):
+    def _get_all_hosts(self, _mock_service_get_all_by_topic):
         ctxt = context.get_admin_context()
-        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic,
-                                         disabled=disabled)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
         host_states = self.host_manager.get_all_host_states(ctxt)
         _mock_service_get_all_by_topic.assert_called_once_with(
-            ctxt, CONF.volume_topic, disabled=disabled)
+            ctxt, CONF.volume_topic, disabled=None)
         return host_states
 
     def test_volume_number_weight_multiplier1(self):
@@ -81,8 +84,8 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes   Norm=-1.0
         # so, host1 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(0.0, weighed_host.weight)
             self.assertEqual('host1',
@@ -98,9 +101,21 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes     Norm=1
         # so, host5 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(1.0, weighed_host.weight)
             self.assertEqual('host5',
                              utils.extract_host(weighed_host.obj.host))
+
+    def test_volume_number_weigh_objects_single_query(self):
+        hostinfo_list = self._get_all_hosts()
+
+        with mock.patch.object(
+                api, 'volume_count_get_for_hosts',
+                side_effect=fake_volume_count_get_for_hosts) as count_get:
+            weighed_host = self._get_weighed_host(hostinfo_list)
+
+        count_get.assert_called_once_with(
+            self.context, [host.host for host in hostinfo_list])
+        self.assertEqual('host1', utils.extract_host(weighed_host.obj.host))
@@ -52,3 +52,20 @@ class TestWeightHandler(test.TestCase):
         for seq, result, minval, maxval in map_:
             ret = base_weight.normalize(seq, minval=minval, maxval=maxval)
             self.assertEqual(result, tuple(ret))
+
+    def test_normalization_array(self):
+        if base_weight.np is None:
+            self.skipTest('NumPy is not installed.')
+        np = base_weight.np
+        # weight_list, expected_result, minval, maxval
+        map_ = (
+            ((), (), None, None),
+            ((1.0, 1.0), (0.0, 0.0), None, None),
+            ((20.0, 50.0), (0.0, 1.0), None, None),
+            ((20.0, 50.0), (0.0, 0.375), None, 100.0),
+            ((20.0, 50.0), (0.2, 0.5), 0.0, 100.0),
+        )
+        for seq, result, minval, maxval in map_:
+            ret = base_weight.normalize(np.array(seq, dtype=float),
+                                        minval=minval, maxval=maxval)
+            self.assertEqual(result, tuple(ret))
@@ -144,10 +144,8 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
 
     def test_create_iscsi_target(self):
         with mock.patch('cinder.utils.execute', return_value=('', '')),\
-                mock.patch.object(self.target, '_get_target',
-                                  side_effect=lambda x: 1),\
-                mock.patch.object(self.target, '_verify_backing_lun',
-                                  side_effect=lambda x, y: True):
+                mock.patch.object(self.target, '_get_targets',
+                                  return_value={self.test_vol: (1, True)}):
             self.assertEqual(
                 1,
                 self.target.create_iscsi_target(
@@ -156,6 +154,36 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
                     0,
                     self.fake_volumes_dir))
 
+    def test_get_targets(self):
+        scan = (self.fake_iscsi_scan +
+                'Target 2: %s2\n'
+                '    LUN information:\n'
+                '        LUN: 0\n'
+                '            Type: controller\n' % self.test_vol)
+        with mock.patch('cinder.utils.execute',
+                        return_value=(scan, None)) as mock_execute:
+            self.assertEqual({self.test_vol: ('1', True),
+                              self.test_vol + '2': ('2', False)},
+                             self.target._get_targets())
+        mock_execute.assert_called_once_with('tgt-admin', '--show',
+                                             run_as_root=True)
+
+    def test_create_iscsi_target_lists_targets_once(self):
+        with mock.patch('cinder.utils.execute',
+                        return_value=(self.fake_iscsi_scan, '')) as m_exec:
+            self.assertEqual(
+                '1',
+                self.target.create_iscsi_target(
+                    self.test_vol,
+                    1,
+                    0,
+                    self.fake_volumes_dir))
+
+        self.assertEqual([mock.call('tgt-admin', '--update', self.test_vol,
+                                    run_as_root=True),
+                          mock.call('tgt-admin', '--show', run_as_root=True)],
+                         m_exec.call_args_list)
+
     def test_create_iscsi_target_content(self):
 
         self.iscsi_target_flags = 'foo'
@@ -163,10 +191,8 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
 
         mock_open = mock.mock_open()
         with mock.patch('cinder.utils.execute', return_value=('', '')),\
-                mock.patch.object(self.target, '_get_target',
-                                  side_effect=lambda x: 1),\
-                mock.patch.object(self.target, '_verify_backing_lun',
-                                  side_effect=lambda x, y: True),\
+                mock.patch.object(self.target, '_get_targets',
+                                  return_value={self.test_vol: (1, True)}),\
                 mock.patch('cinder.volume.targets.tgt.open',
                            mock_open, create=True):
             self.assertEqual(
@@ -189,10 +215,8 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
             else:
                 return 'fake out', 'fake err'
 
-        with mock.patch.object(self.target, '_get_target',
-                               side_effect=lambda x: 1),\
-                mock.patch.object(self.target, '_verify_backing_lun',
-                                  side_effect=lambda x, y: True),\
+        with mock.patch.object(self.target, '_get_targets',
+                               return_value={self.test_vol: (1, True)}),\
                 mock.patch('cinder.utils.execute', _fake_execute):
             self.assertEqual(
                 1,
@@ -337,11 +361,10 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
                            self.testvol['name'] + ' 1',
                            'auth': 'CHAP QZJb P68e'}
 
+        iqn = self.iscsi_target_prefix + self.testvol['name']
         with mock.patch('cinder.utils.execute', return_value=('', '')),\
-                mock.patch.object(self.target, '_get_target',
-                                  side_effect=lambda x: 1),\
-                mock.patch.object(self.target, '_verify_backing_lun',
-                                  side_effect=lambda x, y: True),\
+                mock.patch.object(self.target, '_get_targets',
+                                  return_value={iqn: (1, True)}),\
                 mock.patch.object(self.target, '_get_target_chap_auth',
                                   side_effect=lambda x, y: None) as m_chap,\
                 mock.patch.object(vutils, 'generate_username',
@@ -380,3 +403,54 @@ class TestTgtAdmDriver(tf.TargetDriverFixture):
             old_name=None,
             portals_ips=[self.configuration.iscsi_ip_address],
             portals_port=self.configuration.iscsi_port)
+
+    @mock.patch.object(tgt.TgtAdm, '_restore_backing_lun')
+    @mock.patch.object(tgt.TgtAdm, 'create_iscsi_target')
+    @mock.patch.object(tgt.TgtAdm, '_get_target_chap_auth',
+                       return_value=('foo', 'bar'))
+    def test_ensure_exports(self, mock_get_chap, mock_create,
+                            mock_restore):
+        ctxt = context.get_admin_context()
+        volumes = [dict(self.testvol, name='volume-%d' % i, id=str(i))
+                   for i in range(3)]
+        iqns = [self.iscsi_target_prefix + vol['name'] for vol in volumes]
+        mock_create.side_effect = exception.ISCSITargetCreateFailed(
+            volume_id='2')
+
+        with mock.patch('cinder.utils.execute',
+                        return_value=('', '')) as mock_execute,\
+                mock.patch.object(self.target, '_get_targets',
+                                  return_value={iqns[0]: ('1', True),
+                                                iqns[1]: ('2', False)}):
+            failed = self.target.ensure_exports(
+                ctxt, [(vol, '/dev/vg/' + vol['name']) for vol in volumes])
+
+        self.assertEqual([volumes[2]], failed)
+        mock_execute.assert_called_once_with('tgt-admin', '--update', 'ALL',
+                                             run_as_root=True)
+        for vol in volumes:
+            self.assertTrue(os.path.exists(
+                os.path.join(self.fake_volumes_dir, vol['name'])))
+        mock_restore.assert_called_once_with(
+            iqns[1], '2', iqns[1], '/dev/vg/volume-1',
+            os.path.join(self.fake_volumes_dir, 'volume-1'))
+        mock_create.assert_called_once_with(
+            iqns[2], 0, 1, '/dev/vg/volume-2', ('foo', 'bar'),
+            check_exit_code=False, old_name=None,
+            portals_ips=[self.configuration.iscsi_ip_address],
+            portals_port=self.configuration.iscsi_port)
+
+    @mock.patch.object(tgt.TgtAdm, '_do_tgt_update')
+    @mock.patch.object(tgt.TgtAdm, 'ensure_export')
+    @mock.patch.object(tgt.TgtAdm, '_get_target_chap_auth',
+                       return_value=('foo', 'bar'))
+    def test_ensure_exports_update_failure(self, mock_get_chap,
+                                           mock_ensure_export, mock_update):
+        ctxt = context.get_admin_context()
+        mock_update.side_effect = putils.ProcessExecutionError
+        exports = [(self.testvol, self.testvol_path)]
+
+        self.assertEqual([], self.target.ensure_exports(ctxt, exports))
+
+        mock_ensure_export.assert_called_once_with(ctxt, self.testvol,
+                                                   self.testvol_path)
@@ -23,6 +23,7 @@ import filecmp
 import hashlib
 import os
 import shutil
+import socket
 import tempfile
 import zlib
 
@@ -45,9 +46,14 @@ CONF = cfg.CONF
 
 ANY = mock.ANY
 
+md5_orig = hashlib.md5
 
-def fake_md5(arg):
+
+def fake_md5(arg=None):
     class result(object):
+        def update(self, data):
+            pass
+
         def hexdigest(self):
             return 'fake-md5-sum'
 
@@ -715,6 +721,66 @@ class BackupSwiftTestCase(test.TestCase):
         backup = objects.Backup.get_by_id(self.ctxt, 123)
         service.delete(backup)
 
+    def test_object_writer_streams_body(self):
+        self.stubs.Set(hashlib, 'md5', md5_orig)
+        conn = mock.Mock()
+        sent = []
+
+        def fake_put_object(container, name, body, content_length=None):
+            self.assertEqual(8, content_length)
+            chunk = body.read(3)
+            while chunk:
+                sent.append(chunk)
+                chunk = body.read(3)
+            return hashlib.md5(b''.join(sent)).hexdigest()
+
+        conn.put_object.side_effect = fake_put_object
+        writer = swift_dr.SwiftBackupDriver.SwiftObjectWriter(
+            'container', 'object', conn)
+        with writer:
+            writer.write(b'abcde')
+            writer.write(bytearray(b'fgh'))
+
+        self.assertEqual([b'abc', b'def', b'gh'], sent)
+
+    def test_object_body_rewind(self):
+        body = swift_dr.SwiftBackupDriver.SwiftObjectBody([b'abc', b'def'])
+        self.assertEqual(b'abcd', body.read(4))
+        self.assertEqual(4, body.tell())
+        body.seek(0)
+        self.assertEqual(b'abcdef', body.read())
+        self.assertEqual(b'', body.read())
+        self.assertRaises(IOError, body.seek, 2)
+
+    def test_object_reader_streams_body(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = (None, iter([b'abcd', b'ef']))
+        reader = swift_dr.SwiftBackupDriver.SwiftObjectReader(
+            'container', 'object', conn)
+
+        with reader:
+            self.assertEqual(b'abc', reader.read(3))
+            self.assertEqual(b'def', reader.read(3))
+            self.assertEqual(b'', reader.read(3))
+
+        conn.get_object.assert_called_once_with('container', 'object',
+                                                resp_chunk_size=3)
+
+    def test_object_reader_stream_socket_error(self):
+        def _body():
+            yield b'abc'
+            raise socket.error(111, 'ECONNREFUSED')
+
+        conn = mock.Mock()
+        conn.get_object.return_value = (None, _body())
+        reader = swift_dr.SwiftBackupDriver.SwiftObjectReader(
+            'container', 'object', conn)
+
+        with reader:
+            self.assertEqual(b'abc', reader.read(3))
+            self.assertRaises(exception.SwiftConnectionFailed,
+                              reader.read, 3)
+
     def test_get_compressor(self):
         service = swift_dr.SwiftBackupDriver(self.ctxt)
         compressor = service._get_compressor('None')
@@ -393,6 +393,23 @@ class TestCinderManageCmd(test.TestCase):
         with mock.patch('sys.stdout', new=six.StringIO()):
             self.assertRaises(exception.InvalidInput, db_cmds.sync, 1)
 
+    @mock.patch('cinder.db.purge_deleted_rows')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_db_commands_purge(self, get_admin_context, purge_deleted_rows):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        get_admin_context.return_value = ctxt
+        db_cmds = cinder_manage.DbCommands()
+        db_cmds.purge(30, batch_size=100, pause=0.5)
+        purge_deleted_rows.assert_called_once_with(ctxt, 30, batch_size=100,
+                                                   pause=0.5)
+
+    def test_db_commands_purge_bad_batch_size(self):
+        db_cmds = cinder_manage.DbCommands()
+        with mock.patch('sys.stdout', new=six.StringIO()):
+            exit = self.assertRaises(SystemExit, db_cmds.purge, 30,
+                                     batch_size=0)
+        self.assertEqual(1, exit.code)
+
     @mock.patch('cinder.version.version_string')
     def test_versions_commands_list(self, version_string):
         version_cmds = cinder_manage.VersionCommands()
@@ -1387,8 +1404,53 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
 
+    @mock.patch('cinder.db.volume_usage_get_active_by_window')
+    @mock.patch('cinder.utils.last_completed_audit_period')
+    @mock.patch('cinder.rpc.init')
+    @mock.patch('oslo_log.log.getLogger')
+    @mock.patch('oslo_log.log.setup')
+    def test_main_partition_error(self, log_setup, get_logger, rpc_init,
+                                  last_completed_audit_period,
+                                  volume_get_active_by_window):
+        CONF.set_override('audit_partitions', 4)
+        CONF.set_override('audit_partition', 4)
+        last_completed_audit_period.return_value = (
+            datetime.datetime(2014, 1, 1, 1, 0),
+            datetime.datetime(2014, 2, 2, 2, 0))
+
+        exit = self.assertRaises(SystemExit, volume_usage_audit.main)
+
+        self.assertEqual(-1, exit.code)
+        self.assertFalse(volume_get_active_by_window.called)
+
+    def test_get_id_range(self):
+        self.assertEqual((None, None), volume_usage_audit._get_id_range(0, 1))
+        self.assertEqual([(None, '5555'), ('5555', 'aaaa'), ('aaaa', None)],
+                         [volume_usage_audit._get_id_range(partition, 3)
+                          for partition in range(3)])
+
+    def test_get_active_by_window(self):
+        CONF.set_override('audit_batch_size', 2)
+        pages = [[mock.Mock(id='1'), mock.Mock(id='2')],
+                 [mock.Mock(id='3'), mock.Mock(id='4')],
+                 [mock.Mock(id='5')]]
+        get_page = mock.Mock(side_effect=pages)
+
+        resources = volume_usage_audit._get_active_by_window(
+            get_page, mock.sentinel.context, mock.sentinel.begin,
+            mock.sentinel.end, None, '8')
+
+        self.assertEqual(['1', '2', '3', '4', '5'],
+                         [resource.id for resource in resources])
+        self.assertEqual(
+            [mock.call(mock.sentinel.context, mock.sentinel.begin,
+                       mock.sentinel.end, marker=marker, limit=2,
+                       end_marker='8')
+             for marker in (None, '2', '4')],
+            get_page.call_args_list)
+
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
-    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.db.volume_usage_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
     @mock.patch('cinder.rpc.init')
     @mock.patch('cinder.version.version_string')
@@ -1441,7 +1503,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000, end_marker=None)
         notify_about_volume_usage.assert_any_call(ctxt, volume1, 'exists',
                                                   extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
@@ -1450,7 +1513,7 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
             ctxt, volume1, 'create.end', extra_usage_info=local_extra_info)
 
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
-    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.db.volume_usage_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
     @mock.patch('cinder.rpc.init')
     @mock.patch('cinder.version.version_string')
@@ -1507,7 +1570,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000, end_marker=None)
         notify_about_volume_usage.assert_any_call(
             ctxt, volume1, 'exists', extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
@@ -1524,9 +1588,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
             extra_usage_info=local_extra_info_delete)
 
     @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
-    @mock.patch('cinder.objects.snapshot.SnapshotList.get_active_by_window')
+    @mock.patch('cinder.cmd.volume_usage_audit._get_snapshots_page')
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
-    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.db.volume_usage_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
     @mock.patch('cinder.rpc.init')
     @mock.patch('cinder.version.version_string')
@@ -1585,7 +1649,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000, end_marker=None)
         self.assertFalse(notify_about_volume_usage.called)
         notify_about_snapshot_usage.assert_any_call(ctxt, snapshot1, 'exists',
                                                     extra_info)
@@ -1597,9 +1662,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
             extra_usage_info=local_extra_info_delete)
 
     @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
-    @mock.patch('cinder.objects.snapshot.SnapshotList.get_active_by_window')
+    @mock.patch('cinder.cmd.volume_usage_audit._get_snapshots_page')
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
-    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.db.volume_usage_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
     @mock.patch('cinder.rpc.init')
     @mock.patch('cinder.version.version_string')
@@ -1662,7 +1727,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000, end_marker=None)
         notify_about_volume_usage.assert_any_call(
             ctxt, volume1, 'exists', extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
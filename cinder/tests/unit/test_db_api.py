@@ -21,6 +21,7 @@ import mock
 from oslo_config import cfg
 from oslo_utils import uuidutils
 import six
+import sqlalchemy
 
 from cinder.api import common
 from cinder import context
@@ -338,6 +339,74 @@ class DBAPIVolumeTestCase(BaseTest):
                              db.volume_data_get_for_host(
                                  self.ctxt, 'h%d@lvmdriver-1' % i))
 
+    def test_volume_count_get_for_hosts(self):
+        for host in ('h1@lvm#pool1', 'h1@lvm#pool1', 'h1@lvm#pool2',
+                     'h2@lvm', 'h3@lvm#pool1'):
+            db.volume_create(self.ctxt, {'host': host})
+        deleted = db.volume_create(self.ctxt, {'host': 'h2@lvm'})
+        db.volume_destroy(self.ctxt, deleted['id'])
+
+        self.assertEqual({'h1@lvm': 3, 'h1@lvm#pool1': 2, 'h1@lvm#pool2': 1,
+                          'h2@lvm': 1, 'h2@lvm#pool1': 0, 'h4@lvm': 0},
+                         db.volume_count_get_for_hosts(
+                             self.ctxt, ['h1@lvm', 'h1@lvm#pool1',
+                                         'h1@lvm#pool2', 'h2@lvm',
+                                         'h2@lvm#pool1', 'h4@lvm']))
+
+    def test_volume_count_get_for_hosts_no_hosts(self):
+        self.assertEqual({}, db.volume_count_get_for_hosts(self.ctxt, []))
+
+    def test_volume_size_get_by_pool(self):
+        for host, size, status in (('h1@lvm#pool1', 1, 'available'),
+                                   ('h1@lvm#pool1', 2, 'in-use'),
+                                   ('h1@lvm#pool1', 4, 'error'),
+                                   ('h1@lvm#pool2', 8, 'available'),
+                                   ('h1@lvm', 16, 'available'),
+                                   ('h2@lvm#pool1', 32, 'available')):
+            db.volume_create(self.ctxt, {'host': host, 'size': size,
+                                         'status': status})
+        deleted = db.volume_create(self.ctxt, {'host': 'h1@lvm#pool2',
+                                               'size': 64,
+                                               'status': 'available'})
+        db.volume_destroy(self.ctxt, deleted['id'])
+
+        self.assertEqual({'pool1': 3, 'pool2': 8},
+                         db.volume_size_get_by_pool(
+                             self.ctxt, 'h1@lvm', ['available', 'in-use']))
+
+    def test_volume_size_get_by_pool_wildcard_host(self):
+        for host, size in (('h_1@lvm#pool1', 1),
+                           ('hX1@lvm#pool1', 2),
+                           ('hX1@lvm#pool2', 4)):
+            db.volume_create(self.ctxt, {'host': host, 'size': size,
+                                         'status': 'available'})
+
+        self.assertEqual({'pool1': 1},
+                         db.volume_size_get_by_pool(
+                             self.ctxt, 'h_1@lvm', ['available']))
+
+    def test_volume_usage_get_active_by_window(self):
+        begin = datetime.datetime(2014, 1, 1)
+        end = datetime.datetime(2014, 2, 1)
+        created_at = datetime.datetime(2013, 12, 1)
+        for volume_id in ('4', '1', '3', '5', '2'):
+            db.volume_create(self.ctxt, {'id': volume_id, 'size': 1,
+                                         'created_at': created_at,
+                                         'metadata': {'key': volume_id}})
+        db.volume_create(self.ctxt, {'id': '0',
+                                     'created_at': datetime.datetime(2015,
+                                                                     1, 1)})
+
+        volumes = db.volume_usage_get_active_by_window(self.ctxt, begin, end,
+                                                       marker='1', limit=2)
+        self.assertEqual(['2', '3'], [volume.id for volume in volumes])
+        self.assertEqual('3', volumes[1].volume_metadata[0].value)
+        self.assertEqual(1, volumes[1].size)
+        volumes = db.volume_usage_get_active_by_window(self.ctxt, begin, end,
+                                                       marker='3',
+                                                       end_marker='5')
+        self.assertEqual(['4'], [volume.id for volume in volumes])
+
     def test_volume_data_get_for_project(self):
         for i in range(THREE):
             for j in range(THREE):
@@ -1127,6 +1196,19 @@ class DBAPISnapshotTestCase(BaseTest):
         actual = db.snapshot_data_get_for_project(self.ctxt, 'project1')
         self.assertEqual((1, 42), actual)
 
+    def test_snapshot_get_active_by_window_paginated(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        for snapshot_id in ('3', '1', '2', '4'):
+            db.snapshot_create(self.ctxt, {'id': snapshot_id, 'volume_id': 1})
+
+        begin = datetime.datetime(2014, 1, 1)
+        snapshots = db.snapshot_get_active_by_window(self.ctxt, begin,
+                                                     marker='1', limit=2)
+        self.assertEqual(['2', '3'], [snapshot.id for snapshot in snapshots])
+        snapshots = db.snapshot_get_active_by_window(self.ctxt, begin,
+                                                     end_marker='3')
+        self.assertEqual(['1', '2'], [snapshot.id for snapshot in snapshots])
+
     def test_snapshot_get_all_by_filter(self):
         db.volume_create(self.ctxt, {'id': 1})
         db.volume_create(self.ctxt, {'id': 2})
@@ -1785,6 +1867,55 @@ class DBAPIQuotaTestCase(BaseTest):
                           'volumes': {'reserved': 1, 'in_use': 0}},
                          quota_usage)
 
+    def test_quota_reserve_volume_types(self):
+        vtype1 = db.volume_type_create(self.ctxt, {'name': 'type1'})
+        vtype2 = db.volume_type_create(self.ctxt, {'name': 'type2'})
+        vol1 = db.volume_create(self.ctxt, {'project_id': 'project1',
+                                            'size': 1,
+                                            'volume_type_id': vtype1['id']})
+        db.volume_create(self.ctxt, {'project_id': 'project1', 'size': 2,
+                                     'volume_type_id': vtype2['id']})
+        db.volume_create(self.ctxt, {'project_id': 'project1', 'size': 4})
+        db.volume_create(self.ctxt, {'project_id': 'project2', 'size': 8})
+        db.snapshot_create(self.ctxt, {'project_id': 'project1',
+                                       'volume_id': vol1['id'],
+                                       'volume_size': 1})
+        resources = quota.VolumeTypeQuotaEngine().resources
+        quotas = {name: 100 for name in resources}
+        deltas = {'volumes': 1, 'gigabytes': 1, 'volumes_type1': 1,
+                  'gigabytes_type1': 1, 'snapshots_type2': 1}
+
+        statements = []
+
+        def _after_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = sqlalchemy_api.get_engine()
+        sqlalchemy.event.listen(engine, 'after_cursor_execute',
+                                _after_cursor_execute)
+        try:
+            reservations = db.quota_reserve(
+                self.ctxt, resources, quotas, deltas,
+                datetime.datetime.utcnow() + datetime.timedelta(days=1),
+                0, 0, 'project1')
+        finally:
+            sqlalchemy.event.remove(engine, 'after_cursor_execute',
+                                    _after_cursor_execute)
+        self.assertEqual(5, len(reservations))
+        # One usage query per table for all the resources and volume types.
+        for count in ('count(volumes.id)', 'count(snapshots.id)'):
+            self.assertEqual(1, len([statement for statement in statements
+                                     if count in statement]))
+
+        quota_usage = db.quota_usage_get_all_by_project(self.ctxt, 'project1')
+        self.assertEqual({'project_id': 'project1',
+                          'volumes': {'reserved': 1, 'in_use': 3},
+                          'gigabytes': {'reserved': 1, 'in_use': 8},
+                          'volumes_type1': {'reserved': 1, 'in_use': 1},
+                          'gigabytes_type1': {'reserved': 1, 'in_use': 2},
+                          'snapshots_type2': {'reserved': 1, 'in_use': 0}},
+                         quota_usage)
+
     def test_quota_destroy(self):
         db.quota_create(self.ctxt, 'project1', 'resource1', 41)
         self.assertIsNone(db.quota_destroy(self.ctxt, 'project1',
@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+import mock
+
 from cinder import exception
 from cinder.scheduler.evaluator import evaluator
 from cinder import test
@@ -137,3 +141,45 @@ class EvaluatorTestCase(test.TestCase):
         self.assertRaises(exception.EvaluatorParseException,
                           evaluator.evaluate,
                           "7 / 0")
+
+    def test_parsed_once(self):
+        expression = "stats.free * 2 + 1"
+        evaluator._parsed.pop(expression, None)
+        with mock.patch.object(evaluator, '_parser',
+                               wraps=evaluator._def_parser()) as parser:
+            self.assertEqual(5, evaluator.evaluate(expression,
+                                                   stats={'free': 2}))
+            self.assertEqual(7, evaluator.evaluate(expression,
+                                                   stats={'free': 3}))
+            parser.parseString.assert_called_once_with(expression,
+                                                       parseAll=True)
+
+    def test_bad_expression_parsed_once(self):
+        evaluator._parsed.pop("1/*1", None)
+        with mock.patch.object(evaluator, '_parser',
+                               wraps=evaluator._def_parser()) as parser:
+            for i in range(2):
+                self.assertRaises(exception.EvaluatorParseException,
+                                  evaluator.evaluate,
+                                  "1/*1")
+            self.assertEqual(1, parser.parseString.call_count)
+
+    @mock.patch.object(evaluator, '_CACHE_SIZE', 2)
+    def test_cache_evicts_least_recently_used(self):
+        self.mock_object(evaluator, '_parsed',
+                         collections.OrderedDict())
+        evaluator.evaluate("1+1")
+        evaluator.evaluate("1+2")
+        evaluator.evaluate("1+1")
+        evaluator.evaluate("1+3")
+        self.assertEqual(["1+1", "1+3"], list(evaluator._parsed))
+
+    def test_variables_bound_per_evaluation(self):
+        expression = "extra.size > 10"
+        self.assertTrue(evaluator.evaluate(expression,
+                                           extra={'size': 11}))
+        self.assertFalse(evaluator.evaluate(expression,
+                                            extra={'size': 9}))
+        self.assertRaises(exception.EvaluatorParseException,
+                          evaluator.evaluate,
+                          expression)
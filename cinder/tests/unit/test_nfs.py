@@ -19,6 +19,7 @@ import errno
 import os
 
 import mock
+from oslo_concurrency import processutils as putils
 from oslo_utils import units
 
 from cinder import exception
@@ -469,6 +470,119 @@ class NfsDriverTestCase(test.TestCase):
 
             self._execute.assert_has_calls(calls)
 
+    @mock.patch('cinder.volume.drivers.nfs.time')
+    def test_get_capacity_info_with_allocated_space(self, mock_time):
+        drv = self._driver
+        drv.allocated_space_refresh_interval = 300
+        mock_time.time.return_value = 1000
+        stat_output = '1 %d %d' % (100 * units.Gi, 50 * units.Gi)
+        du_output = '%d /mnt' % (20 * units.Gi)
+        self._execute.side_effect = [(stat_output, None),
+                                     (du_output, None),
+                                     (stat_output, None),
+                                     (stat_output, None),
+                                     (stat_output, None)]
+        volume = {'id': '80ee16b6-75d2-4d54-9539-ffc1b4b0fb10', 'size': 5,
+                  'provider_location': self.TEST_NFS_EXPORT1}
+
+        with mock.patch.object(drv, '_get_mount_point_for_share',
+                               return_value=self.TEST_MNT_POINT):
+            self.assertEqual(20 * units.Gi,
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1)[2])
+
+            with mock.patch.object(remotefs.RemoteFSDriver,
+                                   '_do_create_volume'):
+                drv._do_create_volume(volume)
+            self.assertEqual(25 * units.Gi,
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1)[2])
+
+            with mock.patch.object(remotefs.RemoteFSDriver,
+                                   'delete_volume'):
+                drv.delete_volume(volume)
+            self.assertEqual(20 * units.Gi,
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1)[2])
+
+            # Shares not measured yet are left to _get_capacity_info
+            volume['provider_location'] = self.TEST_NFS_EXPORT2
+            with mock.patch.object(remotefs.RemoteFSDriver,
+                                   '_do_create_volume'):
+                drv._do_create_volume(volume)
+            self.assertEqual(20 * units.Gi,
+                             drv._get_capacity_info(self.TEST_NFS_EXPORT1)[2])
+
+        self.assertEqual(1, self._execute.call_args_list.count(
+            mock.call('du', '-sb', '--apparent-size', '--exclude',
+                      '*snapshot*', self.TEST_MNT_POINT, run_as_root=True)))
+        self.assertEqual({self.TEST_NFS_EXPORT1: [20 * units.Gi, 1000]},
+                         drv._allocated_space)
+
+    @mock.patch('cinder.volume.drivers.nfs.eventlet.spawn_n')
+    @mock.patch('cinder.volume.drivers.nfs.time')
+    def test_refresh_allocated_space(self, mock_time, mock_spawn_n):
+        drv = self._driver
+        drv.allocated_space_refresh_interval = 300
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1, self.TEST_NFS_EXPORT2]
+        drv._allocated_space = {
+            self.TEST_NFS_EXPORT1: [10.0, 1000],
+            self.TEST_NFS_EXPORT2: [10.0, 1500],
+            self.TEST_NFS_EXPORT_SPACES: [10.0, 1000]}
+        mock_time.time.return_value = 1700
+
+        drv._refresh_allocated_space()
+        # A share being measured is not measured twice at the same time.
+        drv._refresh_allocated_space()
+
+        mock_spawn_n.assert_called_once_with(
+            drv._refresh_share_allocated_space, self.TEST_NFS_EXPORT1)
+        self.assertEqual({self.TEST_NFS_EXPORT1}, drv._refreshing_shares)
+        self.assertEqual({self.TEST_NFS_EXPORT1: [10.0, 1000],
+                          self.TEST_NFS_EXPORT2: [10.0, 1500]},
+                         drv._allocated_space)
+
+        self._execute.return_value = ('20 /mnt', None)
+        with mock.patch.object(drv, '_get_mount_point_for_share',
+                               return_value=self.TEST_MNT_POINT):
+            drv._refresh_share_allocated_space(self.TEST_NFS_EXPORT1)
+
+        self._execute.assert_called_once_with(
+            'du', '-sb', '--apparent-size', '--exclude', '*snapshot*',
+            self.TEST_MNT_POINT, run_as_root=True)
+        self.assertEqual(set(), drv._refreshing_shares)
+        self.assertEqual({self.TEST_NFS_EXPORT1: [20.0, 1700],
+                          self.TEST_NFS_EXPORT2: [10.0, 1500]},
+                         drv._allocated_space)
+
+    def test_refresh_share_allocated_space_failure(self):
+        drv = self._driver
+        drv._refreshing_shares.add(self.TEST_NFS_EXPORT1)
+        self._execute.side_effect = putils.ProcessExecutionError
+        mock_log = self.mock_object(nfs, 'LOG')
+
+        with mock.patch.object(drv, '_get_mount_point_for_share',
+                               return_value=self.TEST_MNT_POINT):
+            drv._refresh_share_allocated_space(self.TEST_NFS_EXPORT1)
+
+        self.assertTrue(mock_log.exception.called)
+        self.assertEqual(set(), drv._refreshing_shares)
+        self.assertEqual({}, drv._allocated_space)
+
+    def test_update_volume_stats_refreshes_allocated_space_first(self):
+        drv = self._driver
+        calls = mock.Mock()
+        calls.attach_mock(self.mock_object(drv, '_refresh_allocated_space'),
+                          'refresh')
+        calls.attach_mock(self.mock_object(remotefs.RemoteFSDriver,
+                                           '_update_volume_stats'),
+                          'update')
+        self.mock_object(drv, '_get_provisioned_capacity',
+                         mock.Mock(return_value=25.0))
+        drv._stats = {'total_capacity_gb': 100.0, 'free_capacity_gb': 20.0}
+
+        drv._update_volume_stats()
+
+        self.assertEqual([mock.call.refresh(), mock.call.update()],
+                         calls.mock_calls)
+
     def test_load_shares_config(self):
         drv = self._driver
         drv.configuration.nfs_shares_config = self.TEST_SHARES_CONFIG_FILE
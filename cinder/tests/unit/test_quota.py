@@ -17,6 +17,7 @@
 
 
 import datetime
+import uuid
 
 import mock
 from oslo_config import cfg
@@ -36,6 +37,7 @@ from cinder import quota_utils
 from cinder import test
 import cinder.tests.unit.image.fake
 from cinder import volume
+from cinder.volume import volume_types
 
 
 CONF = cfg.CONF
@@ -885,6 +887,72 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    def _stub_volume_types(self, *names):
+        volume_types = {name: {'id': name, 'name': name, 'extra_specs': {}}
+                        for name in names}
+        mock_vtga = mock.Mock(return_value=volume_types)
+        self.stubs.Set(db, 'volume_type_get_all', mock_vtga)
+        return mock_vtga
+
+    def test_resources_cached(self):
+        self.flags(quota_volume_type_cache_ttl=60)
+        mock_vtga = self._stub_volume_types('type1')
+        engine = quota.VolumeTypeQuotaEngine()
+        self.assertIn('volumes_type1', engine.resources)
+        self.assertIn('gigabytes_type1', engine.resources)
+        self.assertEqual(1, mock_vtga.call_count)
+
+        engine.invalidate_resources()
+        self.assertIn('snapshots_type1', engine.resources)
+        self.assertEqual(2, mock_vtga.call_count)
+
+    @mock.patch('time.time')
+    def test_resources_cache_expires(self, mock_time):
+        self.flags(quota_volume_type_cache_ttl=60)
+        mock_time.return_value = 1000
+        mock_vtga = self._stub_volume_types('type1')
+        engine = quota.VolumeTypeQuotaEngine()
+        engine.resources
+        mock_time.return_value = 1059
+        engine.resources
+        self.assertEqual(1, mock_vtga.call_count)
+        mock_time.return_value = 1060
+        engine.resources
+        self.assertEqual(2, mock_vtga.call_count)
+
+    def test_resources_not_cached(self):
+        mock_vtga = self._stub_volume_types('type1')
+        engine = quota.VolumeTypeQuotaEngine()
+        engine.resources
+        engine.resources
+        self.assertEqual(2, mock_vtga.call_count)
+
+    def test_reserve_unknown_resource_refreshes_cache(self):
+        self.flags(quota_volume_type_cache_ttl=60)
+        self._stub_volume_types('type1')
+        driver = mock.Mock()
+        engine = quota.VolumeTypeQuotaEngine(quota_driver_class=driver)
+        engine.reserve(mock.sentinel.context, volumes_type1=1)
+        self._stub_volume_types('type1', 'type2')
+        engine.reserve(mock.sentinel.context, volumes_type2=1)
+        resources = driver.reserve.call_args[0][1]
+        self.assertIn('volumes_type2', resources)
+
+    def test_volume_types_changes_invalidate_cache(self):
+        self.flags(quota_volume_type_cache_ttl=60)
+        self.mock_object(quota.QUOTAS, '_cached_resources', {})
+        ctx = context.get_admin_context()
+        vtype = volume_types.create(ctx, 'type1')
+        self.assertIsNone(quota.QUOTAS._cached_resources)
+
+        quota.QUOTAS._cached_resources = {}
+        volume_types.update(ctx, vtype['id'], 'type2', None)
+        self.assertIsNone(quota.QUOTAS._cached_resources)
+
+        quota.QUOTAS._cached_resources = {}
+        volume_types.destroy(ctx, vtype['id'])
+        self.assertIsNone(quota.QUOTAS._cached_resources)
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
@@ -1492,20 +1560,25 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
 
             return quota_usage_ref
 
-        def fake_reservation_create(context, uuid, usage_id, project_id,
-                                    resource, delta, expire, session=None):
-            reservation_ref = self._make_reservation(
-                uuid, usage_id, project_id, resource, delta, expire,
-                timeutils.utcnow(), timeutils.utcnow())
+        def fake_reservations_create(context, usages, project_id, deltas,
+                                     expire, session):
+            uuids = []
+            for resource, delta in deltas.items():
+                reservation_ref = self._make_reservation(
+                    str(uuid.uuid4()), usages[resource], project_id,
+                    resource, delta, expire, timeutils.utcnow(),
+                    timeutils.utcnow())
 
-            self.reservations_created[resource] = reservation_ref
+                self.reservations_created[resource] = reservation_ref
+                uuids.append(reservation_ref.uuid)
 
-            return reservation_ref
+            return uuids
 
         self.stubs.Set(sqa_api, 'get_session', fake_get_session)
         self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
         self.stubs.Set(sqa_api, '_quota_usage_create', fake_quota_usage_create)
-        self.stubs.Set(sqa_api, '_reservation_create', fake_reservation_create)
+        self.stubs.Set(sqa_api, '_reservations_create',
+                       fake_reservations_create)
 
         patcher = mock.patch.object(timeutils, 'utcnow')
         self.addCleanup(patcher.stop)
@@ -64,6 +64,114 @@ class ExecuteTestCase(test.TestCase):
                                                 root_helper=mock_helper)
 
 
+    @mock.patch('cinder.utils.RootwrapDaemonHelper.get')
+    @mock.patch('cinder.utils.processutils.execute')
+    def test_execute_root_daemon(self, mock_putils_exe, mock_get_daemon):
+        self.flags(use_rootwrap_daemon=True)
+        output = utils.execute('a', 1, attempts=2, run_as_root=True)
+        mock_daemon = mock_get_daemon.return_value
+        self.assertEqual(mock_daemon.execute.return_value, output)
+        mock_daemon.execute.assert_called_once_with('a', 1, attempts=2)
+        self.assertFalse(mock_putils_exe.called)
+
+    @mock.patch('cinder.utils.RootwrapDaemonHelper.get')
+    @mock.patch('cinder.utils.processutils.execute')
+    def test_execute_daemon_unsupported_args(self, mock_putils_exe,
+                                             mock_get_daemon):
+        self.flags(use_rootwrap_daemon=True)
+        with mock.patch('cinder.utils.get_root_helper') as mock_helper:
+            utils.execute('a', 1, cwd='/tmp', run_as_root=True)
+        self.assertFalse(mock_get_daemon.called)
+        mock_putils_exe.assert_called_once_with(
+            'a', 1, cwd='/tmp', run_as_root=True,
+            root_helper=mock_helper.return_value)
+
+    @mock.patch('cinder.utils.RootwrapDaemonHelper.get')
+    @mock.patch('cinder.utils.processutils.execute')
+    def test_execute_daemon_not_root(self, mock_putils_exe,
+                                     mock_get_daemon):
+        self.flags(use_rootwrap_daemon=True)
+        utils.execute('a', 1, foo='bar')
+        mock_helper = mock.Mock()
+        utils.execute('a', 1, foo='bar', run_as_root=True,
+                      root_helper=mock_helper)
+        self.assertFalse(mock_get_daemon.called)
+        self.assertEqual(2, mock_putils_exe.call_count)
+
+
+@mock.patch('cinder.utils.rootwrap_client.Client')
+class RootwrapDaemonHelperTestCase(test.TestCase):
+    def setUp(self):
+        super(RootwrapDaemonHelperTestCase, self).setUp()
+        self.mock_object(utils.tpool, 'execute',
+                         lambda func, *args: func(*args))
+
+    def test_get(self, mock_client):
+        self.mock_object(utils.RootwrapDaemonHelper, '_instance', None)
+        self.flags(rootwrap_config='/etc/cinder/rootwrap.conf')
+        helper = utils.RootwrapDaemonHelper.get()
+        self.assertIs(helper, utils.RootwrapDaemonHelper.get())
+        mock_client.assert_called_once_with(
+            ['sudo', 'cinder-rootwrap-daemon', '/etc/cinder/rootwrap.conf'])
+
+    def test_execute(self, mock_client):
+        mock_client.return_value.execute.return_value = (0, 'out', 'err')
+        helper = utils.RootwrapDaemonHelper('rootwrap.conf')
+        self.assertEqual(('out', 'err'),
+                         helper.execute('/sbin/lvs', 1, process_input='in'))
+        mock_client.return_value.execute.assert_called_once_with(
+            ['/sbin/lvs', '1'], 'in')
+        self.assertRaises(putils.UnknownArgumentError, helper.execute,
+                          'lvs', foo='bar')
+
+    def test_execute_stats(self, mock_client):
+        mock_client.return_value.execute.return_value = (0, 'out', 'err')
+        mock_time = self.mock_object(utils, 'time')
+        mock_time.time.side_effect = [10.0, 10.5, 20.0, 22.0, 30.0, 30.25]
+        helper = utils.RootwrapDaemonHelper('rootwrap.conf')
+        self.assertEqual({}, helper.get_stats())
+
+        helper.execute('/sbin/lvs')
+        helper.execute('/sbin/lvs')
+        helper.execute('vgs')
+
+        self.assertEqual(
+            {'lvs': {'count': 2, 'total': 2.5, 'max': 2.0, 'average': 1.25},
+             'vgs': {'count': 1, 'total': 0.25, 'max': 0.25,
+                     'average': 0.25}},
+            helper.get_stats())
+
+        mock_log = self.mock_object(utils, 'LOG')
+        self.mock_object(utils.RootwrapDaemonHelper, '_instance', helper)
+        utils.RootwrapDaemonHelper.log_stats()
+        self.assertEqual(2, mock_log.info.call_count)
+
+    def test_log_stats_without_daemon(self, mock_client):
+        mock_log = self.mock_object(utils, 'LOG')
+        self.mock_object(utils.RootwrapDaemonHelper, '_instance', None)
+        utils.RootwrapDaemonHelper.log_stats()
+        self.assertFalse(mock_log.info.called)
+
+    def test_execute_error(self, mock_client):
+        mock_client.return_value.execute.return_value = (1, 'out', 'err')
+        helper = utils.RootwrapDaemonHelper('rootwrap.conf')
+        self.assertRaises(putils.ProcessExecutionError, helper.execute,
+                          'lvs')
+        self.assertEqual(('out', 'err'),
+                         helper.execute('lvs', check_exit_code=False))
+        self.assertEqual(('out', 'err'),
+                         helper.execute('lvs', check_exit_code=[0, 1]))
+
+    @mock.patch('time.sleep')
+    def test_execute_attempts(self, mock_sleep, mock_client):
+        mock_client.return_value.execute.side_effect = [
+            (1, 'out', 'err'), (0, 'out', 'err')]
+        helper = utils.RootwrapDaemonHelper('rootwrap.conf')
+        self.assertEqual(('out', 'err'), helper.execute('lvs', attempts=2))
+        self.assertEqual(2, mock_client.return_value.execute.call_count)
+        self.assertTrue(mock_sleep.called)
+
+
 class GenericUtilsTestCase(test.TestCase):
 
     @mock.patch('os.path.exists', return_value=True)
@@ -294,6 +294,53 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.assertRaises(exception.VolumeNotFound, db.volume_get,
                           context.get_admin_context(), volume_id)
 
+    def test_init_host_ensure_exports(self):
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        tests_utils.create_volume(self.context, status='available',
+                                  size=0, host=CONF.host)
+
+        with mock.patch.object(self.volume.driver,
+                               'ensure_exports') as mock_ensure_exports:
+            mock_ensure_exports.side_effect = lambda ctxt, vols: [
+                vol for vol in vols if vol.id == vol1.id]
+            self.volume.init_host()
+
+        exported = mock_ensure_exports.call_args[0][1]
+        self.assertEqual(set([vol0.id, vol1.id]),
+                         set(vol.id for vol in exported))
+        vol0 = db.volume_get(context.get_admin_context(), vol0.id)
+        self.assertEqual('in-use', vol0.status)
+        vol1 = db.volume_get(context.get_admin_context(), vol1.id)
+        self.assertEqual('error', vol1.status)
+
+    def test_init_host_recovers_concurrently(self):
+        self.flags(init_host_max_workers=4)
+        volumes = [tests_utils.create_volume(self.context, status=status,
+                                             size=0, host=CONF.host)
+                   for status in ('downloading', 'downloading', 'creating')]
+
+        with mock.patch.object(volutils, 'run_concurrently',
+                               wraps=volutils.run_concurrently) as mock_run, \
+                mock.patch.object(db, 'conditional_update',
+                                  wraps=db.conditional_update) as mock_update:
+            self.volume.init_host()
+
+        clear_calls = [call for call in mock_run.call_args_list
+                       if call[0][3] == 'Clearing volume downloads']
+        self.assertEqual(1, len(clear_calls))
+        self.assertEqual(set(vol.id for vol in volumes[:2]),
+                         set(vol.id for vol in clear_calls[0][0][1]))
+        self.assertEqual(4, clear_calls[0][0][2])
+        volume_updates = [call for call in mock_update.call_args_list
+                          if call[0][1] is objects.Volume.model]
+        self.assertEqual(1, len(volume_updates))
+        for vol in volumes:
+            vol = db.volume_get(context.get_admin_context(), vol.id)
+            self.assertEqual('error', vol.status)
+
     def test_init_host_count_allocated_capacity(self):
         vol0 = tests_utils.create_volume(
             self.context, size=100, host=CONF.host)
@@ -902,6 +949,61 @@ class VolumeTestCase(BaseVolumeTestCase):
                                    volume_type=db_vol_type)
         self.assertEqual(db_vol_type.get('id'), volume['volume_type_id'])
 
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.create_volume')
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.create_volumes')
+    def test_create_volumes(self, mock_create_volumes, mock_create_volume):
+        volume_api = cinder.volume.api.API()
+
+        volumes = volume_api.create_volumes(
+            self.context, 3, 1, 'name', 'description',
+            scheduler_hints={'same_host': 'fake_id'})
+
+        self.assertEqual(3, len(volumes))
+        self.assertFalse(mock_create_volume.called)
+        mock_create_volumes.assert_called_once_with(
+            self.context, CONF.volume_topic,
+            [volume.id for volume in volumes],
+            request_spec=mock.ANY,
+            filter_properties={'scheduler_hints': {'same_host': 'fake_id'}})
+        request_spec = mock_create_volumes.call_args[1]['request_spec']
+        self.assertIsNone(request_spec['volume_id'])
+        self.assertEqual(1, request_spec['volume_properties']['size'])
+        for volume in volumes:
+            self.assertEqual('creating', volume.status)
+            self.assertEqual('name', volume.display_name)
+
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.create_volumes')
+    def test_create_volumes_failure(self, mock_create_volumes):
+        volume_api = cinder.volume.api.API()
+        real_create = volume_api._create
+        volumes = []
+
+        def fake_create(*args, **kwargs):
+            if len(volumes) == 2:
+                raise exception.VolumeLimitExceeded(allowed=2,
+                                                     name='volumes')
+            flow_storage = real_create(*args, **kwargs)
+            volumes.append(flow_storage.fetch('volume'))
+            return flow_storage
+
+        self.mock_object(volume_api, '_create', fake_create)
+
+        self.assertRaises(exception.VolumeLimitExceeded,
+                          volume_api.create_volumes,
+                          self.context, 3, 1, 'name', 'description')
+        self.assertFalse(mock_create_volumes.called)
+        self.assertEqual(2, len(volumes))
+        for volume in volumes:
+            self.assertEqual('error',
+                             db.volume_get(self.context, volume.id).status)
+
+    def test_create_volumes_invalid_count(self):
+        volume_api = cinder.volume.api.API()
+        for count in (0, -1, 'fake'):
+            self.assertRaises(exception.InvalidInput,
+                              volume_api.create_volumes,
+                              self.context, count, 1, 'name', 'description')
+
     @mock.patch.object(keymgr, 'API', fake_keymgr.fake_api)
     def test_create_volume_with_encrypted_volume_type(self):
         ctxt = context.get_admin_context()
@@ -6532,7 +6634,7 @@ class GenericVolumeDriverTestCase(DriverTestCase):
         mock_copy.assert_called_with(
             'foo', 'bar', 1024, '1M',
             throttle=self.volume.driver._throttle,
-            sparse=False)
+            sparse=False, chunk_size=4 * units.Mi)
         self.assertEqual(detach_expected, mock_detach.mock_calls)
 
         #  Test case for sparse_copy_volume = True
@@ -6548,7 +6650,7 @@ class GenericVolumeDriverTestCase(DriverTestCase):
         mock_copy.assert_called_with(
             'foo', 'bar', 1024, '1M',
             throttle=self.volume.driver._throttle,
-            sparse=True)
+            sparse=True, chunk_size=4 * units.Mi)
         self.assertEqual(detach_expected, mock_detach.mock_calls)
 
         # cleanup resource
@@ -0,0 +1,131 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in-process volume copy engine."""
+
+import errno
+import os
+import tempfile
+
+import mock
+
+from cinder import test
+from cinder.volume import native_copy
+
+
+class NativeCopyTestCase(test.TestCase):
+
+    def setUp(self):
+        super(NativeCopyTestCase, self).setUp()
+        if not native_copy.is_supported(__file__, __file__):
+            self.skipTest('Native copy is not supported on this platform.')
+
+        self.mock_execute = self.mock_object(native_copy.utils, 'execute')
+        self.mock_object(native_copy.tpool, 'execute',
+                         lambda func, *args: func(*args))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(self._cleanup_tmpdir)
+
+    def _cleanup_tmpdir(self):
+        for name in os.listdir(self.tmpdir):
+            os.unlink(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def _make_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _read_file(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_is_supported(self):
+        path = self._make_file('dest', b'')
+        self.assertTrue(native_copy.is_supported(path, path))
+        self.assertTrue(native_copy.is_supported('/dev/zero', path))
+        self.assertFalse(native_copy.is_supported(path, '/dev/null'))
+        self.assertFalse(native_copy.is_supported(path, path + '.missing'))
+
+    def test_copy_volume_offload(self):
+        data = os.urandom(3 * 4096 + 100)
+        src = self._make_file('src', data)
+        dest = self._make_file('dest', b'')
+        native_copy.copy_volume(src, dest, len(data), 4096, sync=True)
+        self.assertEqual(data, self._read_file(dest))
+        # The current user owns both files, nothing is chowned.
+        self.assertFalse(self.mock_execute.called)
+
+    @mock.patch('os.access', return_value=False)
+    @mock.patch('os.getuid', return_value=1000)
+    @mock.patch('os.stat')
+    def test_accessible_chowns_once(self, mock_stat, mock_getuid,
+                                    mock_access):
+        mock_stat.return_value = mock.Mock(st_uid=0)
+
+        with native_copy._accessible([('/dev/dest', os.W_OK),
+                                      ('/dev/src', os.R_OK)]):
+            self.mock_execute.assert_called_once_with(
+                'chown', 1000, '/dev/dest', '/dev/src', run_as_root=True)
+
+        self.assertEqual(2, self.mock_execute.call_count)
+        self.mock_execute.assert_called_with(
+            'chown', 0, '/dev/dest', '/dev/src', run_as_root=True)
+
+    @mock.patch('cinder.volume.native_copy._offload_copy',
+                return_value=False)
+    def test_copy_volume_blocks(self, mock_offload):
+        data = os.urandom(10 * 4096 + 100)
+        src = self._make_file('src', data)
+        dest = self._make_file('dest', b'')
+        native_copy.copy_volume(src, dest, len(data), 4096, io_depth=3)
+        self.assertEqual(data, self._read_file(dest))
+        self.assertTrue(mock_offload.called)
+
+    def test_copy_volume_offload_not_supported(self):
+        data = os.urandom(2 * 4096)
+        src = self._make_file('src', data)
+        dest = self._make_file('dest', b'')
+        unsupported = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with mock.patch.object(os, 'copy_file_range', create=True,
+                               side_effect=unsupported), \
+                mock.patch.object(os, 'sendfile', create=True,
+                                  side_effect=unsupported):
+            native_copy.copy_volume(src, dest, len(data), 4096)
+        self.assertEqual(data, self._read_file(dest))
+
+    def test_copy_volume_sparse_skips_zero_blocks(self):
+        block = os.urandom(4096)
+        data = block + b'\0' * 4096 + block
+        src = self._make_file('src', data)
+        dest = self._make_file('dest', b'\xff' * len(data))
+        native_copy.copy_volume(src, dest, len(data), 4096, sparse=True)
+        self.assertEqual(block + b'\xff' * 4096 + block,
+                         self._read_file(dest))
+
+    def test_copy_volume_from_zero_device(self):
+        dest = self._make_file('dest', b'\xff' * 3 * 4096)
+        native_copy.copy_volume('/dev/zero', dest, 2 * 4096, 4096)
+        self.assertEqual(b'\0' * 2 * 4096 + b'\xff' * 4096,
+                         self._read_file(dest))
+
+    @mock.patch('cinder.volume.native_copy._offload_copy',
+                return_value=False)
+    @mock.patch('cinder.volume.native_copy._pwrite_all',
+                side_effect=OSError(errno.EIO, 'I/O error'))
+    def test_copy_volume_write_error(self, mock_write, mock_offload):
+        data = os.urandom(4 * 4096)
+        src = self._make_file('src', data)
+        dest = self._make_file('dest', b'')
+        self.assertRaises(OSError, native_copy.copy_volume, src, dest,
+                          len(data), 4096)
@@ -17,12 +17,15 @@
 
 
 import datetime
+import eventlet
 import io
 import mock
+import os
 import six
 
 from oslo_concurrency import processutils
 from oslo_config import cfg
+from oslo_utils import units
 
 from cinder import context
 from cinder import exception
@@ -434,7 +437,8 @@ class OdirectSupportTestCase(test.TestCase):
     def test_check_for_odirect_support(self, mock_exec):
         output = volume_utils.check_for_odirect_support('/dev/abc', '/dev/def')
         self.assertTrue(output)
-        mock_exec.assert_called_once_with('dd', 'count=0', 'if=/dev/abc',
+        mock_exec.assert_called_once_with('env', 'LC_ALL=C', 'dd',
+                                          'count=0', 'if=/dev/abc',
                                           'of=/dev/def', 'oflag=direct',
                                           run_as_root=True)
         mock_exec.reset_mock()
@@ -442,7 +446,8 @@ class OdirectSupportTestCase(test.TestCase):
         output = volume_utils.check_for_odirect_support('/dev/abc', '/dev/def',
                                                         'iflag=direct')
         self.assertTrue(output)
-        mock_exec.assert_called_once_with('dd', 'count=0', 'if=/dev/abc',
+        mock_exec.assert_called_once_with('env', 'LC_ALL=C', 'dd',
+                                          'count=0', 'if=/dev/abc',
                                           'of=/dev/def', 'iflag=direct',
                                           run_as_root=True)
 
@@ -451,10 +456,94 @@ class OdirectSupportTestCase(test.TestCase):
     def test_check_for_odirect_support_error(self, mock_exec):
         output = volume_utils.check_for_odirect_support('/dev/abc', '/dev/def')
         self.assertFalse(output)
-        mock_exec.assert_called_once_with('dd', 'count=0', 'if=/dev/abc',
+        mock_exec.assert_called_once_with('env', 'LC_ALL=C', 'dd',
+                                          'count=0', 'if=/dev/abc',
                                           'of=/dev/def', 'oflag=direct',
                                           run_as_root=True)
 
+    @mock.patch('cinder.utils.execute')
+    def test_probe_odirect_support_einval(self, mock_exec):
+        mock_exec.side_effect = processutils.ProcessExecutionError(
+            stderr="dd: failed to open '/dev/def': Invalid argument")
+        self.assertEqual((False, True),
+                         volume_utils._probe_odirect_support(
+                             '/dev/abc', '/dev/def', 'oflag=direct'))
+
+    @mock.patch('cinder.utils.execute')
+    def test_probe_odirect_support_other_error(self, mock_exec):
+        mock_exec.side_effect = processutils.ProcessExecutionError(
+            stderr="dd: failed to open '/dev/def': No such file or directory")
+        self.assertEqual((False, False),
+                         volume_utils._probe_odirect_support(
+                             '/dev/abc', '/dev/def', 'oflag=direct'))
+
+
+
+class OdirectSupportCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(OdirectSupportCacheTestCase, self).setUp()
+        volume_utils._ODIRECT_SUPPORT_CACHE.clear()
+        self.addCleanup(volume_utils._ODIRECT_SUPPORT_CACHE.clear)
+
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(True, True))
+    def test_cached_per_device(self, mock_support):
+        for i in range(3):
+            self.assertTrue(volume_utils._check_for_odirect_support_cached(
+                '/dev/zero', '/dev/null', 'iflag=direct'))
+            self.assertTrue(volume_utils._check_for_odirect_support_cached(
+                '/dev/zero', '/dev/null', 'oflag=direct'))
+        self.assertEqual([mock.call('/dev/zero', '/dev/null', 'iflag=direct'),
+                          mock.call('/dev/zero', '/dev/null', 'oflag=direct')],
+                         mock_support.call_args_list)
+
+    @mock.patch('time.time')
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                side_effect=[(False, True), (True, True)])
+    def test_cache_expires(self, mock_support, mock_time):
+        self.flags(volume_odirect_check_cache_ttl=60)
+        mock_time.return_value = 1000
+        self.assertFalse(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        mock_time.return_value = 1059
+        self.assertFalse(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        mock_time.return_value = 1060
+        self.assertTrue(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        self.assertEqual(2, mock_support.call_count)
+
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(True, True))
+    def test_cache_disabled(self, mock_support):
+        self.flags(volume_odirect_check_cache_ttl=0)
+        volume_utils._check_for_odirect_support_cached('/dev/zero',
+                                                       '/dev/null')
+        volume_utils._check_for_odirect_support_cached('/dev/zero',
+                                                       '/dev/null')
+        self.assertEqual(2, mock_support.call_count)
+
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(True, True))
+    def test_not_cached_when_stat_fails(self, mock_support):
+        volume_utils._check_for_odirect_support_cached('/dev/zero',
+                                                       '/nonexistent')
+        volume_utils._check_for_odirect_support_cached('/dev/zero',
+                                                       '/nonexistent')
+        self.assertEqual(2, mock_support.call_count)
+
+
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                side_effect=[(False, False), (True, True), (False, True)])
+    def test_inconclusive_failure_not_cached(self, mock_support):
+        self.flags(volume_odirect_check_cache_ttl=60)
+        self.assertFalse(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        self.assertTrue(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        self.assertTrue(volume_utils._check_for_odirect_support_cached(
+            '/dev/zero', '/dev/null'))
+        self.assertEqual(2, mock_support.call_count)
 
 class ClearVolumeTestCase(test.TestCase):
     @mock.patch('cinder.volume.utils.copy_volume', return_value=None)
@@ -519,13 +608,17 @@ class ClearVolumeTestCase(test.TestCase):
 
 
 class CopyVolumeTestCase(test.TestCase):
+    def setUp(self):
+        super(CopyVolumeTestCase, self).setUp()
+        volume_utils._ODIRECT_SUPPORT_CACHE.clear()
+        self.addCleanup(volume_utils._ODIRECT_SUPPORT_CACHE.clear)
+
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=True)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(True, True))
     @mock.patch('cinder.utils.execute')
-    @mock.patch('cinder.volume.utils.CONF')
-    def test_copy_volume_dd_iflag_and_oflag(self, mock_conf, mock_exec,
+    def test_copy_volume_dd_iflag_and_oflag(self, mock_exec,
                                             mock_support, mock_count):
         fake_throttle = throttling.Throttle(['fake_throttle'])
         output = volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, 1,
@@ -552,8 +645,8 @@ class CopyVolumeTestCase(test.TestCase):
 
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=False)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(False, True))
     @mock.patch('cinder.utils.execute')
     def test_copy_volume_dd_no_iflag_or_oflag(self, mock_exec,
                                               mock_support, mock_count):
@@ -581,8 +674,8 @@ class CopyVolumeTestCase(test.TestCase):
 
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=False)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(False, True))
     @mock.patch('cinder.utils.execute')
     def test_copy_volume_dd_no_throttle(self, mock_exec, mock_support,
                                         mock_count):
@@ -596,8 +689,8 @@ class CopyVolumeTestCase(test.TestCase):
 
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=False)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(False, True))
     @mock.patch('cinder.utils.execute')
     def test_copy_volume_dd_with_ionice(self, mock_exec,
                                         mock_support, mock_count):
@@ -612,8 +705,8 @@ class CopyVolumeTestCase(test.TestCase):
 
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=False)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(False, True))
     @mock.patch('cinder.utils.execute')
     def test_copy_volume_dd_with_sparse(self, mock_exec,
                                         mock_support, mock_count):
@@ -628,8 +721,8 @@ class CopyVolumeTestCase(test.TestCase):
 
     @mock.patch('cinder.volume.utils._calculate_count',
                 return_value=(1234, 5678))
-    @mock.patch('cinder.volume.utils.check_for_odirect_support',
-                return_value=True)
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(True, True))
     @mock.patch('cinder.utils.execute')
     def test_copy_volume_dd_with_sparse_iflag_and_oflag(self, mock_exec,
                                                         mock_support,
@@ -643,13 +736,50 @@ class CopyVolumeTestCase(test.TestCase):
                                           'iflag=direct', 'oflag=direct',
                                           'conv=sparse', run_as_root=True)
 
+    @mock.patch('cinder.volume.native_copy.is_supported', return_value=True)
+    @mock.patch('cinder.volume.native_copy.copy_volume')
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_native(self, mock_exec, mock_copy, mock_supported):
+        self.flags(volume_copy_engine='native', volume_copy_io_depth=8)
+        output = volume_utils.copy_volume('/dev/zero', '/dev/null', 2, '1M',
+                                          sync=True, execute=utils.execute,
+                                          sparse=True)
+        self.assertIsNone(output)
+        self.assertFalse(mock_exec.called)
+        mock_supported.assert_called_once_with('/dev/zero', '/dev/null')
+        mock_copy.assert_called_once_with('/dev/zero', '/dev/null',
+                                          2 * 1024 * 1024, 1024 * 1024,
+                                          sync=True, sparse=True, io_depth=8)
+
+    @mock.patch('cinder.volume.utils._probe_odirect_support',
+                return_value=(False, True))
+    @mock.patch('cinder.volume.native_copy.is_supported', return_value=True)
+    @mock.patch('cinder.volume.native_copy.copy_volume')
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_native_falls_back_to_dd(self, mock_exec, mock_copy,
+                                                 mock_supported,
+                                                 mock_odirect):
+        self.flags(volume_copy_engine='native')
+        fake_throttle = throttling.Throttle(['fake_throttle'])
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1, '1M',
+                                 execute=utils.execute,
+                                 throttle=fake_throttle)
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1, '1M',
+                                 execute=utils.execute, ionice='-c3')
+        mock_supported.return_value = False
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1, '1M',
+                                 execute=utils.execute)
+        self.assertFalse(mock_copy.called)
+        self.assertEqual(3, mock_exec.call_count)
+
     @mock.patch('cinder.volume.utils._copy_volume_with_file')
     def test_copy_volume_handles(self, mock_copy):
         handle1 = io.RawIOBase()
         handle2 = io.RawIOBase()
         output = volume_utils.copy_volume(handle1, handle2, 1024, 1)
         self.assertIsNone(output)
-        mock_copy.assert_called_once_with(handle1, handle2, 1024)
+        mock_copy.assert_called_once_with(handle1, handle2, 1024,
+                                          chunk_size=None)
 
     @mock.patch('cinder.volume.utils._transfer_data')
     @mock.patch('cinder.volume.utils._open_volume_with_path')
@@ -660,6 +790,77 @@ class CopyVolumeTestCase(test.TestCase):
         mock_transfer.assert_called_once_with(mock.ANY, mock.ANY,
                                               1073741824, mock.ANY)
 
+    @mock.patch('cinder.volume.utils._transfer_data')
+    @mock.patch('cinder.volume.utils._open_volume_with_path')
+    def test_copy_volume_handle_chunk_size(self, mock_open, mock_transfer):
+        self.flags(volume_copy_chunk_size=1024)
+        handle = io.RawIOBase()
+        volume_utils.copy_volume('/foo/bar', handle, 1, 1)
+        mock_transfer.assert_called_once_with(mock.ANY, handle, units.Mi,
+                                              1024)
+
+        mock_transfer.reset_mock()
+        volume_utils.copy_volume('/foo/bar', handle, 1, 1, chunk_size=512)
+        mock_transfer.assert_called_once_with(mock.ANY, handle, units.Mi,
+                                              512)
+
+
+class TransferDataTestCase(test.TestCase):
+
+    class FakeIOWrapper(io.RawIOBase):
+        """Driver style wrapper which only reads and writes bytes."""
+
+        def __init__(self, data=b''):
+            self.data = data
+            self.writes = []
+
+        def read(self, length=None):
+            data, self.data = self.data[:length], self.data[length:]
+            return data
+
+        def write(self, data):
+            if not isinstance(data, bytes):
+                raise TypeError('data must be a byte string')
+            self.writes.append(data)
+            return len(data)
+
+    def setUp(self):
+        super(TransferDataTestCase, self).setUp()
+        self.mock_object(volume_utils.tpool, 'execute',
+                         lambda func, *args: func(*args))
+        self.data = os.urandom(10 * 1024 + 100)
+
+    def test_transfer_data_files(self):
+        src = io.BytesIO(self.data)
+        dest = io.BytesIO()
+        volume_utils._transfer_data(src, dest, len(self.data), 1024)
+        self.assertEqual(self.data, dest.getvalue())
+
+    def test_transfer_data_stops_at_end_of_source(self):
+        src = io.BytesIO(self.data)
+        dest = io.BytesIO()
+        volume_utils._transfer_data(src, dest, 2 * len(self.data), 1024)
+        self.assertEqual(self.data, dest.getvalue())
+
+    def test_transfer_data_to_wrapper(self):
+        src = io.BytesIO(self.data)
+        dest = self.FakeIOWrapper()
+        volume_utils._transfer_data(src, dest, len(self.data), 1024)
+        self.assertEqual(self.data, b''.join(dest.writes))
+        self.assertEqual(11, len(dest.writes))
+
+    def test_transfer_data_from_wrapper(self):
+        src = self.FakeIOWrapper(self.data)
+        dest = io.BytesIO()
+        volume_utils._transfer_data(src, dest, len(self.data), 1024)
+        self.assertEqual(self.data, dest.getvalue())
+
+    def test_transfer_data_write_error(self):
+        src = io.BytesIO(self.data)
+        dest = mock.Mock(write=mock.Mock(side_effect=IOError))
+        self.assertRaises(IOError, volume_utils._transfer_data, src, dest,
+                          len(self.data), 1024)
+
 
 class VolumeUtilsTestCase(test.TestCase):
     def test_null_safe_str(self):
@@ -879,3 +1080,23 @@ class VolumeUtilsTestCase(test.TestCase):
         self.assertRaises(exception.SnapshotLimitExceeded,
                           volume_utils.process_reserve_over_quota,
                           ctxt, over_two, usages, quotas, size)
+
+    @mock.patch('cinder.volume.utils.LOG')
+    def test_run_concurrently(self, mock_log):
+        running = []
+        peak = []
+
+        def _double(item):
+            running.append(item)
+            peak.append(len(running))
+            eventlet.sleep(0)
+            running.remove(item)
+            return item * 2
+
+        items = list(range(25))
+        self.assertEqual([item * 2 for item in items],
+                         volume_utils.run_concurrently(_double, items, 3,
+                                                       'Doubling'))
+        self.assertEqual(3, max(peak))
+        # Every tenth of the items, and the last one.
+        self.assertEqual(13, mock_log.info.call_count)
@@ -19,6 +19,7 @@
 
 
 import abc
+import collections
 import contextlib
 import datetime
 import functools
@@ -40,11 +41,13 @@ from xml.parsers import expat
 from xml import sax
 from xml.sax import expatreader
 
+from eventlet import tpool
 from os_brick.initiator import connector
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_rootwrap import client as rootwrap_client
 from oslo_utils import encodeutils
 from oslo_utils import excutils
 from oslo_utils import importutils
@@ -54,7 +57,7 @@ import retrying
 import six
 
 from cinder import exception
-from cinder.i18n import _, _LE, _LW
+from cinder.i18n import _, _LE, _LI, _LW
 
 
 CONF = cfg.CONF
@@ -148,9 +151,20 @@ def check_exclusive_options(**kwargs):
 
 
 def execute(*cmd, **kwargs):
-    """Convenience wrapper around oslo's execute() method."""
+    """Convenience wrapper around oslo's execute() method.
+
+    Commands run as root with the default root helper are sent to the
+    rootwrap daemon when use_rootwrap_daemon is set.
+    """
     if 'run_as_root' in kwargs and 'root_helper' not in kwargs:
         kwargs['root_helper'] = get_root_helper()
+    # Arguments the daemon cannot honour, and unknown ones, go through
+    # processutils so that they behave the same with or without daemon.
+    if (CONF.use_rootwrap_daemon and kwargs.get('run_as_root') and
+            kwargs['root_helper'] == get_root_helper() and
+            set(kwargs).issubset(RootwrapDaemonHelper.EXECUTE_ARGS)):
+        del kwargs['run_as_root'], kwargs['root_helper']
+        return RootwrapDaemonHelper.get().execute(*cmd, **kwargs)
     return processutils.execute(*cmd, **kwargs)
 
 
@@ -543,6 +557,107 @@ def get_root_helper():
     return 'sudo cinder-rootwrap %s' % CONF.rootwrap_config
 
 
+class RootwrapDaemonHelper(object):
+    """Runs commands as root through a cinder-rootwrap-daemon process.
+
+    The daemon is started on first use and applies the same filters as
+    cinder-rootwrap, without starting a new interpreter for each command.
+    """
+
+    _instance = None
+
+    # The arguments of processutils.execute supported by execute
+    EXECUTE_ARGS = frozenset(['run_as_root', 'root_helper', 'process_input',
+                              'check_exit_code', 'attempts',
+                              'delay_on_retry', 'loglevel', 'log_errors'])
+
+    def __init__(self, rootwrap_config):
+        self.client = rootwrap_client.Client(
+            ['sudo', 'cinder-rootwrap-daemon', rootwrap_config])
+        # Number of runs, total and longest seconds spent, per command
+        self.stats = collections.defaultdict(lambda: [0, 0.0, 0.0])
+
+    @classmethod
+    @synchronized('rootwrap-daemon')
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls(CONF.rootwrap_config)
+        return cls._instance
+
+    def execute(self, *cmd, **kwargs):
+        """Runs a command, accepting the arguments of processutils.execute."""
+        cmd = [six.text_type(c) for c in cmd]
+        process_input = kwargs.pop('process_input', None)
+        check_exit_code = kwargs.pop('check_exit_code', [0])
+        attempts = kwargs.pop('attempts', 1)
+        delay_on_retry = kwargs.pop('delay_on_retry', True)
+        loglevel = kwargs.pop('loglevel', py_logging.DEBUG)
+        log_errors = kwargs.pop('log_errors', None)
+        if kwargs:
+            raise processutils.UnknownArgumentError(
+                _('Got unknown keyword args: %r') % kwargs)
+        ignore_exit_code = False
+        if isinstance(check_exit_code, bool):
+            ignore_exit_code = not check_exit_code
+            check_exit_code = [0]
+        elif isinstance(check_exit_code, int):
+            check_exit_code = [check_exit_code]
+
+        sanitized_cmd = strutils.mask_password(' '.join(cmd))
+        while attempts > 0:
+            attempts -= 1
+            LOG.log(loglevel, 'Running cmd (rootwrap daemon): %s',
+                    sanitized_cmd)
+            start = time.time()
+            # The client blocks on a pipe, keep the other green threads
+            # running meanwhile.
+            returncode, out, err = tpool.execute(self.client.execute, cmd,
+                                                 process_input)
+            duration = time.time() - start
+            stats = self.stats[os.path.basename(cmd[0])]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            LOG.log(loglevel, 'CMD "%(cmd)s" returned: %(code)s in '
+                    '%(duration)0.3fs',
+                    {'cmd': sanitized_cmd, 'code': returncode,
+                     'duration': duration})
+
+            if ignore_exit_code or returncode in check_exit_code:
+                return out, err
+
+            error = processutils.ProcessExecutionError(
+                exit_code=returncode,
+                stdout=strutils.mask_password(out),
+                stderr=strutils.mask_password(err),
+                cmd=sanitized_cmd)
+            if (log_errors == processutils.LOG_ALL_ERRORS or
+                    (log_errors == processutils.LOG_FINAL_ERROR and
+                     not attempts)):
+                LOG.log(loglevel, '%s', error)
+            if not attempts:
+                raise error
+            LOG.log(loglevel, '%r failed. Retrying.', sanitized_cmd)
+            if delay_on_retry:
+                time.sleep(random.randint(20, 200) / 100.0)
+
+    def get_stats(self):
+        """Returns the number of runs and the seconds spent per command."""
+        return {name: {'count': count, 'total': total, 'max': longest,
+                       'average': total / count}
+                for name, (count, total, longest) in self.stats.items()}
+
+    @classmethod
+    def log_stats(cls):
+        """Logs the statistics of the daemon, if it was started."""
+        if cls._instance is None:
+            return
+        for name, stats in sorted(cls._instance.get_stats().items()):
+            LOG.info(_LI('Rootwrap daemon ran %(name)s %(count)d times in '
+                         '%(total)0.3fs, %(average)0.3fs on average and '
+                         '%(max)0.3fs at most.'), dict(stats, name=name))
+
+
 def brick_get_connector_properties(multipath=False, enforce_multipath=False):
     """Wrapper to automatically set root_helper in brick calls.
 
@@ -233,6 +233,77 @@ class API(base.Base):
                scheduler_hints=None,
                source_replica=None, consistencygroup=None,
                cgsnapshot=None, multiattach=False, source_cg=None):
+        flow_storage = self._create(
+            context, size, name, description, snapshot=snapshot,
+            image_id=image_id, volume_type=volume_type, metadata=metadata,
+            availability_zone=availability_zone, source_volume=source_volume,
+            scheduler_hints=scheduler_hints, source_replica=source_replica,
+            consistencygroup=consistencygroup, cgsnapshot=cgsnapshot,
+            multiattach=multiattach, source_cg=source_cg)
+        return flow_storage.fetch('volume')
+
+    def create_volumes(self, context, count, size, name, description,
+                       image_id=None, volume_type=None, metadata=None,
+                       availability_zone=None, scheduler_hints=None,
+                       multiattach=False):
+        """Create count identical volumes, scheduled with one request.
+
+        Each volume is reserved and created in the database as by create,
+        then the scheduler places all of them in a single pass. If a volume
+        cannot be created, the ones created before it are put in error and
+        none is scheduled.
+        """
+        if not utils.is_int_like(count) or int(count) <= 0:
+            msg = _('Invalid volume count provided for create request: %s '
+                    '(count argument must be an integer greater than '
+                    'zero).') % count
+            raise exception.InvalidInput(reason=msg)
+
+        volumes = []
+        request_spec = None
+        try:
+            for _i in range(int(count)):
+                flow_storage = self._create(
+                    context, size, name, description, image_id=image_id,
+                    volume_type=volume_type, metadata=metadata,
+                    availability_zone=availability_zone,
+                    multiattach=multiattach, schedule=False)
+                volumes.append(flow_storage.fetch('volume'))
+                if request_spec is None:
+                    # Shared by the volumes, the scheduler sets the id of
+                    # each one.
+                    request_spec = {
+                        key: flow_storage.fetch(key)
+                        for key in ('image_id', 'snapshot_id',
+                                    'source_volid', 'volume_type',
+                                    'volume_properties', 'source_replicaid',
+                                    'consistencygroup_id',
+                                    'cgsnapshot_id')}
+                    request_spec['volume_id'] = None
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for volume in volumes:
+                    volume.status = 'error'
+                    volume.save()
+
+        filter_properties = {}
+        if scheduler_hints:
+            filter_properties['scheduler_hints'] = scheduler_hints
+        self.scheduler_rpcapi.create_volumes(
+            context, CONF.volume_topic, [volume.id for volume in volumes],
+            request_spec=request_spec, filter_properties=filter_properties)
+        return volumes
+
+    def _create(self, context, size, name, description, snapshot=None,
+                image_id=None, volume_type=None, metadata=None,
+                availability_zone=None, source_volume=None,
+                scheduler_hints=None, source_replica=None,
+                consistencygroup=None, cgsnapshot=None, multiattach=False,
+                source_cg=None, schedule=True):
+        """Run the create flow and return its storage.
+
+        Without schedule, the volume is left for the caller to schedule.
+        """
 
         check_policy(context, 'create')
 
@@ -326,10 +397,10 @@ class API(base.Base):
             'multiattach': multiattach,
         }
         try:
-            sched_rpcapi = (self.scheduler_rpcapi if (not cgsnapshot and
-                            not source_cg) else None)
-            volume_rpcapi = (self.volume_rpcapi if (not cgsnapshot and
-                             not source_cg) else None)
+            sched_rpcapi = (self.scheduler_rpcapi if (
+                schedule and not cgsnapshot and not source_cg) else None)
+            volume_rpcapi = (self.volume_rpcapi if (
+                schedule and not cgsnapshot and not source_cg) else None)
             flow_engine = create_volume.get_flow(self.db,
                                                  self.image_service,
                                                  availability_zones,
@@ -348,7 +419,7 @@ class API(base.Base):
             flow_engine.run()
             vref = flow_engine.storage.fetch('volume')
             LOG.info(_LI("Volume created successfully."), resource=vref)
-            return vref
+            return flow_engine.storage
 
     @wrap_check_policy
     def delete(self, context, volume, force=False, unmanage_only=False):
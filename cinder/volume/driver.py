@@ -23,6 +23,7 @@ from oslo_config import cfg
 from oslo_config import types
 from oslo_log import log as logging
 from oslo_utils import excutils
+from oslo_utils import units
 import six
 
 from cinder import exception
@@ -117,6 +118,12 @@ volume_opts = [
                default='1M',
                help='The default block size used when copying/clearing '
                     'volumes'),
+    cfg.IntOpt('volume_odirect_check_cache_ttl',
+               default=300,
+               help='Number of seconds the result of checking whether a '
+                    'device or file system supports O_DIRECT is reused by '
+                    'volume copies and clears. 0 checks before every '
+                    'copy.'),
     cfg.StrOpt('volume_copy_blkio_cgroup_name',
                default='cinder-volume-copy',
                help='The blkio cgroup name to be used to limit bandwidth '
@@ -125,6 +132,33 @@ volume_opts = [
                default=0,
                help='The upper limit of bandwidth of volume copy. '
                     '0 => unlimited'),
+    cfg.StrOpt('volume_copy_engine',
+               default='dd',
+               choices=['dd', 'native'],
+               help='How local volumes are copied and cleared. "dd" runs '
+                    'a dd process per copy, "native" copies in the '
+                    'volume service with aligned, direct and overlapped '
+                    'I/O, running at most two chown commands when the '
+                    'service cannot open the devices itself. Copies that '
+                    'are throttled or use '
+                    'volume_clear_ionice always use dd.'),
+    cfg.IntOpt('volume_copy_io_depth',
+               default=4,
+               min=1,
+               help='Number of blocks written concurrently by the native '
+                    'volume copy engine.'),
+    cfg.IntOpt('volume_copy_chunk_size',
+               default=4 * units.Mi,
+               min=1,
+               help='Size in bytes of the chunks read and written when '
+                    'copying volumes attached as file handles rather than '
+                    'local paths, for example RBD volumes.'),
+    cfg.IntOpt('init_host_max_workers',
+               default=1,
+               min=1,
+               help='Maximum number of volumes the volume service recovers '
+                    'concurrently when it starts, recreating their exports '
+                    'or cleaning up the volumes left downloading.'),
     cfg.StrOpt('iscsi_write_cache',
                default='on',
                choices=['on', 'off'],
@@ -790,7 +824,8 @@ class BaseVD(object):
                 size_in_mb,
                 self.configuration.volume_dd_blocksize,
                 throttle=self._throttle,
-                sparse=sparse_copy_volume)
+                sparse=sparse_copy_volume,
+                chunk_size=self.configuration.volume_copy_chunk_size)
             copy_error = False
         except Exception:
             with excutils.save_and_reraise_exception():
@@ -1399,6 +1434,29 @@ class BaseVD(object):
         """Synchronously recreates an export for a volume."""
         return
 
+    def ensure_exports(self, context, volumes):
+        """Synchronously recreates the exports of volumes.
+
+        By default up to init_host_max_workers exports are recreated at a
+        time. Drivers can override this to recreate all of them at once.
+
+        :returns: the volumes whose export could not be recreated
+        """
+        def _ensure_export(volume):
+            try:
+                self.ensure_export(context, volume)
+            except Exception:
+                LOG.exception(_LE("Failed to re-export volume %s."),
+                              volume['id'])
+                return volume
+
+        workers = (self.configuration and
+                   self.configuration.safe_get('init_host_max_workers'))
+        results = volume_utils.run_concurrently(_ensure_export, volumes,
+                                                workers or 1,
+                                                'Re-exporting volumes')
+        return [volume for volume in results if volume is not None]
+
     @abc.abstractmethod
     def create_export(self, context, volume, connector):
         """Exports the volume.
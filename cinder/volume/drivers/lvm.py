@@ -735,6 +735,12 @@ class LVMVolumeDriver(driver.VolumeDriver):
             self.target_driver.ensure_export(context, volume, volume_path)
         return model_update
 
+    def ensure_exports(self, context, volumes):
+        exports = [(volume, "/dev/%s/%s" % (self.configuration.volume_group,
+                                            volume['name']))
+                   for volume in volumes]
+        return self.target_driver.ensure_exports(context, exports)
+
     def create_export(self, context, volume, connector, vg=None):
         if vg is None:
             vg = self.configuration.volume_group
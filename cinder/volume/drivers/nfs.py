@@ -17,6 +17,7 @@ import errno
 import os
 import time
 
+import eventlet
 from os_brick.remotefs import remotefs as remotefs_brick
 from oslo_concurrency import processutils as putils
 from oslo_config import cfg
@@ -77,6 +78,15 @@ nfs_opts = [
                      'raising an error.  At least one attempt will be '
                      'made to mount an NFS share, regardless of the '
                      'value specified.')),
+    cfg.IntOpt('nfs_allocated_space_refresh_interval',
+               default=300,
+               min=0,
+               help=('Number of seconds between measures of the space '
+                     'allocated on each NFS share with du, run in the '
+                     'background when the volume stats are updated. In '
+                     'between, the allocated space is updated as the '
+                     'driver creates, extends and deletes volumes. 0 '
+                     'measures it every time it is needed.')),
 ]
 
 CONF = cfg.CONF
@@ -122,6 +132,13 @@ class NfsDriver(driver.ExtendVD, remotefs.RemoteFSDriver):
 
         self._sparse_copy_volume_data = True
         self.reserved_percentage = self._get_reserved_percentage()
+        self.allocated_space_refresh_interval = getattr(
+            self.configuration, 'nfs_allocated_space_refresh_interval',
+            CONF.nfs_allocated_space_refresh_interval)
+        # Apparent size of the files on each share, and when it was measured
+        self._allocated_space = {}  # address : [bytes, time]
+        # Shares measured again in the background
+        self._refreshing_shares = set()
         self.over_subscription_ratio = self._get_over_subscription_ratio()
 
     def do_setup(self, context):
@@ -308,11 +325,77 @@ class NfsDriver(driver.ExtendVD, remotefs.RemoteFSDriver):
         total_available = block_size * blocks_avail
         total_size = block_size * blocks_total
 
+        total_allocated = self._get_allocated_space(nfs_share, mount_point)
+        return total_size, total_available, total_allocated
+
+    def _measure_allocated_space(self, nfs_share, mount_point):
         du, _ = self._execute('du', '-sb', '--apparent-size', '--exclude',
                               '*snapshot*', mount_point,
-                              run_as_root=run_as_root)
-        total_allocated = float(du.split()[0])
-        return total_size, total_available, total_allocated
+                              run_as_root=self._execute_as_root)
+        allocated = [float(du.split()[0]), time.time()]
+        self._allocated_space[nfs_share] = allocated
+        return allocated[0]
+
+    def _get_allocated_space(self, nfs_share, mount_point):
+        """Return the apparent size of the files on the NFS share.
+
+        Running du over a share holding many volumes is slow, so it is only
+        measured the first time, then kept up to date as volumes are
+        created, extended and deleted.
+        """
+        allocated = self._allocated_space.get(nfs_share)
+        if allocated is None or not self.allocated_space_refresh_interval:
+            return self._measure_allocated_space(nfs_share, mount_point)
+        return allocated[0]
+
+    def _update_allocated_space(self, nfs_share, size_in_gib):
+        """Account for size_in_gib more allocated on the NFS share."""
+        allocated = self._allocated_space.get(nfs_share)
+        if allocated is not None:
+            allocated[0] = max(0.0, allocated[0] + size_in_gib * units.Gi)
+
+    def _refresh_allocated_space(self):
+        """Measure again the space allocated on the shares.
+
+        This corrects the changes made outside of the driver, by copying
+        images or by the administrator for instance. du runs in a green
+        thread per share, the new measure being used from the next stats
+        update on.
+        """
+        interval = self.allocated_space_refresh_interval
+        if not interval:
+            return
+        now = time.time()
+        for nfs_share, allocated in list(self._allocated_space.items()):
+            if nfs_share not in self._mounted_shares:
+                del self._allocated_space[nfs_share]
+            elif (now - allocated[1] >= interval and
+                    nfs_share not in self._refreshing_shares):
+                self._refreshing_shares.add(nfs_share)
+                eventlet.spawn_n(self._refresh_share_allocated_space,
+                                 nfs_share)
+
+    def _refresh_share_allocated_space(self, nfs_share):
+        try:
+            self._measure_allocated_space(
+                nfs_share, self._get_mount_point_for_share(nfs_share))
+        except Exception:
+            LOG.exception(_LE('Failed to measure the space allocated on '
+                              'NFS share %s.'), nfs_share)
+        finally:
+            self._refreshing_shares.discard(nfs_share)
+
+    def _do_create_volume(self, volume):
+        super(NfsDriver, self)._do_create_volume(volume)
+        self._update_allocated_space(volume['provider_location'],
+                                     volume['size'])
+
+    def delete_volume(self, volume):
+        """Deletes a logical volume."""
+        super(NfsDriver, self).delete_volume(volume)
+        nfs_share = volume['provider_location']
+        if nfs_share in self._allocated_space:
+            self._update_allocated_space(nfs_share, -volume['size'])
 
     def _get_mount_point_base(self):
         return self.base
@@ -333,6 +416,7 @@ class NfsDriver(driver.ExtendVD, remotefs.RemoteFSDriver):
         if not self._is_file_size_equal(path, new_size):
             raise exception.ExtendVolumeError(
                 reason='Resizing image file failed.')
+        self._update_allocated_space(volume['provider_location'], extend_by)
 
     def _is_file_size_equal(self, path, size):
         """Checks if file size at path is equal to size."""
@@ -439,6 +523,7 @@ class NfsDriver(driver.ExtendVD, remotefs.RemoteFSDriver):
     def _update_volume_stats(self):
         """Retrieve stats info from volume group."""
 
+        self._refresh_allocated_space()
         super(NfsDriver, self)._update_volume_stats()
         self._stats['sparse_copy_volume'] = True
         data = self._stats
@@ -37,6 +37,7 @@ intact.
 """
 
 
+import functools
 import time
 
 from oslo_config import cfg
@@ -312,6 +313,34 @@ class VolumeManager(manager.SchedulerDependentManager):
         self.stats['pools'][pool]['allocated_capacity_gb'] = pool_sum
         self.stats['allocated_capacity_gb'] += volume['size']
 
+    def _count_pools_allocated_capacity(self, ctxt):
+        """Count the allocated capacity of the pools of the backend.
+
+        Volumes created before pools were introduced are not included and
+        must be counted with _count_allocated_capacity.
+        """
+        pools = self.db.volume_size_get_by_pool(ctxt, self.host,
+                                                ['in-use', 'available'])
+        self.stats['pools'] = {
+            pool: dict(allocated_capacity_gb=size)
+            for pool, size in pools.items()}
+        self.stats['allocated_capacity_gb'] = sum(pools.values())
+
+    def _init_host_max_workers(self):
+        workers = self.driver.configuration.safe_get('init_host_max_workers')
+        return workers or 1
+
+    def _set_init_host_errors(self, ctxt, obj_class, objs):
+        """Set the status of the objects to error with a single update."""
+        if not objs:
+            return
+        self.db.conditional_update(ctxt, obj_class.model,
+                                   {'status': 'error'},
+                                   {'id': [obj.id for obj in objs]})
+        for obj in objs:
+            obj.status = 'error'
+            obj.obj_reset_changes(['status'])
+
     def _set_voldb_empty_at_startup_indicator(self, ctxt):
         """Determine if the Cinder volume DB is empty.
 
@@ -394,44 +423,55 @@ class VolumeManager(manager.SchedulerDependentManager):
         self._sync_provider_info(ctxt, volumes, snapshots)
         # FIXME volume count for exporting is wrong
 
+        volume = None
         try:
-            self.stats['pools'] = {}
-            self.stats.update({'allocated_capacity_gb': 0})
+            self._count_pools_allocated_capacity(ctxt)
+            exported_volumes = []
+            stuck_volumes = []
             for volume in volumes:
                 # available volume should also be counted into allocated
                 if volume['status'] in ['in-use', 'available']:
-                    # calculate allocated capacity for driver
-                    self._count_allocated_capacity(ctxt, volume)
-
-                    try:
-                        if volume['status'] in ['in-use']:
-                            self.driver.ensure_export(ctxt, volume)
-                    except Exception:
-                        LOG.exception(_LE("Failed to re-export volume, "
-                                          "setting to ERROR."),
-                                      resource=volume)
-                        volume.status = 'error'
-                        volume.save()
+                    # Volumes in a pool were counted by the aggregate.
+                    if vol_utils.extract_host(volume['host'],
+                                              'pool') is None:
+                        self._count_allocated_capacity(ctxt, volume)
+
+                    if volume['status'] in ['in-use']:
+                        exported_volumes.append(volume)
                 elif volume['status'] in ('downloading', 'creating'):
                     LOG.warning(_LW("Detected volume stuck "
                                     "in %(curr_status)s "
                                     "status, setting to ERROR."),
                                 {'curr_status': volume['status']},
                                 resource=volume)
-
-                    if volume['status'] == 'downloading':
-                        self.driver.clear_download(ctxt, volume)
-                    volume.status = 'error'
-                    volume.save()
+                    stuck_volumes.append(volume)
                 else:
                     pass
+
+            downloading = [v for v in stuck_volumes
+                           if v['status'] == 'downloading']
+            vol_utils.run_concurrently(
+                functools.partial(self.driver.clear_download, ctxt),
+                downloading, self._init_host_max_workers(),
+                'Clearing volume downloads')
+
+            # Drivers can recreate all the exports at once, which is much
+            # faster than one by one for some targets.
+            failed_volumes = self.driver.ensure_exports(ctxt,
+                                                        exported_volumes)
+            for volume in failed_volumes:
+                LOG.error(_LE("Failed to re-export volume, "
+                              "setting to ERROR."),
+                          resource=volume)
+            self._set_init_host_errors(ctxt, objects.Volume,
+                                       stuck_volumes + failed_volumes)
+
             snapshots = objects.SnapshotList.get_by_host(
                 ctxt, self.host, {'status': 'creating'})
             for snapshot in snapshots:
                 LOG.warning(_LW("Detected snapshot stuck in creating "
                             "status, setting to ERROR."), resource=snapshot)
-                snapshot.status = 'error'
-                snapshot.save()
+            self._set_init_host_errors(ctxt, objects.Snapshot, snapshots)
         except Exception:
             LOG.exception(_LE("Error during re-export on driver init."),
                           resource=volume)
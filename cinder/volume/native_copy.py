@@ -0,0 +1,298 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process copy of local block devices and files.
+
+Used by copy_volume instead of spawning dd. Regular files are copied with
+copy_file_range() or sendfile() when the kernel and file systems allow it.
+Everything else goes through page aligned buffers, with O_DIRECT when the
+device or file system supports it, and with several reads and writes in
+flight at the same time.
+"""
+
+
+import contextlib
+import errno
+import fcntl
+import mmap
+import os
+import stat
+import sys
+
+import eventlet
+from eventlet import queue
+from eventlet import tpool
+from oslo_log import log as logging
+from oslo_utils import excutils
+import six
+
+from cinder import utils
+
+
+LOG = logging.getLogger(__name__)
+
+ZERO_DEVICE = '/dev/zero'
+
+# O_DIRECT needs buffers, offsets and lengths aligned on the logical block
+# size of the device. mmap buffers are page aligned.
+DIRECT_IO_ALIGNMENT = 4096
+
+# Errors meaning that the kernel cannot offload a copy between two files.
+_OFFLOAD_ERRNOS = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP)
+
+
+def is_supported(src, dest):
+    """Return whether src can be copied to dest in process."""
+    if not all(hasattr(os, name) for name in ('readv', 'pwrite', 'O_DIRECT')):
+        return False
+    paths = [dest] if src == ZERO_DEVICE else [src, dest]
+    for path in paths:
+        try:
+            mode = os.stat(path).st_mode
+        except OSError:
+            return False
+        if not (stat.S_ISREG(mode) or stat.S_ISBLK(mode)):
+            return False
+    return True
+
+
+def _is_regular_file(path):
+    return path != ZERO_DEVICE and stat.S_ISREG(os.stat(path).st_mode)
+
+
+@contextlib.contextmanager
+def _accessible(paths):
+    """Make paths accessible to the current user while they are opened.
+
+    paths is a list of (path, mode) tuples, mode being given to os.access.
+    The paths the current user can already access are left alone, the
+    others are chowned with a single command and given back with one
+    command per original owner, instead of two commands per path.
+    """
+    uid = os.getuid()
+    owners = {}
+    for path, mode in paths:
+        owner = os.stat(path).st_uid
+        if owner != uid and not os.access(path, mode):
+            owners.setdefault(owner, []).append(path)
+    chowned = [path for group in owners.values() for path in group]
+    if chowned:
+        utils.execute('chown', uid, *chowned, run_as_root=True)
+    try:
+        yield
+    finally:
+        for owner, group in owners.items():
+            utils.execute('chown', owner, *group, run_as_root=True)
+
+
+def _open(path, flags, direct):
+    """Open path, with O_DIRECT if requested and supported.
+
+    Returns the file descriptor and whether O_DIRECT is in use.
+    """
+    if direct:
+        try:
+            return os.open(path, flags | os.O_DIRECT), True
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            LOG.debug('O_DIRECT is not supported for %s.', path)
+    return os.open(path, flags), False
+
+
+def _clear_direct(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+
+
+def _pread_into(fd, buf, count, offset):
+    # Read whole aligned blocks, an O_DIRECT read of a partial block fails.
+    aligned = min(len(buf), -(-count // DIRECT_IO_ALIGNMENT) *
+                  DIRECT_IO_ALIGNMENT)
+    view = memoryview(buf)
+    done = 0
+    os.lseek(fd, offset, os.SEEK_SET)
+    while done < aligned:
+        read = os.readv(fd, [view[done:aligned]])
+        if not read:
+            break
+        done += read
+    return min(done, count)
+
+
+def _pwrite_all(fd, buf, count, offset):
+    view = memoryview(buf)[:count]
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _iter_extents(src_fd, length, skip_holes):
+    """Yield the (offset, length) ranges of the source to copy.
+
+    With skip_holes, the holes of a sparse source file are left out.
+    Ranges are widened to DIRECT_IO_ALIGNMENT.
+    """
+    if not skip_holes or not hasattr(os, 'SEEK_DATA'):
+        yield 0, length
+        return
+
+    offset = 0
+    while offset < length:
+        try:
+            data = os.lseek(src_fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Only a hole is left.
+                return
+            if e.errno != errno.EINVAL:
+                raise
+            # The file system cannot report holes.
+            yield offset, length - offset
+            return
+        if data >= length:
+            return
+        hole = os.lseek(src_fd, data, os.SEEK_HOLE)
+        start = data - data % DIRECT_IO_ALIGNMENT
+        end = min(length, -(-hole // DIRECT_IO_ALIGNMENT) *
+                  DIRECT_IO_ALIGNMENT)
+        yield start, end - start
+        offset = end
+
+
+def _offload_copy(src_fd, dest_fd, length, chunk_size):
+    """Copy with copy_file_range() or sendfile().
+
+    Returns False, having copied nothing, if the kernel can do neither
+    between these files.
+    """
+    for name in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, name):
+            continue
+        offset = 0
+        try:
+            while offset < length:
+                count = min(chunk_size, length - offset)
+                if name == 'copy_file_range':
+                    copied = tpool.execute(os.copy_file_range, src_fd,
+                                           dest_fd, count, offset, offset)
+                else:
+                    copied = tpool.execute(os.sendfile, dest_fd, src_fd,
+                                           offset, count)
+                if not copied:
+                    break
+                offset += copied
+                # yield to any other pending operations
+                eventlet.sleep(0)
+            return True
+        except OSError as e:
+            if offset or e.errno not in _OFFLOAD_ERRNOS:
+                raise
+            LOG.debug('%(name)s is not supported between these files: '
+                      '%(error)s', {'name': name, 'error': e})
+    return False
+
+
+def _copy_blocks(src_fd, dest_fd, dest_direct, extents, blocksize,
+                 io_depth, sparse):
+    """Copy the extents of src_fd to dest_fd through aligned buffers.
+
+    One green thread reads while up to io_depth others write, all blocking
+    calls running in native threads. Without src_fd, zeros are written.
+    With sparse, blocks that only contain zeros are not written.
+    """
+    buffers = queue.LightQueue()
+    for _i in range(io_depth + 1):
+        buffers.put(mmap.mmap(-1, blocksize))
+    zero_block = memoryview(bytearray(blocksize))
+    writers = eventlet.GreenPool(io_depth)
+    errors = []
+
+    def _write(buf, count, offset):
+        try:
+            tpool.execute(_pwrite_all, dest_fd, buf, count, offset)
+        except Exception:
+            errors.append(sys.exc_info())
+        finally:
+            buffers.put(buf)
+
+    try:
+        for offset, extent_length in extents:
+            end = offset + extent_length
+            while offset < end and not errors:
+                buf = buffers.get()
+                count = min(blocksize, end - offset)
+                if src_fd is not None:
+                    count = tpool.execute(_pread_into, src_fd, buf, count,
+                                          offset)
+                if not count:
+                    buffers.put(buf)
+                    return
+                if sparse and memoryview(buf)[:count] == zero_block[:count]:
+                    buffers.put(buf)
+                else:
+                    if dest_direct and count % DIRECT_IO_ALIGNMENT:
+                        # Unaligned tail of the source.
+                        writers.waitall()
+                        _clear_direct(dest_fd)
+                        dest_direct = False
+                    writers.spawn_n(_write, buf, count, offset)
+                offset += count
+    finally:
+        writers.waitall()
+        if errors:
+            six.reraise(*errors[0])
+
+
+def copy_volume(src, dest, length, blocksize, sync=False, sparse=False,
+                io_depth=4):
+    """Copy length bytes from the src path to the dest path.
+
+    src may be /dev/zero to clear dest. With sparse, as with dd's
+    conv=sparse, zeroed blocks and the holes of a sparse source file are
+    skipped rather than written, so dest must already read as zeros.
+    """
+    direct = blocksize % DIRECT_IO_ALIGNMENT == 0
+    offload = (not sparse and _is_regular_file(src) and
+               _is_regular_file(dest))
+    paths = [(dest, os.W_OK)]
+    if src != ZERO_DEVICE:
+        paths.append((src, os.R_OK))
+    src_fd = None
+    # The file descriptors stay usable once the owners are given back.
+    with _accessible(paths):
+        dest_fd, dest_direct = _open(dest, os.O_WRONLY,
+                                     direct and not offload)
+        if src != ZERO_DEVICE:
+            try:
+                src_fd, _src_direct = _open(src, os.O_RDONLY,
+                                            direct and not offload)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    os.close(dest_fd)
+    try:
+        if src_fd is None:
+            _copy_blocks(None, dest_fd, dest_direct, [(0, length)],
+                         blocksize, io_depth, sparse)
+        elif not (offload and _offload_copy(src_fd, dest_fd, length,
+                                            blocksize * io_depth)):
+            extents = _iter_extents(src_fd, length,
+                                    sparse and _is_regular_file(src))
+            _copy_blocks(src_fd, dest_fd, dest_direct, extents,
+                         blocksize, io_depth, sparse)
+        if sync:
+            tpool.execute(os.fdatasync, dest_fd)
+    finally:
+        if src_fd is not None:
+            os.close(src_fd)
+        os.close(dest_fd)
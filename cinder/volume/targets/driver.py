@@ -13,9 +13,14 @@
 import abc
 
 from oslo_config import cfg
+from oslo_log import log as logging
 import six
 
+from cinder.i18n import _LE
+from cinder.volume import utils as vutils
+
 CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
 
 
 @six.add_metaclass(abc.ABCMeta)
@@ -44,6 +49,29 @@ class Target(object):
         """Synchronously recreates an export for a volume."""
         pass
 
+    def ensure_exports(self, context, exports):
+        """Synchronously recreates the exports of volumes.
+
+        Up to init_host_max_workers exports are recreated at a time.
+
+        :param exports: list of (volume, volume_path) tuples
+        :returns: the volumes whose export could not be recreated
+        """
+        def _ensure_export(export):
+            volume, volume_path = export
+            try:
+                self.ensure_export(context, volume, volume_path)
+            except Exception:
+                LOG.exception(_LE("Failed to re-export volume %s."),
+                              volume['id'])
+                return volume
+
+        workers = (self.configuration and
+                   self.configuration.safe_get('init_host_max_workers'))
+        results = vutils.run_concurrently(_ensure_export, exports,
+                                          workers or 1, 'Re-exporting volumes')
+        return [volume for volume in results if volume is not None]
+
     @abc.abstractmethod
     def create_export(self, context, volume, volume_path):
         """Exports a Target/Volume.
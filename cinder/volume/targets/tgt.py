@@ -47,38 +47,37 @@ class TgtAdm(iscsi.ISCSITarget):
 
     def __init__(self, *args, **kwargs):
         super(TgtAdm, self).__init__(*args, **kwargs)
+        # Targets of tgtd when they were last listed, see _get_targets
+        self._targets = {}
 
-    def _get_target(self, iqn):
-        (out, err) = utils.execute('tgt-admin', '--show', run_as_root=True)
-        lines = out.split('\n')
-        for line in lines:
-            if iqn in line:
-                parsed = line.split()
-                tid = parsed[1]
-                return tid[:-1]
-
-        return None
+    def _get_targets(self):
+        """List the targets of tgtd.
 
-    def _verify_backing_lun(self, iqn, tid):
-        backing_lun = True
-        capture = False
-        target_info = []
+        Listing them is slow with many targets, so the table is parsed once
+        and kept, for the callers which do not need to list them again.
 
+        :returns: dict of (tid, has backing lun) tuples by target iqn
+        """
         (out, err) = utils.execute('tgt-admin', '--show', run_as_root=True)
-        lines = out.split('\n')
-
-        for line in lines:
-            if iqn in line and "Target %s" % tid in line:
-                capture = True
-            if capture:
-                target_info.append(line)
-            if iqn not in line and 'Target ' in line:
-                capture = False
+        targets = {}
+        target = None
+        for line in out.split('\n'):
+            if line.startswith('Target '):
+                parsed = line.split()
+                target = parsed[2] if len(parsed) > 2 else None
+                if target:
+                    targets[target] = (parsed[1][:-1], False)
+            elif line == '        LUN: 1' and target in targets:
+                targets[target] = (targets[target][0], True)
+        self._targets = targets
+        return targets
 
-        if '        LUN: 1' not in target_info:
-            backing_lun = False
+    def _get_target(self, iqn):
+        target = self._get_targets().get(iqn)
+        return target[0] if target else None
 
-        return backing_lun
+    def _verify_backing_lun(self, iqn, tid):
+        return self._get_targets().get(iqn) == (tid, True)
 
     def _recreate_backing_lun(self, iqn, tid, name, path):
         LOG.warning(_LW('Attempting recreate of backing lun...'))
@@ -121,24 +120,11 @@ class TgtAdm(iscsi.ISCSITarget):
         LOG.debug("StdOut from tgt-admin --update: %s", out)
         LOG.debug("StdErr from tgt-admin --update: %s", err)
 
-    def create_iscsi_target(self, name, tid, lun, path,
-                            chap_auth=None, **kwargs):
-
-        # Note(jdg) tid and lun aren't used by TgtAdm but remain for
-        # compatibility
+    def _write_volume_conf(self, name, path, chap_auth=None):
+        """Write the persistence file of a target for tgt-admin.
 
-        # NOTE(jdg): Remove this when we get to the bottom of bug: #1398078
-        # for now, since we intermittently hit target already exists we're
-        # adding some debug info to try and pinpoint what's going on
-        (out, err) = utils.execute('tgtadm',
-                                   '--lld',
-                                   'iscsi',
-                                   '--op',
-                                   'show',
-                                   '--mode',
-                                   'target',
-                                   run_as_root=True)
-        LOG.debug("Targets prior to update: %s", out)
+        :returns: the path of the file
+        """
         fileutils.ensure_tree(self.volumes_dir)
 
         vol_id = name.split(':')[1]
@@ -169,6 +155,42 @@ class TgtAdm(iscsi.ISCSITarget):
         LOG.debug(('Created volume path %(vp)s,\n'
                    'content: %(vc)s'),
                   {'vp': volume_path, 'vc': volume_conf})
+        return volume_path
+
+    def _restore_backing_lun(self, iqn, tid, name, path, volume_path):
+        """Recreate the backing lun of a target found without it."""
+        # NOTE(jdg): Sometimes we have some issues with the backing lun
+        # not being created, believe this is due to a device busy
+        # or something related, so we're going to add some code
+        # here that verifies the backing lun (lun 1) was created
+        # and we'll try and recreate it if it's not there
+        vol_id = name.split(':')[1]
+        try:
+            self._recreate_backing_lun(iqn, tid, name, path)
+        except putils.ProcessExecutionError:
+            os.unlink(volume_path)
+            raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
+
+        # Finally check once more and if no go, fail and punt
+        if not self._verify_backing_lun(iqn, tid):
+            os.unlink(volume_path)
+            raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
+
+    def create_iscsi_target(self, name, tid, lun, path,
+                            chap_auth=None, **kwargs):
+
+        # Note(jdg) tid and lun aren't used by TgtAdm but remain for
+        # compatibility
+
+        vol_id = name.split(':')[1]
+        iqn = '%s%s' % (self.iscsi_target_prefix, vol_id)
+        # NOTE(jdg): Remove this when we get to the bottom of bug: #1398078
+        # for now, since we intermittently hit target already exists we're
+        # adding some debug info to try and pinpoint what's going on
+        LOG.debug("Target prior to update, when targets were last listed: "
+                  "%s", self._targets.get(iqn))
+        volumes_dir = self.volumes_dir
+        volume_path = self._write_volume_conf(name, path, chap_auth)
 
         old_persist_file = None
         old_name = kwargs.get('old_name', None)
@@ -202,21 +224,10 @@ class TgtAdm(iscsi.ISCSITarget):
             os.unlink(volume_path)
             raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
 
-        # Grab targets list for debug
-        # Consider adding a check for lun 0 and 1 for tgtadm
-        # before considering this as valid
-        (out, err) = utils.execute('tgtadm',
-                                   '--lld',
-                                   'iscsi',
-                                   '--op',
-                                   'show',
-                                   '--mode',
-                                   'target',
-                                   run_as_root=True)
-        LOG.debug("Targets after update: %s", out)
-
-        iqn = '%s%s' % (self.iscsi_target_prefix, vol_id)
-        tid = self._get_target(iqn)
+        # The targets are listed once, for both the tid and the lun checks
+        target = self._get_targets().get(iqn)
+        LOG.debug("Target after update: %s", target)
+        tid = target[0] if target else None
         if tid is None:
             LOG.error(_LE("Failed to create iscsi target for Volume "
                           "ID: %(vol_id)s. Please ensure your tgtd config "
@@ -225,28 +236,69 @@ class TgtAdm(iscsi.ISCSITarget):
                       'volumes_dir': volumes_dir, })
             raise exception.NotFound()
 
-        # NOTE(jdg): Sometimes we have some issues with the backing lun
-        # not being created, believe this is due to a device busy
-        # or something related, so we're going to add some code
-        # here that verifies the backing lun (lun 1) was created
-        # and we'll try and recreate it if it's not there
-        if not self._verify_backing_lun(iqn, tid):
-            try:
-                self._recreate_backing_lun(iqn, tid, name, path)
-            except putils.ProcessExecutionError:
-                os.unlink(volume_path)
-                raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
-
-            # Finally check once more and if no go, fail and punt
-            if not self._verify_backing_lun(iqn, tid):
-                os.unlink(volume_path)
-                raise exception.ISCSITargetCreateFailed(volume_id=vol_id)
+        if not target[1]:
+            self._restore_backing_lun(iqn, tid, name, path, volume_path)
 
         if old_persist_file is not None and os.path.exists(old_persist_file):
             os.unlink(old_persist_file)
 
         return tid
 
+    def ensure_exports(self, context, exports):
+        """Recreates the exports of volumes with a single tgt update.
+
+        The persistence files of all the volumes are written first, then
+        tgt-admin creates the missing targets at once and the targets are
+        listed once to check them, rather than once per volume.
+
+        :param exports: list of (volume, volume_path) tuples
+        :returns: the volumes whose export could not be recreated
+        """
+        if not exports:
+            return []
+        portals_config = self._get_portals_config()
+        targets_conf = []
+        for volume, volume_path in exports:
+            iscsi_name = "%s%s" % (self.configuration.iscsi_target_prefix,
+                                   volume['name'])
+            chap_auth = self._get_target_chap_auth(context, iscsi_name)
+            if not chap_auth:
+                LOG.info(_LI("Skipping ensure_export. No iscsi_target "
+                             "provision for volume: %s"), volume['id'])
+            conf_path = self._write_volume_conf(iscsi_name, volume_path,
+                                                chap_auth)
+            targets_conf.append((volume, volume_path, iscsi_name, chap_auth,
+                                 conf_path))
+
+        try:
+            self._do_tgt_update('ALL')
+        except putils.ProcessExecutionError as e:
+            LOG.warning(_LW("Failed to update all the iscsi targets, "
+                            "updating them one by one: %s"), e)
+            return super(TgtAdm, self).ensure_exports(context, exports)
+
+        targets = self._get_targets()
+        failed = []
+        for (volume, volume_path, iscsi_name, chap_auth,
+             conf_path) in targets_conf:
+            target = targets.get(iscsi_name)
+            try:
+                if target is None:
+                    # Create the target on its own, to report why it fails
+                    self.create_iscsi_target(
+                        iscsi_name, 0, 1, volume_path, chap_auth,
+                        check_exit_code=False, old_name=None,
+                        **portals_config)
+                elif not target[1]:
+                    self._restore_backing_lun(iscsi_name, target[0],
+                                              iscsi_name, volume_path,
+                                              conf_path)
+            except Exception:
+                LOG.exception(_LE("Failed to re-export volume %s."),
+                              volume['id'])
+                failed.append(volume)
+        return failed
+
     def remove_iscsi_target(self, tid, lun, vol_id, vol_name, **kwargs):
         LOG.info(_LI('Removing iscsi_target for Volume ID: %s'), vol_id)
         vol_uuid_file = vol_name
@@ -16,8 +16,12 @@
 
 
 import ast
+import functools
+import io
 import math
+import os
 import re
+import stat
 import time
 import uuid
 
@@ -40,6 +44,7 @@ from cinder import exception
 from cinder.i18n import _, _LI, _LW, _LE
 from cinder import rpc
 from cinder import utils
+from cinder.volume import native_copy
 from cinder.volume import throttling
 
 
@@ -295,54 +300,123 @@ def _calculate_count(size_in_m, blocksize):
     return blocksize, int(count)
 
 
+def _probe_odirect_support(src, dest, flag):
+    """Check whether O_DIRECT is supported with dd.
+
+    Returns whether O_DIRECT works and whether the result only depends on
+    the device or file system: dd also fails for a missing path, denied
+    permissions or an I/O error, which say nothing about O_DIRECT.
+    """
+    try:
+        # Untranslated messages, to recognize the error below.
+        utils.execute('env', 'LC_ALL=C', 'dd', 'count=0', 'if=%s' % src,
+                      'of=%s' % dest, flag, run_as_root=True)
+        return True, True
+    except processutils.ProcessExecutionError as e:
+        # The kernel refuses O_DIRECT with EINVAL when opening the path.
+        return False, 'Invalid argument' in (e.stderr or '')
+
+
 def check_for_odirect_support(src, dest, flag='oflag=direct'):
 
     # Check whether O_DIRECT is supported
-    try:
-        utils.execute('dd', 'count=0', 'if=%s' % src, 'of=%s' % dest,
-                      flag, run_as_root=True)
-        return True
-    except processutils.ProcessExecutionError:
-        return False
+    return _probe_odirect_support(src, dest, flag)[0]
 
 
-def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
-                           sync=False, execute=utils.execute, ionice=None,
-                           sparse=False):
-    # Use O_DIRECT to avoid thrashing the system buffer cache
-    extra_flags = []
-    if check_for_odirect_support(srcstr, deststr, 'iflag=direct'):
-        extra_flags.append('iflag=direct')
+# Results of check_for_odirect_support, see _check_for_odirect_support_cached
+_ODIRECT_SUPPORT_CACHE = {}
 
-    if check_for_odirect_support(srcstr, deststr, 'oflag=direct'):
-        extra_flags.append('oflag=direct')
 
-    # If the volume is being unprovisioned then
-    # request the data is persisted before returning,
-    # so that it's not discarded from the cache.
-    conv = []
-    if sync and not extra_flags:
-        conv.append('fdatasync')
-    if sparse:
-        conv.append('sparse')
-    if conv:
-        conv_options = 'conv=' + ",".join(conv)
-        extra_flags.append(conv_options)
+def _odirect_cache_key(path, flag):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if stat.S_ISBLK(st.st_mode) or stat.S_ISCHR(st.st_mode):
+        return flag, 'dev', st.st_rdev
+    return flag, 'fs', st.st_dev
+
+
+def _check_for_odirect_support_cached(src, dest, flag='oflag=direct'):
+    """Check for O_DIRECT support, reusing recent results.
+
+    Whether O_DIRECT works depends on the device, or on the file system
+    for a file, that the flag applies to: the source for iflag and the
+    destination for oflag. Results are kept per device or file system for
+    volume_odirect_check_cache_ttl seconds so that copies do not fork a
+    root dd for every probe. Failures that are not caused by O_DIRECT are
+    not kept.
+    """
+    ttl = CONF.volume_odirect_check_cache_ttl
+    key = None
+    if ttl > 0:
+        key = _odirect_cache_key(src if flag.startswith('iflag') else dest,
+                                 flag)
+    if key is not None:
+        supported, expires = _ODIRECT_SUPPORT_CACHE.get(key, (None, 0))
+        if expires > time.time():
+            return supported
 
-    blocksize, count = _calculate_count(size_in_m, blocksize)
+    supported, conclusive = _probe_odirect_support(src, dest, flag)
+    if key is not None and conclusive:
+        _ODIRECT_SUPPORT_CACHE[key] = (supported, time.time() + ttl)
+    return supported
 
-    cmd = ['dd', 'if=%s' % srcstr, 'of=%s' % deststr,
-           'count=%d' % count, 'bs=%s' % blocksize]
-    cmd.extend(extra_flags)
 
-    if ionice is not None:
-        cmd = ['ionice', ionice] + cmd
+def _use_native_copy(prefix, ionice, srcstr, deststr):
+    # Throttling and ionice wrap the dd process, keep using dd for them.
+    return (CONF.volume_copy_engine == 'native' and not prefix and
+            ionice is None and native_copy.is_supported(srcstr, deststr))
 
-    cmd = prefix + cmd
+
+def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
+                           sync=False, execute=utils.execute, ionice=None,
+                           sparse=False):
+    if _use_native_copy(prefix, ionice, srcstr, deststr):
+        blocksize, _count = _calculate_count(size_in_m, blocksize)
+        copy = functools.partial(
+            native_copy.copy_volume, srcstr, deststr,
+            int(size_in_m * units.Mi),
+            strutils.string_to_bytes('%sB' % blocksize),
+            sync=sync, sparse=sparse, io_depth=CONF.volume_copy_io_depth)
+    else:
+        # Use O_DIRECT to avoid thrashing the system buffer cache
+        extra_flags = []
+        if _check_for_odirect_support_cached(srcstr, deststr,
+                                             'iflag=direct'):
+            extra_flags.append('iflag=direct')
+
+        if _check_for_odirect_support_cached(srcstr, deststr,
+                                             'oflag=direct'):
+            extra_flags.append('oflag=direct')
+
+        # If the volume is being unprovisioned then
+        # request the data is persisted before returning,
+        # so that it's not discarded from the cache.
+        conv = []
+        if sync and not extra_flags:
+            conv.append('fdatasync')
+        if sparse:
+            conv.append('sparse')
+        if conv:
+            conv_options = 'conv=' + ",".join(conv)
+            extra_flags.append(conv_options)
+
+        blocksize, count = _calculate_count(size_in_m, blocksize)
+
+        cmd = ['dd', 'if=%s' % srcstr, 'of=%s' % deststr,
+               'count=%d' % count, 'bs=%s' % blocksize]
+        cmd.extend(extra_flags)
+
+        if ionice is not None:
+            cmd = ['ionice', ionice] + cmd
+
+        cmd = prefix + cmd
+        copy = functools.partial(execute, *cmd, run_as_root=True)
 
     # Perform the copy
     start_time = timeutils.utcnow()
-    execute(*cmd, run_as_root=True)
+    copy()
     duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
 
     # NOTE(jdg): use a default of 1, mostly for unit test, but in
@@ -369,8 +443,35 @@ def _open_volume_with_path(path, mode):
         LOG.error(_LE("Failed to open volume from %(path)s."), {'path': path})
 
 
+def _is_builtin_file(handle):
+    # Built-in file objects take any buffer, the IO wrappers of volume
+    # drivers read and write bytes.
+    return isinstance(handle, (io.FileIO, io.BufferedIOBase))
+
+
+def _chunk_reader(src, chunk_size):
+    """Return a function reading a chunk of src in a native thread.
+
+    Built-in file objects are read into two buffers used in turn, so a
+    chunk stays valid while the next one is read.
+    """
+    if not _is_builtin_file(src):
+        return lambda chunk, size: src.read(size)
+
+    buffers = [bytearray(chunk_size), bytearray(chunk_size)]
+
+    def _read(chunk, size):
+        view = memoryview(buffers[chunk % 2])[:size]
+        return view[:src.readinto(view) or 0]
+
+    return _read
+
+
 def _transfer_data(src, dest, length, chunk_size):
-    """Transfer data between files (Python IO objects)."""
+    """Transfer data between files (Python IO objects).
+
+    Each chunk is written while the next one is read.
+    """
 
     chunks = int(math.ceil(length / chunk_size))
     remaining_length = length
@@ -378,29 +479,45 @@ def _transfer_data(src, dest, length, chunk_size):
     LOG.debug("%(chunks)s chunks of %(bytes)s bytes to be transferred.",
               {'chunks': chunks, 'bytes': chunk_size})
 
-    for chunk in range(0, chunks):
-        before = time.time()
-        data = tpool.execute(src.read, min(chunk_size, remaining_length))
-
-        # If we have reached end of source, discard any extraneous bytes from
-        # destination volume if trim is enabled and stop writing.
-        if data == b'':
-            break
-
-        tpool.execute(dest.write, data)
-        remaining_length -= len(data)
-        delta = (time.time() - before)
-        rate = (chunk_size / delta) / units.Ki
-        LOG.debug("Transferred chunk %(chunk)s of %(chunks)s (%(rate)dK/s).",
-                  {'chunk': chunk + 1, 'chunks': chunks, 'rate': rate})
-
-        # yield to any other pending operations
-        eventlet.sleep(0)
+    read_chunk = _chunk_reader(src, chunk_size)
+    write_bytes = not _is_builtin_file(dest)
+    writer = None
+    try:
+        for chunk in range(0, chunks):
+            before = time.time()
+            data = tpool.execute(read_chunk, chunk,
+                                 min(chunk_size, remaining_length))
+
+            # The buffer of the previous chunk is reused by the next read.
+            if writer:
+                writer.wait()
+                writer = None
+
+            # If we have reached end of source, discard any extraneous bytes
+            # from destination volume if trim is enabled and stop writing.
+            if not len(data):
+                break
+
+            if write_bytes and not isinstance(data, bytes):
+                data = data.tobytes()
+            writer = eventlet.spawn(tpool.execute, dest.write, data)
+            remaining_length -= len(data)
+            delta = (time.time() - before)
+            rate = (chunk_size / delta) / units.Ki
+            LOG.debug("Transferred chunk %(chunk)s of %(chunks)s "
+                      "(%(rate)dK/s).",
+                      {'chunk': chunk + 1, 'chunks': chunks, 'rate': rate})
+
+            # yield to any other pending operations
+            eventlet.sleep(0)
+    finally:
+        if writer:
+            writer.wait()
 
     tpool.execute(dest.flush)
 
 
-def _copy_volume_with_file(src, dest, size_in_m):
+def _copy_volume_with_file(src, dest, size_in_m, chunk_size=None):
     src_handle = src
     if isinstance(src, six.string_types):
         src_handle = _open_volume_with_path(src, 'rb')
@@ -419,7 +536,8 @@ def _copy_volume_with_file(src, dest, size_in_m):
 
     start_time = timeutils.utcnow()
 
-    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi, units.Mi * 4)
+    _transfer_data(src_handle, dest_handle, size_in_m * units.Mi,
+                   chunk_size or CONF.volume_copy_chunk_size)
 
     duration = max(1, timeutils.delta_seconds(start_time, timeutils.utcnow()))
 
@@ -436,7 +554,7 @@ def _copy_volume_with_file(src, dest, size_in_m):
 
 def copy_volume(src, dest, size_in_m, blocksize, sync=False,
                 execute=utils.execute, ionice=None, throttle=None,
-                sparse=False):
+                sparse=False, chunk_size=None):
     """Copy data from the source volume to the destination volume.
 
     The parameters 'src' and 'dest' are both typically of type str, which
@@ -448,6 +566,8 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
     of type RawIOBase or any derivative that supports file operations such as
     read and write.  In this case, the handles are treated as file handles
     instead of file paths and, at present moment, throttling is unavailable.
+    They are copied in chunks of 'chunk_size' bytes, volume_copy_chunk_size
+    by default.
     """
 
     if (isinstance(src, six.string_types) and
@@ -460,7 +580,7 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
                                    execute=execute, ionice=ionice,
                                    sparse=sparse)
     else:
-        _copy_volume_with_file(src, dest, size_in_m)
+        _copy_volume_with_file(src, dest, size_in_m, chunk_size=chunk_size)
 
 
 def clear_volume(volume_size, volume_path, volume_clear=None,
@@ -722,3 +842,25 @@ def process_reserve_over_quota(context, overs, usages, quotas, size):
             LOG.warning(msg, {'s_pid': context.project_id,
                               'd_consumed': _consumed(over)})
             raise exception.SnapshotLimitExceeded(allowed=quotas[over])
+
+
+def run_concurrently(func, items, max_workers=1, action=None):
+    """Call func with each of the items, at most max_workers at a time.
+
+    When an action is given, the progress is logged every tenth of the
+    items, which helps following long runs like recovering the volumes of
+    a backend on startup.
+
+    :returns: the results of the calls, in the order of the items
+    """
+    pool = eventlet.GreenPool(max_workers)
+    total = len(items)
+    step = max(total // 10, 1)
+    results = []
+    for result in pool.imap(func, items):
+        results.append(result)
+        done = len(results)
+        if action and (done % step == 0 or done == total):
+            LOG.info(_LI("%(action)s: %(done)d of %(total)d done."),
+                     {'action': action, 'done': done, 'total': total})
+    return results
@@ -28,6 +28,7 @@ from cinder import context
 from cinder import db
 from cinder import exception
 from cinder.i18n import _, _LE
+from cinder import quota
 
 
 CONF = cfg.CONF
@@ -54,6 +55,7 @@ def create(context,
         LOG.exception(_LE('DB error:'))
         raise exception.VolumeTypeCreateFailed(name=name,
                                                extra_specs=extra_specs)
+    quota.QUOTAS.invalidate_resources()
     return type_ref
 
 
@@ -71,6 +73,8 @@ def update(context, id, name, description, is_public=None):
     except db_exc.DBError:
         LOG.exception(_LE('DB error:'))
         raise exception.VolumeTypeUpdateFailed(id=id)
+    if name is not None:
+        quota.QUOTAS.invalidate_resources()
     return type_updated
 
 
@@ -81,6 +85,7 @@ def destroy(context, id):
         raise exception.InvalidVolumeType(reason=msg)
     else:
         db.volume_type_destroy(context, id)
+        quota.QUOTAS.invalidate_resources()
 
 
 def get_all_types(context, inactive=0, search_opts=None):
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the scheduler capacity weighers over many pools.
+
+Weighs randomly generated pools with the CapacityWeigher and the
+AllocatedCapacityWeigher, with NumPy when it is installed and without:
+
+    python tools/scheduler_weigh_benchmark.py --pools 5000
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import time
+
+from oslo_config import cfg
+from six.moves import range
+
+from cinder.scheduler import base_weight
+from cinder.scheduler import host_manager
+from cinder.scheduler import weights
+from cinder.scheduler.weights import capacity
+
+
+def _make_pools(count):
+    pools = []
+    for i in range(count):
+        pool = host_manager.HostState('host%d@backend#pool' % i)
+        pool.total_capacity_gb = random.randint(1000, 100000)
+        pool.free_capacity_gb = random.randint(0, pool.total_capacity_gb)
+        pool.allocated_capacity_gb = (pool.total_capacity_gb -
+                                      pool.free_capacity_gb)
+        pool.provisioned_capacity_gb = pool.allocated_capacity_gb * 2
+        pool.reserved_percentage = random.choice([0, 5, 10])
+        pool.thin_provisioning_support = random.random() < 0.5
+        pool.max_over_subscription_ratio = random.choice([1.0, 5.0, 20.0])
+        pools.append(pool)
+    return pools
+
+
+def _run(handler, pools, iterations):
+    weigher_classes = [capacity.CapacityWeigher,
+                       capacity.AllocatedCapacityWeigher]
+    start = time.time()
+    for _i in range(iterations):
+        best = handler.get_weighed_objects(weigher_classes, pools, {})[0]
+    return (time.time() - start) / iterations, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pools', type=int, default=5000,
+                        help='number of pools to weigh')
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='number of weighings to average')
+    args = parser.parse_args()
+
+    cfg.CONF([], project='cinder')
+    handler = weights.HostWeightHandler('cinder.scheduler.weights')
+    pools = _make_pools(args.pools)
+
+    numpy = base_weight.np
+    results = []
+    if numpy is not None:
+        results.append(('numpy',) + _run(handler, pools, args.iterations))
+    base_weight.np = capacity.np = None
+    try:
+        results.append(('python',) + _run(handler, pools, args.iterations))
+    finally:
+        base_weight.np = capacity.np = numpy
+
+    for name, duration, best in results:
+        print('%-6s %d pools: %.2f ms per weighing, best %s' %
+              (name, args.pools, duration * 1000, best.obj.host))
+    if numpy is None:
+        print('NumPy is not installed, only the python weighing was run.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())